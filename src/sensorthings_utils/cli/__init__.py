@@ -30,7 +30,7 @@ from .system_checks import (
     _check_containers_running,
     _check_postgres_persistent_volume,
 )
-from .commands import _validate, _push_available
+from .commands import _validate, _push_available, _provision
 
 __all__ = [
     "main",
@@ -51,4 +51,5 @@ __all__ = [
     "_check_postgres_persistent_volume",
     "_validate",
     "_push_available",
+    "_provision",
 ]
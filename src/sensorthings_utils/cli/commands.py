@@ -201,6 +201,57 @@ def _generate_config(
         raise typer.Exit(1)
 
 
+def _provision(
+    plan_only: bool = typer.Option(
+        True, "--plan/--apply", help="Only show the changes, or apply them to FROST."
+    ),
+    frost_endpoint: Optional[str] = typer.Option(
+        None, "--frost-endpoint", help="Change default FROST server URL."
+    ),
+    workers: int = typer.Option(
+        4, "--workers", help="Threads setting up new sensor arrangements."
+    ),
+):
+    """Diff the sensor configs against FROST, and apply the changes."""
+    from sensorthings_utils import provisioning
+    from sensorthings_utils.config import generate_sensor_config_files
+    from sensorthings_utils.registry import EntityRegistry
+    from sensorthings_utils.sensor_things.extensions import (
+        SensorArrangement,
+        SensorConfig,
+    )
+
+    if frost_endpoint:
+        os.environ["FROST_ENDPOINT"] = frost_endpoint
+    sensor_arrangements = []
+    for f in generate_sensor_config_files():
+        sensor_config = SensorConfig(f)
+        if not sensor_config.is_valid:
+            console.print(f"[yellow]Skipping invalid sensor config {f}[/yellow]")
+            continue
+        sensor_arrangements.append(SensorArrangement(sensor_config))
+
+    console.print(
+        f"[bold]Planning {len(sensor_arrangements)} sensor config(s)...[/bold]\n"
+    )
+    plan = provisioning.plan(sensor_arrangements)
+    styles = {provisioning.CREATE: "green", provisioning.UPDATE: "yellow"}
+    for change in plan.changes:
+        if style := styles.get(change.action):
+            console.print(f"[{style}]{change}[/{style}]")
+    console.print(f"\n[bold]Plan:[/bold] {plan.summary()}")
+    if plan_only or not plan:
+        return
+
+    failed = provisioning.apply(plan, workers=workers, registry=EntityRegistry())
+    if failed:
+        console.print(f"[bold red]{len(failed)} change(s) failed:[/bold red]")
+        for change in failed:
+            console.print(f"  [red]{change}[/red]")
+        raise typer.Exit(1)
+    console.print(f"[bold green]✓ Applied {len(plan)} change(s)[/bold green]")
+
+
 def _setup(
     all: bool = typer.Option(False, "--all", help="Setup all credential types."),
     frost: bool = typer.Option(False, "--frost", help="Setup FROST credentials."),
@@ -230,6 +281,7 @@ app.command(name="stop")(_stop_instance)
 app.command(name="setup")(_setup)
 app.command(name="validate")(_validate)
 app.command(name="generate-config")(_generate_config)
+app.command(name="provision")(_provision)
 
 
 def main():
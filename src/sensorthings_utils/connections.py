@@ -1,22 +1,29 @@
 """Manage connections, authentication & protocols with sensor infrastructure"""
 
+import asyncio
 import os
 import logging
 import json
 from abc import ABC, abstractmethod
-from typing import Any, Literal, ClassVar
+from typing import Any, Callable, Iterator, Literal, ClassVar
 import time
 import queue
+import socket
 import threading
 import traceback
 import inspect
 # external
 import lnetatmo
-from paho.mqtt.client import Client as mqttClient
+from paho.mqtt.client import MQTTv311, MQTTv5, Client as mqttClient
 from paho.mqtt.enums import CallbackAPIVersion
 
 from sensorthings_utils.exceptions import FrostUploadFailure, UnregisteredSensorError
-from sensorthings_utils.frost import frost_observation_upload
+from sensorthings_utils.frost_bulk import PendingObservation
+from sensorthings_utils.payload_queue import PayloadQueue
+from sensorthings_utils.runtime import PahoAsyncBridge
+from sensorthings_utils.pipeline import KeyedExecutor, ObservationSet, UploadPipeline
+from sensorthings_utils.sinks import make_sink
+from sensorthings_utils.spool import spool
 
 # internal
 from .monitor import netmon
@@ -43,6 +50,25 @@ debug_logger = logging.getLogger("debug")
 class SensorApplicationConnection(ABC):
     """
     Abstract base class representing any connection to a sensor application.
+
+    Parameters:
+        app_name (str): name of the sensor application.
+        authentication_type ("tokens" | "credentials"): where to find secrets.
+        max_retries (int): consecutive failures before the thread is stopped.
+        sink (str): where observations are written, one of `sinks.SINKS`:
+            "frost" (default), "frost_bulk", "frost_mqtt", "file" or "null".
+        bulk_max_size (int): pending observations which trigger a bulk upload.
+        bulk_max_age (float): seconds between bulk uploads, 0 to upload once
+            per payload.
+        sink_path (str | None): directory of the "file" sink.
+        upload_workers (int): uploader threads fed by a bounded queue, 0 to
+            upload on the connection thread.
+        upload_queue_size (int): capacity of the upload queue.
+        process_workers (int): threads transforming and uploading the
+            observations of each sensor of a payload, those of one sensor in
+            order; 0 to process payloads on the connection thread.
+        spool_failures (bool): spool observations which fail to upload to disk,
+            to be replayed once FROST is reachable.
     """
 
     def _preflight(self) -> bool:
@@ -55,11 +81,62 @@ class SensorApplicationConnection(ABC):
         authentication_type: Literal["tokens", "credentials"],
         *,
         max_retries: int = 1,
+        sink: str = "frost",
+        bulk_max_size: int = 500,
+        bulk_max_age: float = 0,
+        sink_path: str | None = None,
+        upload_workers: int = 0,
+        upload_queue_size: int = 1000,
+        process_workers: int = 0,
+        spool_failures: bool = True,
     ):
         self.app_name = app_name
         self.authentication_type = authentication_type
         self.max_retries = max_retries
+        # a `bulk_max_age` of 0 uploads once per payload, which cannot be
+        # tracked once uploads happen on the upload workers:
+        if (upload_workers or process_workers) and sink == "frost_bulk" and not (
+            bulk_max_age
+        ):
+            bulk_max_age = 1.0
+        # 0 upload workers: upload inline on the connection thread.
+        self.upload_workers = upload_workers
+        self.process_workers = process_workers
+        self.spool_failures = spool_failures
+        self.sink = make_sink(
+            sink,
+            app_name,
+            on_failure=self._report_sink_failures,
+            max_size=bulk_max_size,
+            max_age=bulk_max_age,
+            path=sink_path,
+        )
         # private:
+        self._upload_pipeline = (
+            UploadPipeline(
+                app_name,
+                self._upload,
+                workers=upload_workers,
+                maxsize=upload_queue_size,
+                on_failure=lambda e, sensor_id: self._exception_handler(
+                    e, sensor_id=sensor_id
+                ),
+            )
+            if upload_workers
+            else None
+        )
+        self._keyed_executor = (
+            KeyedExecutor(
+                app_name,
+                workers=process_workers,
+                maxsize=upload_queue_size,
+                on_failure=lambda e, sensor_id: self._exception_handler(
+                    e, sensor_id=sensor_id
+                ),
+            )
+            if process_workers
+            else None
+        )
         self._thread = None
         self._stop_event = threading.Event()
         self._authentication_file = (
@@ -95,16 +172,23 @@ class SensorApplicationConnection(ABC):
         Automatically discovers constructor parameters and maps config values.
         Subclasses rarely need to override this unless they have complex logic.
         """
-        sig = inspect.signature(cls)
-
         kwargs: dict[str, Any] = {"app_name": app_name}
 
-        for param_name in sig.parameters:
-            if param_name in config:
-                kwargs[param_name] = config[param_name]
+        # subclasses pass shared options on to their parents as **kwargs:
+        for klass in cls.__mro__:
+            if not issubclass(klass, SensorApplicationConnection):
+                continue
+            for param_name in inspect.signature(klass.__init__).parameters:
+                if param_name in config:
+                    kwargs[param_name] = config[param_name]
 
         return cls(**kwargs)
 
+    @property
+    def _spools(self) -> bool:
+        """True if failed observations are spooled for replay to FROST."""
+        return self.spool_failures and self.sink.uploads_to_frost
+
     # abstract methods ########################################################
     @abstractmethod
     def _auth(self) -> Any:
@@ -131,31 +215,128 @@ class SensorApplicationConnection(ABC):
         """
         pass
 
+    @abstractmethod
+    async def _apull_transform_push_loop(self) -> None:
+        """Asyncio `_pull_transform_push_loop`, run as a task by `run`."""
+        pass
+
     # common methods ###########################################################
-    def _process_payload(self, app_payload: dict[str, Any]) -> None:
-        """Orcestrator function: processes a payload and pushes to FROST."""
+    def _transform_sensor(
+        self, sensor_id: SensorID, observations: Any, application_timestamp: Any
+    ) -> tuple[SupportedSensors, list[ObservationSet]]:
+        """Transform the unpacked observations of one sensor."""
+        sensor_model = self.sensor_registry.get(sensor_id, None)
+        if not sensor_model:
+            raise UnregisteredSensorError
+        transformer = TRANSFORMER_MAP[sensor_model]
+        payload = transformer.from_unpack(observations, application_timestamp)
+        return sensor_model, payload.to_stObservations()
+
+    def _unpack_payload(
+        self, app_payload: dict[str, Any]
+    ) -> Iterator[tuple[SensorID, Any, Any]]:
+        """
+        Unpack a payload, yield the sensor id, unpacked observations and
+        application timestamp of each sensor, for `_transform_sensor`.
+        """
         # TODO: successful unpack is a bit of a contrived obj.
         successful_unpack = self.application_unpacker.unpack(app_payload)
         for sensor_id, observations in successful_unpack.data.items():
-            sensor_model = self.sensor_registry.get(sensor_id, None)
-            if not sensor_model:
-                raise UnregisteredSensorError
-            transformer = TRANSFORMER_MAP[sensor_model]
-            payload = transformer.from_unpack(
-                observations, successful_unpack.application_timestamp
+            yield sensor_id, observations, successful_unpack.application_timestamp
+
+    def _process_sensor(
+        self, sensor_id: SensorID, observations: Any, application_timestamp: Any
+    ) -> None:
+        """Transform and upload the observations of one sensor of a payload."""
+        sensor_model, st_observations = self._transform_sensor(
+            sensor_id, observations, application_timestamp
+        )
+        for st_obs in st_observations:
+            debug_logger.debug(f"{st_obs=} {sensor_id=}")
+            if self._upload_pipeline is not None:
+                self._upload_pipeline.submit(sensor_id, st_obs)
+            else:
+                self._upload(sensor_id, st_obs)
+        event_logger.info(
+            f"Received and processed a payload from {self.app_name} "
+            f"from a {sensor_model.value} sensor."
+        )
+
+    def _process_payload(
+        self, app_payload: dict[str, Any], flush: bool = True
+    ) -> None:
+        """
+        Orcestrator function: processes a payload and pushes to FROST.
+
+        The payload is unpacked on the calling thread. With `process_workers`,
+        the observations of each sensor are then transformed and uploaded on
+        the `KeyedExecutor` thread of that sensor, in the order their payloads
+        arrived; otherwise one sensor after the other on the calling thread.
+
+        With `flush=False` the sink is not flushed, so that the observations
+        of a batch of payloads are uploaded together by one `sink.flush()`.
+        """
+        for sensor_id, *unpacked in self._unpack_payload(app_payload):
+            if self._keyed_executor is not None:
+                self._keyed_executor.submit(
+                    sensor_id, self._process_sensor, sensor_id, *unpacked
+                )
+            else:
+                self._process_sensor(sensor_id, *unpacked)
+        if flush and self._upload_pipeline is None and self._keyed_executor is None:
+            self.sink.flush()
+
+    async def _aprocess_payload(
+        self, app_payload: dict[str, Any], flush: bool = True
+    ) -> None:
+        """
+        Asyncio `_process_payload`: the uploads of a payload are awaited
+        concurrently on the running event loop.
+        """
+        for sensor_id, *unpacked in self._unpack_payload(app_payload):
+            sensor_model, st_observations = self._transform_sensor(
+                sensor_id, *unpacked
             )
-            st_observations = payload.to_stObservations()
-            for st_obs in st_observations:
-                try:
-                    debug_logger.debug(f"{st_obs=} {sensor_id=}")
-                    frost_observation_upload(sensor_id, st_obs, self.app_name)
-                    event_logger.info(
-                        f"Received and processed a payload from {self.app_name} "
-                        f"from a {sensor_model.value} sensor."
-                    )
-                    netmon.add_named_count("push_success", f"{sensor_id}", 1)
-                except FrostUploadFailure as e:
-                    self._exception_handler(e, sensor_id=sensor_id)
+            await asyncio.gather(
+                *(self._aupload(sensor_id, st_obs) for st_obs in st_observations)
+            )
+            event_logger.info(
+                f"Received and processed a payload from {self.app_name} "
+                f"from a {sensor_model.value} sensor."
+            )
+        if flush:
+            await asyncio.to_thread(self.sink.flush)
+
+    def _upload(self, sensor_id: SensorID, st_obs: ObservationSet) -> None:
+        """Write a single observation to the sink."""
+        try:
+            self.sink.write(sensor_id, st_obs)
+        except FrostUploadFailure as e:
+            self._upload_failure(e, sensor_id, st_obs)
+
+    async def _aupload(self, sensor_id: SensorID, st_obs: ObservationSet) -> None:
+        """Asyncio `_upload`."""
+        try:
+            await self.sink.awrite(sensor_id, st_obs)
+        except FrostUploadFailure as e:
+            self._upload_failure(e, sensor_id, st_obs)
+
+    def _report_sink_failures(self, failed: list[PendingObservation]) -> None:
+        """Handle observations the sink rejected after accepting them."""
+        for p in failed:
+            self._upload_failure(
+                FrostUploadFailure(f"{self.sink!r} rejected {p.observation_set}"),
+                p.sensor_name,
+                p.observation_set,
+            )
+
+    def _upload_failure(
+        self, e: FrostUploadFailure, sensor_id: SensorID, st_obs: ObservationSet
+    ) -> None:
+        """Spool an observation which could not be uploaded, then log."""
+        if self._spools:
+            spool.append(sensor_id, st_obs)
+        self._exception_handler(e, sensor_id=sensor_id)
 
     def _exception_handler(self, e: Exception | None, **kwargs) -> Literal[0, 1]:
         """Exception handling, return 0 if transient error, 1 if system failure."""
@@ -183,6 +364,10 @@ class SensorApplicationConnection(ABC):
             msg = f"{name}: sensor is not registered."
             _log((f"{self.app_name} " + msg), debug_context)
             return 0
+        elif isinstance(e, FrostUploadFailure) and self._spools:
+            msg = f"{name}: failure to upload to FROST, spooled for replay."
+            _log((f"{self.app_name} " + msg), debug_context)
+            return 0
         elif isinstance(e, FrostUploadFailure):
             msg = f"{name}: failure to upload to FROST."
             _log((f"{self.app_name} " + msg), debug_context)
@@ -207,6 +392,11 @@ class SensorApplicationConnection(ABC):
                 f"Preflight check failed for {self.app_name}; not starting connection."
             )
             return
+        self.sink.start()
+        if self._upload_pipeline is not None:
+            self._upload_pipeline.start()
+        if self._keyed_executor is not None:
+            self._keyed_executor.start()
         if self._thread is None or not self._thread.is_alive():
             self._thread = threading.Thread(
                 target=self._pull_transform_push_loop,
@@ -215,8 +405,29 @@ class SensorApplicationConnection(ABC):
             )
             self._thread.start()
 
+    async def run(self, sensor_registry: dict[SensorID, SupportedSensors]) -> None:
+        """
+        Asyncio counterpart of `start_pull_transform_push_thread`: run the loop
+        on the running event loop until it stops or is cancelled, see
+        `runtime.AsyncRuntime`. Uploads are awaited by the loop itself, so
+        upload and process workers are not started.
+        """
+        self.sensor_registry = sensor_registry
+        self.sink.start()
+        await self._apull_transform_push_loop()
+
     def stop_pull_transform_push_thread(self):
         self._stop_event.set()
+        if self._keyed_executor is not None:
+            # payloads already handed over are processed first:
+            self._keyed_executor.stop()
+        if self._upload_pipeline is not None:
+            self._upload_pipeline.stop()
+            # observations the workers did not get to are not lost:
+            for sensor_id, st_obs in self._upload_pipeline.drain():
+                if self._spools:
+                    spool.append(sensor_id, st_obs)
+        self.sink.stop()
 
     def restart_pull_transform_push_thread(self, join_timeout: int = 15):
         self._stop_event.set()
@@ -241,6 +452,8 @@ class HTTPSensorApplicationConnection(SensorApplicationConnection, ABC):
         max_connection_retries (int): Number of times to retry a request
             to the HTTP server before killing the connection.
         interval (int): the interval between requests.
+        **kwargs: upload options shared by all connections, see
+            `SensorApplicationConnection`.
     Methods:
         start: Start a thread and a request loop at `interval`.
         stop: Stop the thread.
@@ -256,11 +469,13 @@ class HTTPSensorApplicationConnection(SensorApplicationConnection, ABC):
         # to have sensors with different observation intervals to fall under the
         # same application.
         request_interval: int = 300,
+        **kwargs: Any,
     ):
         super().__init__(
             app_name,
             authentication_type,
             max_retries=max_retries,
+            **kwargs,
         )
 
         self.request_interval = request_interval
@@ -295,6 +510,33 @@ class HTTPSensorApplicationConnection(SensorApplicationConnection, ABC):
                     )
                     self._stop_event.set()
 
+    async def _apull_transform_push_loop(self) -> None:
+        """
+        Loop requests until failure, sleeping on the event loop in between.
+        """
+        failures = 0
+        app_payload = None
+        while not self._stop_event.is_set():
+            try:
+                # application SDKs block:
+                app_payload = await asyncio.to_thread(self._pull_data)
+                if self._last_payload == app_payload:
+                    await asyncio.sleep(self.request_interval / 4)
+                    continue
+                self._last_payload = app_payload
+                await self._aprocess_payload(app_payload)
+                netmon.add_named_count("payloads_received", self.app_name, 1)
+                failures = 0
+                await asyncio.sleep(self.request_interval)
+            except Exception as e:
+                failures += self._exception_handler(e, app_payload=app_payload)
+                if failures == self.max_retries:
+                    main_logger.critical(
+                        f"Exceeded max retries ({self.max_retries}) for "
+                        f"{self.app_name}. Stopping task."
+                    )
+                    self._stop_event.set()
+
 
 class MQTTSensorApplicationConnection(SensorApplicationConnection, ABC):
     """
@@ -309,6 +551,18 @@ class MQTTSensorApplicationConnection(SensorApplicationConnection, ABC):
         credentials_file(Path | None): Path to credentials used for authentication, if any
         max_retries(int): Number of consecutive timeout failures before stopping
         timeout(int): Timeout in seconds for waiting on new messages
+        drain_batch_size(int): queued messages decoded and processed per
+            wake up, their observations are flushed to the sink together
+        payload_queue_size(int): payloads held in memory until processed
+        payload_overflow("block" | "drop_oldest" | "spill"): what happens to
+            payloads arriving while the queue is full, see `PayloadQueue`
+        share_group(str | None): subscribe as a member of this MQTT v5 shared
+            subscription group (`$share/<group>/<topic>`), so that the broker
+            splits the topic's messages between every worker in the group
+        worker_id(str | None): name of this worker in reports, defaults to
+            $ST_UTILS_WORKER_ID or the host name
+        **kwargs: Upload options shared by all connections, see
+            `SensorApplicationConnection`
     """
 
     def __init__(
@@ -321,40 +575,87 @@ class MQTTSensorApplicationConnection(SensorApplicationConnection, ABC):
         port: int = 8883,
         max_retries: int = 3,
         timeout: int = 1200,
+        drain_batch_size: int = 100,
+        payload_queue_size: int = 10000,
+        payload_overflow: str = "spill",
+        share_group: str | None = None,
+        worker_id: str | None = None,
+        **kwargs: Any,
     ):
         super().__init__(
             app_name,
             authentication_type,
             max_retries=max_retries,
+            **kwargs,
         )
         self.host = host
         self.port = port
         self.topic = topic
         self.timeout = timeout
+        self.drain_batch_size = drain_batch_size
+        self.share_group = share_group
+        self.worker_id = (
+            worker_id or os.getenv("ST_UTILS_WORKER_ID") or socket.gethostname()
+        )
         # private
-        self._payload_queue = queue.Queue()
+        self._payload_queue = PayloadQueue(
+            app_name, maxsize=payload_queue_size, overflow=payload_overflow
+        )
         self._subscribed: bool = False
-        self._mqtt_client = mqttClient(CallbackAPIVersion.VERSION2)
+        # called on the client's thread for each message received:
+        self._on_payload: Callable[[], object] | None = None
+        # shared subscriptions are an MQTT v5 feature:
+        self._mqtt_client = mqttClient(
+            CallbackAPIVersion.VERSION2,
+            protocol=MQTTv5 if share_group else MQTTv311,
+        )
+        if share_group:
+            netmon.shared_subscriptions[app_name] = (share_group, self.worker_id)
+
+    @property
+    def subscription(self) -> str:
+        """The topic filter subscribed to, shared if there is a `share_group`."""
+        if self.share_group:
+            return f"$share/{self.share_group}/{self.topic}"
+        return self.topic
+
+    @staticmethod
+    def _decode_payload(raw_payload: bytes) -> dict[str, Any]:
+        try:
+            return json.loads(raw_payload)
+        except ValueError as e:
+            raise UnpackError(f"Undecodable payload: {e}") from e
 
     def _pull_data(self) -> None:
         """
         Establishes MQTT connection, subscribes to topic, and starts receiving messages.
-        Messages are placed in the internal queue by the MQTT client's callback.
+        Messages are placed in the internal queue by the MQTT client's callback,
+        undecoded so that the network loop (and its keepalives) stays responsive.
         """
+        self._configure_client()
+        self._mqtt_client.loop_start()
+        self._mqtt_client.connect(self.host, self.port)
+
+    def _configure_client(self) -> None:
+        """Authenticate and set the callbacks of the MQTT client."""
         # auth is defined in the concrete implementations:
         self._auth()
+        self._payload_queue.open()
 
         def on_message(client, userdata, message):
-            self._payload_queue.put(json.loads(message.payload))
+            self._payload_queue.put(message.payload)
+            if self._on_payload is not None:
+                self._on_payload()
 
         def on_subscribe(client, userdata, mid, reason_code_list, properties):
             event_logger.info(
-                    f"Subscribed to {self.topic} - rcodes: {reason_code_list}")
+                f"Subscribed to {self.subscription} - rcodes: {reason_code_list}"
+            )
 
         def on_connect(client, userdata, flags, rc, properties):
             if rc == 0:
                 event_logger.info(f"Connected to {self.host}/{self.app_name}")
-                self._mqtt_client.subscribe(self.topic)
+                self._mqtt_client.subscribe(self.subscription)
                 self._subscribed = True
             else:
                 event_logger.warning(f"connection failed with code {rc}")
@@ -363,18 +664,15 @@ class MQTTSensorApplicationConnection(SensorApplicationConnection, ABC):
         self._mqtt_client.on_message = on_message
         self._mqtt_client.on_subscribe = on_subscribe
 
-        self._mqtt_client.loop_start()
-        self._mqtt_client.connect(self.host, self.port)
-
-
     def _pull_transform_push_loop(self) -> None:
         """
         Continuously processes messages from the queue until stopped.
 
         This runs in its own thread and:
-        1. Pulls messages from the queue (populated by MQTT callback)
-        2. Unpacks and transforms the payload
-        3. Optionally pushes to FROST server
+        1. Pulls up to `drain_batch_size` messages from the queue (populated by
+           MQTT callback) per wake up
+        2. Decodes, unpacks and transforms each payload
+        3. Optionally pushes to FROST server, flushing the sink once per batch
 
         Stops when _stop_event is set or after max_retries consecutive timeouts.
         """
@@ -383,26 +681,118 @@ class MQTTSensorApplicationConnection(SensorApplicationConnection, ABC):
             self._pull_data()
 
         failures = 0
-        app_payload = None
         while not self._stop_event.is_set():
             try:
-                app_payload = self._payload_queue.get(timeout=self.timeout)
-                self._process_payload(app_payload)
-                failures = 0
-            except Exception as e:
-                failures += self._exception_handler(e, app_payload=app_payload)
-                if failures >= self.max_retries:
-                    main_logger.critical(
-                        f"Exceeded max retries ({self.max_retries}) for "
-                        f"{self.app_name}. Stopping connection."
+                raw_payloads = self._payload_queue.get_batch(
+                    self.drain_batch_size, timeout=self.timeout
+                )
+            except queue.Empty as e:
+                raw_payloads = []
+                failures += self._exception_handler(e)
+            netmon.add_named_count(
+                "payloads_received", self.app_name, len(raw_payloads)
+            )
+            for raw_payload in raw_payloads:
+                app_payload = None
+                try:
+                    app_payload = self._decode_payload(raw_payload)
+                    self._process_payload(app_payload, flush=False)
+                    failures = 0
+                except Exception as e:
+                    failures += self._exception_handler(
+                        e, app_payload=app_payload or raw_payload
                     )
-                    self._stop_event.set()
+            if (
+                raw_payloads
+                and self._upload_pipeline is None
+                and self._keyed_executor is None
+            ):
+                try:
+                    self.sink.flush()
+                except Exception as e:
+                    failures += self._exception_handler(e)
+            if failures >= self.max_retries:
+                main_logger.critical(
+                    f"Exceeded max retries ({self.max_retries}) for "
+                    f"{self.app_name}. Stopping connection."
+                )
+                self._stop_event.set()
 
         event_logger.info("Gracefully stopping MQTT connection for" f"{self.app_name}")
+        # a callback blocked on a full queue would hold up `loop_stop`:
+        self._payload_queue.close()
         self._mqtt_client.loop_stop()
         self._mqtt_client.disconnect()
         self._subscribed = False
 
+    async def _apull_transform_push_loop(self) -> None:
+        """
+        Asyncio `_pull_transform_push_loop`: the MQTT client is driven by the
+        event loop through a `PahoAsyncBridge` rather than its own thread, and
+        the task sleeps until a message arrives.
+
+        With the "block" overflow policy, the bridge stops reading from the
+        broker while the payload queue is full.
+        """
+        loop = asyncio.get_running_loop()
+        received = asyncio.Event()
+        bridge = PahoAsyncBridge(
+            self._mqtt_client, loop, can_read=self._payload_queue.accepting
+        )
+        self._on_payload = received.set
+        self._configure_client()
+        await asyncio.to_thread(self._mqtt_client.connect, self.host, self.port)
+
+        failures = 0
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    raw_payloads = self._payload_queue.get_batch(
+                        self.drain_batch_size, timeout=0
+                    )
+                except queue.Empty as e:
+                    received.clear()
+                    try:
+                        await asyncio.wait_for(received.wait(), self.timeout)
+                        continue
+                    except TimeoutError:
+                        raw_payloads = []
+                        failures += self._exception_handler(e)
+                bridge.resume()
+                netmon.add_named_count(
+                    "payloads_received", self.app_name, len(raw_payloads)
+                )
+                for raw_payload in raw_payloads:
+                    app_payload = None
+                    try:
+                        app_payload = self._decode_payload(raw_payload)
+                        await self._aprocess_payload(app_payload, flush=False)
+                        failures = 0
+                    except Exception as e:
+                        failures += self._exception_handler(
+                            e, app_payload=app_payload or raw_payload
+                        )
+                if raw_payloads:
+                    try:
+                        await asyncio.to_thread(self.sink.flush)
+                    except Exception as e:
+                        failures += self._exception_handler(e)
+                if failures >= self.max_retries:
+                    main_logger.critical(
+                        f"Exceeded max retries ({self.max_retries}) for "
+                        f"{self.app_name}. Stopping task."
+                    )
+                    self._stop_event.set()
+        finally:
+            event_logger.info(f"Stopping MQTT task for {self.app_name}")
+            self._on_payload = None
+            self._payload_queue.close()
+            bridge.close()
+            self._mqtt_client.disconnect()
+            # send the DISCONNECT before the event loop goes away:
+            self._mqtt_client.loop_write()
+            self._subscribed = False
+
 
 class NetatmoConnection(HTTPSensorApplicationConnection):
     """
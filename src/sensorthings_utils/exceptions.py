@@ -16,3 +16,7 @@ class FailedSensorConfigValidation(Exception):
 
 class FrostUploadFailure(Exception):
     """Failure to push to FROST server."""
+
+
+class DependencyNotReady(Exception):
+    """A service st-utils depends on did not become ready in time."""
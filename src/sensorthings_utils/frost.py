@@ -1,29 +1,44 @@
 """Interactions with FROST API."""
 
 # standard
-import urllib.request as request
 from urllib.parse import quote
 from urllib import error
-from typing import Dict, Tuple, Any, Union, TYPE_CHECKING
-import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    Union,
+    TYPE_CHECKING,
+)
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, defaultdict
 import json
+import time
 import logging
 import os
 import re
+import threading
 
 # internal
 from sensorthings_utils.config import (
     CONTAINER_ENVIRONMENT,
     FROST_ENDPOINT_DEFAULT,
-    FROST_CREDENTIALS,
 )
 from sensorthings_utils.exceptions import FrostUploadFailure
+from sensorthings_utils.frost_client import get_frost_client
 from sensorthings_utils.sensor_things.core import (
     Datastream,
+    FeatureOfInterest,
     SensorThingsObject,
     Observation,
 )
 from sensorthings_utils.monitor import netmon
+from sensorthings_utils.registry import EntityRegistry, config_hash
+from sensorthings_utils.sensor_things.extensions import FleetArrangement
 from sensorthings_utils.transformers.types import ObservedProperties, SensorID
 
 # typing
@@ -31,10 +46,17 @@ if TYPE_CHECKING:
     from sensorthings_utils.sensor_things.extensions import SensorArrangement
 
 UrlStr = str
+DatastreamId = int | str
+FeatureId = int | str
 
 logger = logging.getLogger(__name__)
+event_logger = logging.getLogger("events")
 debug_logger = logging.getLogger("debug")
 
+# FROST answers 404/410 for a removed entity, and 400 for an Observation
+# referencing an unknown Datastream id (but also for e.g. a malformed result):
+STALE_ROUTE_CODES = (404, 410)
+
 ENTITY_ENDPOINTS: Dict[str, str] = {
     "Sensor": "/Sensors",
     "Datastream": "/Datastreams",
@@ -47,6 +69,91 @@ ENTITY_ENDPOINTS: Dict[str, str] = {
 }
 
 
+class _DatastreamRoutingTable:
+    """
+    Thread-safe (sensor, observed property) → Datastream `@iot.id` table.
+
+    Filled by `initial_setup` and lazily on misses, so that the hot upload path
+    can reference the Datastream of every observation without querying FROST.
+    The FeatureOfInterest provisioned for the Location of each Datastream is
+    kept alongside, see `provision_features_of_interest`.
+    """
+
+    def __init__(self):
+        self._ids: Dict[Tuple[SensorID, str], DatastreamId] = {}
+        self._features: Dict[Tuple[SensorID, str], FeatureId] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _key(
+        sensor_name: SensorID, datastream_name: ObservedProperties | str
+    ) -> Tuple[SensorID, str]:
+        if isinstance(datastream_name, ObservedProperties):
+            datastream_name = datastream_name.value
+        return (sensor_name, datastream_name)
+
+    def get(
+        self, sensor_name: SensorID, datastream_name: ObservedProperties | str
+    ) -> DatastreamId | None:
+        with self._lock:
+            datastream_id = self._ids.get(self._key(sensor_name, datastream_name))
+        netmon.add_count(
+            "datastream_route_hits"
+            if datastream_id is not None
+            else "datastream_route_misses",
+            1,
+        )
+        return datastream_id
+
+    def put(
+        self,
+        sensor_name: SensorID,
+        datastream_name: ObservedProperties | str,
+        datastream_id: DatastreamId,
+    ) -> None:
+        with self._lock:
+            self._ids[self._key(sensor_name, datastream_name)] = datastream_id
+
+    def feature_of_interest(
+        self, sensor_name: SensorID, datastream_name: ObservedProperties | str
+    ) -> FeatureId | None:
+        with self._lock:
+            return self._features.get(self._key(sensor_name, datastream_name))
+
+    def put_feature_of_interest(
+        self,
+        sensor_name: SensorID,
+        datastream_name: ObservedProperties | str,
+        feature_id: FeatureId,
+    ) -> None:
+        with self._lock:
+            self._features[self._key(sensor_name, datastream_name)] = feature_id
+
+    def invalidate(
+        self, sensor_name: SensorID, datastream_name: ObservedProperties | str
+    ) -> None:
+        # the FeatureOfInterest is kept, lookups only refill the Datastream id:
+        with self._lock:
+            self._ids.pop(self._key(sensor_name, datastream_name), None)
+
+    def invalidate_feature_of_interest(
+        self, sensor_name: SensorID, datastream_name: ObservedProperties | str
+    ) -> None:
+        with self._lock:
+            self._features.pop(self._key(sensor_name, datastream_name), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+            self._features.clear()
+
+
+datastream_routes = _DatastreamRoutingTable()
+
+
 def _check_frost_connection() -> None:
     """Check that FROST is functionally active."""
 
@@ -58,9 +165,9 @@ def _check_frost_connection() -> None:
         + "variable $FROST_ENDPOINT."
     )
     try:
-        with request.urlopen(datastream_url) as _:
-            logger.info("FROST connectivity confirmed.")
-            return None
+        get_frost_client().request("GET", datastream_url)
+        logger.info("FROST connectivity confirmed.")
+        return None
     except error.HTTPError as e:
         raise ConnectionError(f"{e}. {general_error_msg}") from None
     except error.URLError as e:
@@ -82,36 +189,25 @@ def check_existing_object(
         ):  # TODO: #5 Sort out references, sometimes plural, sometimes singular.
             if filter_query(
                 entity=ENTITY_ENDPOINTS[entity.st_type],
-                filter_string=f"name eq '{entity.name}'",
+                filter_string=f"name eq {_quote(entity.name)}",
                 url=None,
                 container_environment=CONTAINER_ENVIRONMENT,
             )["value"]:
                 return True
         case "Datastream":
-            # first, check if a datastream with a common name exists:
-            initial_response = filter_query(
+            # a datastream name is only unique per sensor, FROST matches both:
+            sensor_name = entity.iot_links["sensors"][0].name  # type: ignore
+            if filter_query(
                 entity="/Datastreams",
-                filter_string=f"name eq '{entity.name}'",
+                filter_string=(
+                    f"name eq {_quote(entity.name)} and "
+                    f"Sensor/name eq {_quote(sensor_name)}"
+                ),
                 url=None,
                 container_environment=CONTAINER_ENVIRONMENT,
-            )["value"]
-            # second, check if any of the datastreams with the same name also share a
-            # link with the sensor of the entity being checked by this function
-            if initial_response:
-                # If multiple sensors of the same type exist, `response` will be an
-                # array of datastreams. Iterate through all of responses:
-                for i in range(len(initial_response)):
-                    sensor_url = initial_response[i]["Sensor@iot.navigationLink"]  # type: ignore
-                    if container_environment:
-                        sensor_url = sensor_url.replace("localhost", "web")
-                    # TODO: #10 Handling of
-                    # localhost and web in containerized environments.
-                    sensor_request = request.Request(url=sensor_url, method="GET")
-                    with request.urlopen(sensor_request) as response:
-                        response = json.loads(response.read())
-                        response = response["name"]
-                        if response == entity.iot_links["sensors"][0].name:  # type: ignore
-                            return True
+                select="id",
+            )["value"]:
+                return True
     return False
 
 
@@ -121,6 +217,9 @@ def filter_query(
     entity: str | None,
     url: str | None,
     container_environment: bool,
+    select: str | None = None,
+    expand: str | None = None,
+    top: int | None = None,
 ) -> Dict[str, Any]:
     """
     Query the FROST server and return result.
@@ -134,43 +233,659 @@ def filter_query(
     :type entity: str
     :param container_environment: True is running in a container env.
     :type container_environment: bool
+    :param select: optional `$select`, e.g. `id,name`.
+    :param expand: optional `$expand`, e.g. `Sensor($select=name)`.
+    :param top: optional `$top`, the page size.
 
     """
-    frost_endpoint = os.getenv("FROST_ENDPOINT") or FROST_ENDPOINT_DEFAULT
+    client = get_frost_client()
+    query = "?$filter=" + quote(filter_string)
+    if select:
+        query += "&$select=" + quote(select)
+    if expand:
+        query += "&$expand=" + quote(expand)
+    if top:
+        query += f"&$top={top}"
     if not url:
-        query_url = frost_endpoint + f"{entity}?$filter=" + quote(filter_string)
+        query_url = client.url(f"{entity}{query}")
     else:
-        query_url = url + "?$filter=" + quote(filter_string)
-    if container_environment:
-        query_url = query_url.replace("localhost", "web")
-    get_request = request.Request(url=query_url, method="GET")
+        query_url = client.url(url + query)
     try:
-        with request.urlopen(get_request) as response:
-            response = json.loads(response.read())
-            return response
+        return client.get_json(query_url)
+    except error.HTTPError:
+        raise
     except error.URLError as e:
         logger.critical(
             "FROST connection refused, pointing to "
-            f"{frost_endpoint}. Is server up and listening? "
-            f"{get_request.full_url=}"
+            f"{client.base_url}. Is server up and listening? "
+            f"{query_url=}"
         )
         raise error.URLError(e)
 
 
-def initial_setup(sensor_arrangement: "SensorArrangement") -> str:
+def filter_query_all(
+    filter_string: str,
+    entity: str,
+    select: str | None = None,
+    expand: str | None = None,
+    top: int | None = None,
+) -> List[Dict[str, Any]]:
+    """`filter_query` following `@iot.nextLink`, return the entities of every page."""
+    response = filter_query(
+        filter_string,
+        entity=entity,
+        url=None,
+        container_environment=CONTAINER_ENVIRONMENT,
+        select=select,
+        expand=expand,
+        top=top,
+    )
+    entities = list(response["value"])
+    client = get_frost_client()
+    while response.get("@iot.nextLink"):
+        response = client.get_json(client.rewrite(response["@iot.nextLink"]))
+        entities.extend(response["value"])
+    return entities
+
+
+def _quote(value: str) -> str:
+    """An OData string literal, with single quotes escaped."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _id_literal(iot_id: Any) -> str:
+    """An `@iot.id` as an OData literal, FROST ids can be numbers or strings."""
+    return _quote(iot_id) if isinstance(iot_id, str) else str(iot_id)
+
+
+def query_names(
+    st_type: str,
+    names: Iterable[str],
+    field: str = "name",
+    select: str | None = None,
+    expand: str | None = None,
+    top: int | None = None,
+    batch_size: int = 50,
+) -> Iterator[Dict[str, Any]]:
+    """
+    The entities of `st_type` whose `field` is one of `names`, queried
+    `batch_size` names at a time, following `@iot.nextLink`.
+    """
+    names = sorted(set(names))
+    for i in range(0, len(names), batch_size):
+        yield from filter_query_all(
+            " or ".join(
+                f"{field} eq {_quote(name)}" for name in names[i : i + batch_size]
+            ),
+            entity=ENTITY_ENDPOINTS[st_type],
+            select=select,
+            expand=expand,
+            top=top,
+        )
+
+
+def batch_requests(
+    requests: List[Dict[str, Any]], batch_size: int = 100
+) -> List[Dict[str, Any]]:
+    """
+    Send `requests` as JSON `$batch` requests of up to `batch_size` each, return
+    the response to each request, in order.
+
+    A request holds a `method`, a `url` relative to the service root, e.g.
+    `Things(1)`, and an optional `body`. A request missing from FROST's answer
+    is returned as a response without `status`.
+    """
+    client = get_frost_client()
+    responses: List[Dict[str, Any]] = []
+    for i in range(0, len(requests), batch_size):
+        batch = [
+            {"id": str(n), **request}
+            for n, request in enumerate(requests[i : i + batch_size])
+        ]
+        answered = {
+            response["id"]: response
+            for response in client.post_json("/$batch", {"requests": batch}).json()[
+                "responses"
+            ]
+        }
+        responses.extend(answered.get(request["id"], {}) for request in batch)
+    return responses
+
+
+class EntityIndex:
+    """
+    name → `@iot.id` of the FROST entities a provisioning run touches.
+
+    `load` resolves many names with a few `$select=id,name` queries, so that
+    create vs skip can be decided without a query per entity. Datastream names
+    are only unique per sensor, they are keyed by (sensor name, name) and
+    loaded per sensor with `load_datastreams`. Entities created during the run
+    are `add`ed, which keeps the index current across sensor arrangements
+    sharing e.g. an ObservedProperty.
+
+    Arrangements provisioned in parallel `claim` the entities they are about
+    to create, so that an entity shared between them is created exactly once.
+
+    Parameters:
+        batch_size (int): names per query (and page size).
+    """
+
+    indexed_types = ("Thing", "Sensor", "ObservedProperty", "Datastream")
+
+    def __init__(self, batch_size: int = 50):
+        self.batch_size = batch_size
+        # private:
+        self._ids: Dict[str, Dict[Any, Any]] = defaultdict(dict)
+        # (st_type, key) → set once the claimant created (or failed to create) it:
+        self._claims: Dict[Tuple[str, Any], threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        sizes = {k: len(v) for k, v in self._ids.items()}
+        return f"EntityIndex({sizes})"
+
+    def __contains__(self, entity: "SensorThingsObject") -> bool:
+        return self.key(entity) in self._ids[entity.st_type]
+
+    @staticmethod
+    def key(entity: "SensorThingsObject") -> Any:
+        if entity.st_type == "Datastream":
+            return (entity.iot_links["sensors"][0].name, entity.name)  # type: ignore
+        return entity.name
+
+    def get(self, st_type: str, key: Any) -> Any:
+        return self._ids[st_type].get(key)
+
+    def add(self, st_type: str, key: Any, iot_id: Any) -> None:
+        with self._lock:
+            self._ids[st_type][key] = iot_id
+
+    def claim(
+        self, entities: Iterable["SensorThingsObject"]
+    ) -> List["SensorThingsObject"]:
+        """
+        Claim the missing `entities` for creation, return the claimed ones.
+
+        Entities claimed by another thread are waited for first. Claims are
+        only taken while none are pending, so a claimant never waits on
+        another one. Every claim must be `release`d once the entity has been
+        created, or has failed to.
+        """
+        keys = {(e.st_type, self.key(e)): e for e in entities if self.indexes(e)}
+        while True:
+            with self._lock:
+                pending = [self._claims[k] for k in keys if k in self._claims]
+                if not pending:
+                    claimed = [
+                        e for (st, key), e in keys.items() if key not in self._ids[st]
+                    ]
+                    for e in claimed:
+                        self._claims[(e.st_type, self.key(e))] = threading.Event()
+                    return claimed
+            for event in pending:
+                event.wait()
+
+    def release(self, entities: Iterable["SensorThingsObject"]) -> None:
+        with self._lock:
+            for e in entities:
+                event = self._claims.pop((e.st_type, self.key(e)), None)
+                if event is not None:
+                    event.set()
+
+    def indexes(self, entity: "SensorThingsObject") -> bool:
+        return entity.st_type in self.indexed_types
+
+    def load(self, st_type: str, names: Iterable[str]) -> None:
+        """Look up which of `names` exist, `batch_size` names per query."""
+        for found in query_names(
+            st_type,
+            set(names) - self._ids[st_type].keys(),
+            select="id,name",
+            top=self.batch_size,
+            batch_size=self.batch_size,
+        ):
+            self.add(st_type, found["name"], found["@iot.id"])
+
+    def load_datastreams(self, sensor_names: Iterable[str]) -> None:
+        """Look up the datastreams of `sensor_names`, `batch_size` sensors per query."""
+        for found in query_names(
+            "Datastream",
+            sensor_names,
+            field="Sensor/name",
+            select="id,name",
+            expand="Sensor($select=name)",
+            batch_size=self.batch_size,
+        ):
+            key = (found["Sensor"]["name"], found["name"])
+            self.add("Datastream", key, found["@iot.id"])
+
+    @classmethod
+    def for_arrangements(
+        cls, sensor_arrangements: Iterable["SensorArrangement"], **kwargs
+    ) -> "EntityIndex":
+        """An index of every indexed entity of the passed sensor arrangements."""
+        index = cls(**kwargs)
+        sensor_arrangements = list(sensor_arrangements)
+        for st_type in ("Thing", "Sensor", "ObservedProperty"):
+            index.load(
+                st_type,
+                (
+                    entity.name
+                    for sensor_arrangement in sensor_arrangements
+                    for entity in sensor_arrangement.get_entities(st_type)  # type: ignore
+                ),
+            )
+        index.load_datastreams(
+            entity.name
+            for sensor_arrangement in sensor_arrangements
+            for entity in sensor_arrangement.get_entities("Sensor")
+        )
+        return index
+
+
+def provision(
+    sensor_arrangements: Iterable["SensorArrangement"],
+    workers: int = 1,
+    on_provisioned: Callable[["SensorArrangement", str], object] | None = None,
+    registry: EntityRegistry | None = None,
+) -> List[str]:
+    """
+    Set up many sensor arrangements on the FROST server, return the sensor
+    model names of those set up successfully.
+
+    Existing Things, Sensors and ObservedProperties are looked up in batches
+    for all arrangements at once, instead of once per entity. Arrangements are
+    then set up by up to `workers` threads; `on_provisioned` is called with
+    each arrangement and its sensor model name as soon as it is set up. An
+    arrangement failing to set up is logged and skipped.
+
+    With a `registry`, arrangements whose config is unchanged since they were
+    registered are routed from the registry instead, after one batched query
+    confirming that their Datastreams still exist. Arrangements set up on
+    FROST are registered.
+
+    The arrangements set up on FROST are merged into a `FleetArrangement`, so
+    that an entity shared between them is provisioned once, and a new Thing
+    shared between them is deep inserted once with all of their Datastreams.
+
+    A FeatureOfInterest is provisioned up front for every Location, see
+    `provision_features_of_interest`.
+    """
+    sensor_arrangements = list(sensor_arrangements)
+    _check_frost_connection()
+    try:
+        provision_features_of_interest(sensor_arrangements)
+    except (error.URLError, KeyError) as e:
+        logger.warning(
+            f"Unable to provision FeaturesOfInterest, FROST will derive one for "
+            f"every Observation: {e}"
+        )
+    registered = (
+        _registered_datastreams(sensor_arrangements, registry) if registry else {}
+    )
+    for sensor_arrangement in sensor_arrangements:
+        sensor_model = _sensor_name(sensor_arrangement)
+        if sensor_model in registered:
+            for datastream_name, datastream_id in registered[sensor_model].items():
+                datastream_routes.put(sensor_model, datastream_name, datastream_id)
+            if on_provisioned is not None:
+                on_provisioned(sensor_arrangement, sensor_model)
+    if registered:
+        event_logger.info(f"{len(registered)} sensors routed from {registry}.")
+    unregistered = [
+        sensor_arrangement
+        for sensor_arrangement in sensor_arrangements
+        if _sensor_name(sensor_arrangement) not in registered
+    ]
+    fleet = FleetArrangement(unregistered)
+    index = EntityIndex.for_arrangements(unregistered)
+    debug_logger.debug(f"{fleet}, {index}")
+
+    def setup(sensor_arrangement: "SensorArrangement") -> str | None:
+        sensor_model = _sensor_name(sensor_arrangement)
+        if sensor_model in registered:
+            return sensor_model
+        try:
+            sensor_model = initial_setup(sensor_arrangement, index=index, fleet=fleet)
+        except Exception as e:
+            logger.critical(f"Unable to set up {sensor_arrangement}: {e}")
+            return None
+        if registry is not None:
+            _register(sensor_arrangement, index, registry)
+        if on_provisioned is not None:
+            on_provisioned(sensor_arrangement, sensor_model)
+        return sensor_model
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="provision"
+    ) as executor:
+        sensor_models = list(executor.map(setup, sensor_arrangements))
+    return [sensor_model for sensor_model in sensor_models if sensor_model]
+
+
+def provision_with_retries(
+    sensor_arrangements: Iterable["SensorArrangement"],
+    workers: int = 1,
+    on_provisioned: Callable[["SensorArrangement", str], object] | None = None,
+    open_registry: Callable[[], EntityRegistry] | None = None,
+    retry_delay: float = 5,
+    max_retry_delay: float = 300,
+) -> List[str]:
+    """
+    `provision`, retried while it fails as a whole (FROST unreachable, a
+    failing index query, an entity registry error) with exponential backoff
+    from `retry_delay` up to `max_retry_delay` seconds. Each retry sets up the
+    arrangements not set up yet; return the sensor model names of all those
+    set up. Arrangements which fail on their own are left out, as by
+    `provision`.
+
+    The entity registry is opened with `open_registry` on every attempt.
+    """
+    pending = list(sensor_arrangements)
+    provisioned: List[str] = []
+
+    def register(sensor_arrangement: "SensorArrangement", sensor_model: str):
+        provisioned.append(sensor_model)
+        if on_provisioned is not None:
+            on_provisioned(sensor_arrangement, sensor_model)
+
+    delay = retry_delay
+    while True:
+        try:
+            provision(
+                pending,
+                workers=workers,
+                on_provisioned=register,
+                registry=open_registry() if open_registry is not None else None,
+            )
+            return provisioned
+        except Exception as e:
+            logger.critical(f"Provisioning failed, retrying in {delay:.0f}s: {e!r}")
+        time.sleep(delay)
+        delay = min(delay * 2, max_retry_delay)
+        pending = [sa for sa in pending if _sensor_name(sa) not in provisioned]
+
+
+def provision_features_of_interest(
+    sensor_arrangements: Iterable["SensorArrangement"], batch_size: int = 50
+) -> Dict[str, FeatureId]:
+    """
+    Make sure a FeatureOfInterest exists for the Location of every Thing of the
+    arrangements, route it for their Datastreams, and return the id of each by
+    Location name.
+
+    An Observation created without a FeatureOfInterest makes FROST look up
+    (or compare and create) the one of its Thing's Location on every insert;
+    observations referencing the routed FeatureOfInterest skip that. Existing
+    FeaturesOfInterest, also those FROST derived before, are matched by name
+    in batches of `batch_size`.
+    """
+    sensor_arrangements = list(sensor_arrangements)
+    locations = {
+        location.name: location
+        for sensor_arrangement in sensor_arrangements
+        for thing in sensor_arrangement.get_entities("Thing")
+        for location in thing.iot_links.get("locations", [])
+    }
+    features: Dict[str, FeatureId] = {
+        found["name"]: found["@iot.id"]
+        for found in query_names(
+            "FeatureOfInterest",
+            locations,
+            select="id,name",
+            top=batch_size,
+            batch_size=batch_size,
+        )
+    }
+    for name, location in locations.items():
+        if name not in features:
+            created = make_frost_object(
+                FeatureOfInterest.from_location(location),  # type: ignore
+                resolve_links=False,
+            )
+            features[name] = _iot_id(created["self_url"])
+    for sensor_arrangement in sensor_arrangements:
+        sensor_model = _sensor_name(sensor_arrangement)
+        for ds in sensor_arrangement.get_entities("Datastream"):
+            thing = ds.iot_links["things"][0]  # type: ignore
+            thing_locations = thing.iot_links.get("locations")  # type: ignore
+            if thing_locations:
+                datastream_routes.put_feature_of_interest(
+                    sensor_model, ds.name, features[thing_locations[0].name]
+                )
+    return features
+
+
+def _sensor_name(sensor_arrangement: "SensorArrangement") -> SensorID:
+    return sensor_arrangement.get_entities("Sensor")[-1].name
+
+
+def _registered_datastreams(
+    sensor_arrangements: List["SensorArrangement"], registry: EntityRegistry
+) -> Dict[SensorID, Dict[str, DatastreamId]]:
+    """
+    Datastream name → id of each arrangement registered with an unchanged
+    config, if all of its Datastreams still exist on the server.
+
+    Removing a Thing, Sensor or ObservedProperty on the server removes its
+    Datastreams too, so checking the Datastreams suffices.
+    """
+    registered: Dict[SensorID, Dict[str, DatastreamId]] = {}
+    for sensor_arrangement in sensor_arrangements:
+        sensor_name = _sensor_name(sensor_arrangement)
+        entity_ids = registry.lookup(sensor_name, config_hash(sensor_arrangement))
+        if entity_ids is not None:
+            registered[sensor_name] = {
+                name: iot_id
+                for (st_type, name), iot_id in entity_ids.items()
+                if st_type == "Datastream"
+            }
+    existing = _existing_ids(
+        "Datastream", [i for ids in registered.values() for i in ids.values()]
+    )
+    for sensor_name, datastream_ids in list(registered.items()):
+        if not set(datastream_ids.values()) <= existing:
+            logger.warning(
+                f"Registered Datastreams of {sensor_name} were removed from "
+                "FROST, setting it up again."
+            )
+            registry.forget(sensor_name)
+            del registered[sensor_name]
+    return registered
+
+
+def _existing_ids(
+    st_type: str, iot_ids: Iterable[Any], batch_size: int = 50
+) -> set[Any]:
+    """Those of `iot_ids` which exist on the server, `batch_size` per query."""
+    iot_ids = list(dict.fromkeys(iot_ids))
+    existing: set[Any] = set()
+    for i in range(0, len(iot_ids), batch_size):
+        batch = iot_ids[i : i + batch_size]
+        existing.update(
+            found["@iot.id"]
+            for found in filter_query_all(
+                " or ".join(f"id eq {_id_literal(iot_id)}" for iot_id in batch),
+                entity=ENTITY_ENDPOINTS[st_type],
+                select="id",
+                top=batch_size,
+            )
+        )
+    return existing
+
+
+def _register(
+    sensor_arrangement: "SensorArrangement",
+    index: EntityIndex,
+    registry: EntityRegistry,
+) -> None:
+    """Register the ids of a set up arrangement, unless some are unknown."""
+    entity_ids = {
+        (entity.st_type, entity.name): index.get(entity.st_type, index.key(entity))
+        for entity in sensor_arrangement.linked_arrangement
+        if index.indexes(entity)
+    }
+    if None in entity_ids.values():
+        return
+    registry.register(
+        _sensor_name(sensor_arrangement), config_hash(sensor_arrangement), entity_ids
+    )
+
+
+def initial_setup(
+    sensor_arrangement: "SensorArrangement",
+    index: EntityIndex | None = None,
+    fleet: FleetArrangement | None = None,
+) -> str:
     """
     Initial set up of a Sensor Arrangement on the FROST server. Returns the
     name of the sensor model.
 
     Commit the sensor arrangement to the FROST server, including the
     relationships between the sensor things objects. This process occurs only
-    when setting up an arranagement for the first time.
+    when setting up an arranagement for the first time. Existing entities are
+    looked up in `index`, which is built for this arrangement if not passed
+    (see `provision` for many arrangements).
+
+    A new arrangement is created with a deep insert per Thing, an arrangement
+    which partially exists already entity by entity. Within a `fleet`, the
+    deep insert of a Thing includes the Datastreams of every arrangement
+    linking it.
     """
 
-    _check_frost_connection()
+    if index is None:
+        _check_frost_connection()
+        index = EntityIndex.for_arrangements([sensor_arrangement])
     debug_logger.debug(sensor_arrangement.get_entities("Thing"))
+    sharing = (
+        fleet.sharing_things(sensor_arrangement)
+        if fleet is not None
+        else [sensor_arrangement]
+    )
+    # entities shared with arrangements set up in parallel are created once:
+    claimed = index.claim(
+        entity
+        for arrangement in sharing
+        for entity in arrangement.linked_arrangement
+    )
+    try:
+        if _deep_insertable(sensor_arrangement, index, sharing):
+            _deep_insert(sensor_arrangement, index, fleet)
+        else:
+            _insert_entities(sensor_arrangement, index)
+    finally:
+        index.release(claimed)
+    sensor_model = _sensor_name(sensor_arrangement)
+    # route from the index, unless a datastream failed to be created:
+    datastream_ids = {
+        ds.name: index.get("Datastream", index.key(ds))
+        for ds in sensor_arrangement.get_entities("Datastream")
+    }
+    if None in datastream_ids.values():
+        _route_datastreams(sensor_model)
+    else:
+        for datastream_name, datastream_id in datastream_ids.items():
+            datastream_routes.put(sensor_model, datastream_name, datastream_id)
+    return sensor_model
+
+
+def _thing_datastreams(
+    sensor_arrangement: "SensorArrangement",
+    sharing: Iterable["SensorArrangement"],
+) -> List["SensorThingsObject"]:
+    """The Datastreams of the `sharing` arrangements on the arrangement's Things."""
+    things = {thing.name for thing in sensor_arrangement.get_entities("Thing")}
+    return [
+        ds
+        for arrangement in sharing
+        for ds in arrangement.get_entities("Datastream")
+        if ds.iot_links["things"][0].name in things  # type: ignore
+    ]
+
+
+def _deep_insertable(
+    sensor_arrangement: "SensorArrangement",
+    index: EntityIndex,
+    sharing: Iterable["SensorArrangement"] = (),
+) -> bool:
+    """
+    True if none of the Things of an arrangement exist, nor any Datastream on
+    them, of the arrangement or of those `sharing` its Things.
+    """
+    return not any(
+        entity in index
+        for entity in (
+            *sensor_arrangement.get_entities("Thing"),
+            *_thing_datastreams(sensor_arrangement, [sensor_arrangement, *sharing]),
+        )
+    )
+
+
+def _deep_insert(
+    sensor_arrangement: "SensorArrangement",
+    index: EntityIndex,
+    fleet: FleetArrangement | None = None,
+) -> None:
+    """
+    Create an arrangement with one deep insert POST per Thing, including the
+    Datastreams of the arrangements of the `fleet` sharing the Thing.
+
+    New entities shared by several Datastreams (the Sensor, an ObservedProperty
+    measured twice) would be created once per Datastream if nested, so they
+    are created beforehand. The ids FROST assigned are read back into `index`
+    with one (paged) GET per Thing.
+    """
+    client = get_frost_client()
+    source = fleet if fleet is not None else sensor_arrangement
+    datastreams = _thing_datastreams(
+        sensor_arrangement,
+        fleet.sharing_things(sensor_arrangement)
+        if fleet is not None
+        else [sensor_arrangement],
+    )
+    shared = Counter(
+        linked
+        for ds in datastreams
+        for link in ("sensors", "observedProperties")
+        for linked in ds.iot_links[link]  # type: ignore
+    )
+    for entity, count in shared.items():
+        if count > 1 and entity not in index:
+            make_frost_object(entity, resolve_links=False, index=index)  # type: ignore
+
+    for thing in sensor_arrangement.get_entities("Thing"):
+        payload = source.deep_insert(
+            thing, lambda entity: index.get(entity.st_type, index.key(entity))
+        )
+        response = client.post_json(ENTITY_ENDPOINTS["Thing"], payload)
+        thing_url = client.rewrite(response.getheader("Location") or "")
+        logger.info(
+            f"New Thing created at {thing_url} with "
+            f"{len(payload['Datastreams'])} Datastreams."
+        )
+        index.add("Thing", thing.name, _iot_id(thing_url))
+        page_url: str | None = (
+            thing_url
+            + "/Datastreams?$select=id,name&$expand="
+            + quote("Sensor($select=id,name),ObservedProperty($select=id,name)")
+        )
+        while page_url:
+            page = client.get_json(page_url)
+            for ds in page["value"]:
+                sensor, op = ds["Sensor"], ds["ObservedProperty"]
+                index.add("Sensor", sensor["name"], sensor["@iot.id"])
+                index.add("ObservedProperty", op["name"], op["@iot.id"])
+                index.add("Datastream", (sensor["name"], ds["name"]), ds["@iot.id"])
+            next_link = page.get("@iot.nextLink")
+            page_url = client.rewrite(next_link) if next_link else None
+
+
+def _insert_entities(
+    sensor_arrangement: "SensorArrangement", index: EntityIndex
+) -> None:
+    """Create the missing entities of an arrangement one by one."""
     for thing in sensor_arrangement.get_entities("Thing"):
-        make_thing = make_frost_object(thing)
+        make_thing = make_frost_object(thing, index=index)
         debug_logger.debug(make_thing)
         if not make_thing:
             break
@@ -178,53 +893,62 @@ def initial_setup(sensor_arrangement: "SensorArrangement") -> str:
         # lookup linked locations of the thing and make them:
         for loc in thing.iot_links["locations"]:
             # pass URL of newly generated Thing's Locations to the maker:
-            debug_logger.debug(make_frost_object(loc, iot_url))
+            debug_logger.debug(make_frost_object(loc, iot_url, resolve_links=False))
     # Make Sensors, which are associated only with Datastreams, which are linked later
     for sen in sensor_arrangement.get_entities("Sensor"):
-        debug_logger.debug(make_frost_object(sen))
-        sensor_model = sen.name
+        debug_logger.debug(make_frost_object(sen, resolve_links=False, index=index))
     # Make ObservedProperties, also linked later with a Datastream
     for op in sensor_arrangement.get_entities("ObservedProperty"):
-        debug_logger.debug(make_frost_object(op))
+        debug_logger.debug(make_frost_object(op, resolve_links=False, index=index))
     # Make Datastreams, linked with a one Sensor, one ObservedProperty and one Thing
     for ds in sensor_arrangement.get_entities("Datastream"):
-        # Lookup the names's of the relevant Sensor, ObservedProperty and Thing:
-        sen_name = ds.iot_links["sensors"][0].name  # only 1 object in list
-        oprop_name = ds.iot_links["observedProperties"][0].name
-        thing_name = ds.iot_links["things"][0].name
-        # Query server and lookup ids:
-        debug_logger.info(locals())
-        sen_id = filter_query(
-            entity="/Sensors",
-            filter_string=f"name eq '{sen_name}'",
-            url=None,
-            container_environment=CONTAINER_ENVIRONMENT,
-        )["value"][0]["@iot.id"]  # type: ignore
-        oprop_id = filter_query(
-            entity="/ObservedProperties",
-            filter_string=f"name eq '{oprop_name}'",
-            url=None,
-            container_environment=CONTAINER_ENVIRONMENT,
-        )["value"][0]["@iot.id"]  # type: ignore
-        thing_id = filter_query(
-            entity="/Things",
-            filter_string=f"name eq '{thing_name}'",
-            url=None,
-            container_environment=CONTAINER_ENVIRONMENT,
-        )["value"][0]["@iot.id"]  # type: ignore
+        # Lookup the ids of the relevant Sensor, ObservedProperty and Thing:
+        sen_id = _indexed_id(index, "Sensor", ds.iot_links["sensors"][0].name)
+        oprop_id = _indexed_id(
+            index, "ObservedProperty", ds.iot_links["observedProperties"][0].name
+        )
+        thing_id = _indexed_id(index, "Thing", ds.iot_links["things"][0].name)
         make_frost_datastream(
             ds,
             sensor_id=int(sen_id),
             thing_id=int(thing_id),
             observed_property_id=int(oprop_id),
+            index=index,
         )
-    return sensor_model
+
+
+def _indexed_id(index: EntityIndex, st_type: str, name: str) -> Any:
+    """The id of an entity from `index`, queried (and indexed) if missing."""
+    iot_id = index.get(st_type, name)
+    if iot_id is None:
+        iot_id = filter_query(
+            entity=ENTITY_ENDPOINTS[st_type],
+            filter_string=f"name eq {_quote(name)}",
+            url=None,
+            container_environment=CONTAINER_ENVIRONMENT,
+        )["value"][0]["@iot.id"]
+        index.add(st_type, name, iot_id)
+    return iot_id
+
+
+def _route_datastreams(sensor_name: SensorID) -> None:
+    """Add the ids of every Datastream of a sensor to the routing table."""
+    datastreams = filter_query(
+        entity="/Datastreams",
+        filter_string=f"Sensor/name eq {_quote(sensor_name)}",
+        url=None,
+        container_environment=CONTAINER_ENVIRONMENT,
+    )["value"]
+    for ds in datastreams:
+        datastream_routes.put(sensor_name, ds["name"], ds["@iot.id"])
 
 
 def make_frost_object(
     entity: Union["SensorThingsObject", "Observation"],
     iot_url: str | None = None,
     application_name: str | None = None,
+    resolve_links: bool = True,
+    index: EntityIndex | None = None,
 ) -> Dict[str, str]:
     """
     Add a a SensorThingsObject to the FROST server, return FROST IoT Link.
@@ -232,10 +956,21 @@ def make_frost_object(
     Pass a SensorThingsObject and add it to FROST. Passing an `iot_url` pushes
     the object FROST URL (i.e., links the passed object to the the object) in
     the IoT URL.
+
+    Resolving the navigation links of the new object costs a read-back GET. It
+    is skipped for Observations and whenever `resolve_links` is False, in which
+    case only the self URL and the id taken from the `Location` header are
+    returned.
+
+    With an `index`, existence is decided from the index (for the entity types
+    it holds) and created entities are added to it.
     """
 
-    frost_endpoint = os.getenv("FROST_ENDPOINT") or FROST_ENDPOINT_DEFAULT
-    if check_existing_object(entity, CONTAINER_ENVIRONMENT):
+    if index is not None and index.indexes(entity):  # type: ignore
+        exists = entity in index  # type: ignore
+    else:
+        exists = check_existing_object(entity, CONTAINER_ENVIRONMENT)
+    if exists:
         logger.info(f"Creation Skipped: {entity.st_type} {entity.name} already exists.")
         return {}
 
@@ -252,37 +987,29 @@ def make_frost_object(
 
     application_name = application_name or ""
     expected_links = expected_links_map[entity.st_type]
-    url = iot_url or (frost_endpoint + ENTITY_ENDPOINTS[entity.st_type])
-    if CONTAINER_ENVIRONMENT:
-        url = url.replace("localhost", "web")
+    client = get_frost_client()
+    url = iot_url or ENTITY_ENDPOINTS[entity.st_type]
 
-    post_request = request.Request(
-        url=url,
-        data=entity.model_dump_json(exclude={"iot_links", "id", "st_type"}).encode(
+    # HTTP errors propagate; observation failures are counted by the uploader.
+    response = client.post_json(
+        url,
+        entity.model_dump_json(exclude={"iot_links", "id", "st_type"}).encode(
             "UTF-8"
         ),
-        method="POST",
     )
-    post_request.add_header("Content-Type", "application/json")
-    post_request.add_header("Authorization", f"Basic {FROST_CREDENTIALS}")
-
-    try:
-        with request.urlopen(post_request) as response:
-            new_object_url = response.getheader(
-                "Location"
-            )  # "Location" does not refer to a SensorThings Location
-            logger.info(f"New {entity.st_type} created at {new_object_url}")
-    except error.HTTPError as e:
-        if isinstance(entity, Observation):
-            pass
-        else:
-            raise e
+    # "Location" does not refer to a SensorThings Location
+    new_object_url = client.rewrite(response.getheader("Location") or "")
+    logger.info(f"New {entity.st_type} created at {new_object_url}")
+    if index is not None and index.indexes(entity):  # type: ignore
+        index.add(entity.st_type, index.key(entity), _iot_id(new_object_url))
 
-    if CONTAINER_ENVIRONMENT:
-        new_object_url = new_object_url.replace("localhost", "web")
+    if isinstance(entity, Observation) or not resolve_links:
+        return {
+            "self_url": new_object_url,
+            "iot_id": _id_from_location(new_object_url) or "",
+        }
 
-    with request.urlopen(new_object_url) as response:
-        response = json.loads(response.read())
+    response = client.get_json(new_object_url)
 
     iot_links = {
         str.lower(link_name + "_url"): response[link_name + "@iot.navigationLink"]
@@ -292,17 +1019,32 @@ def make_frost_object(
     return iot_links
 
 
+def _id_from_location(location: str) -> str | None:
+    """Return the `@iot.id` at the end of a FROST self link, e.g. `.../Things(4)`."""
+    match = re.search(r"\(([^()]+)\)$", location)
+    return match.group(1).strip("'") if match else None
+
+
+def _iot_id(location: str) -> Any:
+    """`_id_from_location`, as an int for servers with numeric ids."""
+    iot_id = _id_from_location(location)
+    return int(iot_id) if iot_id and iot_id.isdigit() else iot_id
+
+
 def make_frost_datastream(
     entity: "Datastream",
     sensor_id: int,
     thing_id: int,
     observed_property_id: int,
+    index: EntityIndex | None = None,
 ) -> None:
-    frost_endpoint = os.getenv("FROST_ENDPOINT") or FROST_ENDPOINT_DEFAULT
-    if check_existing_object(entity, CONTAINER_ENVIRONMENT):
+    if index is not None:
+        exists = entity in index
+    else:
+        exists = check_existing_object(entity, CONTAINER_ENVIRONMENT)
+    if exists:
         logger.info(f"Creation Skipped: {entity.st_type} {entity.name} already exists.")
         return None
-    url = frost_endpoint + "/Datastreams"
     data = entity.model_dump(exclude={"iot_links", "id", "st_type"})
     links = {
         "Thing": {"@iot.id": thing_id},
@@ -310,56 +1052,71 @@ def make_frost_datastream(
         "ObservedProperty": {"@iot.id": observed_property_id},
     }
     data.update(links)
-    data = json.dumps(data).encode()
-    post_request = request.Request(url=url, data=data, method="POST")
-    post_request.add_header("Content-Type", "application/json")
-    post_request.add_header("Authorization", f"Basic {FROST_CREDENTIALS}")
     try:
-        with request.urlopen(post_request) as response:
-            new_object_url = response.getheader(
-                "Location"
-            )  # "Location" does not refer to a SensorThings Location
-            logger.info(f"New Datastream created at {new_object_url}")
+        response = get_frost_client().post_json("/Datastreams", data)
+        # "Location" does not refer to a SensorThings Location
+        new_object_url = response.getheader("Location")
+        logger.info(f"New Datastream created at {new_object_url}")
+        if index is not None:
+            index.add("Datastream", index.key(entity), _iot_id(new_object_url or ""))
     except error.HTTPError as e:
         logger.critical(f"{e} {e.read()}")
 
 
-def find_datastream_url(
-    sensor_name: str,
-    datastream_name: ObservedProperties,
-    container_environment: bool,
-) -> UrlStr:
-    """Query the FROST server, find the push URL associated with the passed sensor_name and datastream name."""
-    frost_sensors = filter_query(
-        entity="/Sensors",
-        filter_string=f"name eq '{sensor_name}'",
+def find_datastream_id(
+    sensor_name: SensorID, datastream_name: ObservedProperties | str
+) -> DatastreamId | None:
+    """Query the FROST server for the id of a sensor's datastream."""
+    if isinstance(datastream_name, ObservedProperties):
+        datastream_name = datastream_name.value
+    datastreams = filter_query(
+        entity="/Datastreams",
+        filter_string=(
+            f"name eq {_quote(datastream_name)} and "
+            f"Sensor/name eq {_quote(sensor_name)}"
+        ),
         url=None,
-        container_environment=container_environment,
+        container_environment=CONTAINER_ENVIRONMENT,
+    )["value"]
+    if not datastreams:
+        logger.warning(f"Datastream {datastream_name} not found for {sensor_name}.")
+        return None
+    return datastreams[0]["@iot.id"]
+
+
+def get_datastream_id(
+    sensor_name: SensorID, datastream_name: ObservedProperties | str
+) -> DatastreamId | None:
+    """Return the id of a datastream, from the routing table where possible."""
+    datastream_id = datastream_routes.get(sensor_name, datastream_name)
+    if datastream_id is None:
+        datastream_id = find_datastream_id(sensor_name, datastream_name)
+        if datastream_id is not None:
+            datastream_routes.put(sensor_name, datastream_name, datastream_id)
+    return datastream_id
+
+
+def observation_fields(
+    observation: Observation, feature_id: FeatureId | None = None
+) -> Dict[str, Any]:
+    """The fields creating `observation`, referencing its FeatureOfInterest."""
+    fields = observation.model_dump(
+        mode="json", exclude={"iot_links", "id", "st_type"}
     )
-    try:
-        # url to datastreams associated with sensor.
-        # TODO: better handling of unfound datastreams.
-        logger.debug(f"{sensor_name=}, {datastream_name=}")
-        sensor_datastream_url = frost_sensors["value"][0][
-            "Datastreams@iot.navigationLink"
-        ]
-        # query with the datastreams url to return the datastream with
-        # the same name as <datastream_name>
-        datastream = filter_query(
-            entity=None,
-            filter_string=f"name eq '{datastream_name}'",
-            url=sensor_datastream_url,
-            container_environment=CONTAINER_ENVIRONMENT,
-        )
+    if feature_id is not None:
+        fields["FeatureOfInterest"] = {"@iot.id": feature_id}
+    return fields
 
-        push_link = datastream["value"][0]["Observations@iot.navigationLink"]
-        return push_link
-    except IndexError as e:
-        if "list index out of range" in str(e):
-            logger.warning(
-                f"Datastream {datastream_name} not found for " + f"{sensor_name}."
-            )
-            return ""
+
+def observation_body(
+    observation: Observation,
+    datastream_id: DatastreamId,
+    feature_id: FeatureId | None = None,
+) -> bytes:
+    """JSON body creating `observation` in a Datastream, for `/Observations`."""
+    body = observation_fields(observation, feature_id)
+    body["Datastream"] = {"@iot.id": datastream_id}
+    return json.dumps(body).encode("UTF-8")
 
 
 def observation_to_sensor_trace(url: str, return_url: bool = False) -> str | None:
@@ -370,26 +1127,15 @@ def observation_to_sensor_trace(url: str, return_url: bool = False) -> str | Non
             + f"Check the URL passed: {url}"
         )
         return None
-    if CONTAINER_ENVIRONMENT:
-        url = url.replace("localhost", "web")
-
+    client = get_frost_client()
     try:
-        with request.urlopen(url) as response:
-            datastream_url = json.loads(response.read())[
-                "Datastream@iot.navigationLink"
-            ]
-        if CONTAINER_ENVIRONMENT:
-            datastream_url = datastream_url.replace("localhost", "web")
-
-        with request.urlopen(datastream_url) as response:
-            sensor_url = json.loads(response.read())["Sensor@iot.navigationLink"]
-            if CONTAINER_ENVIRONMENT:
-                sensor_url = sensor_url.replace("localhost", "web")
-
-            if return_url:
-                return sensor_url
-        with request.urlopen(sensor_url) as response:
-            return json.loads(response.read())["name"]
+        datastream_url = client.get_json(url)["Datastream@iot.navigationLink"]
+        sensor_url = client.rewrite(
+            client.get_json(datastream_url)["Sensor@iot.navigationLink"]
+        )
+        if return_url:
+            return sensor_url
+        return client.get_json(sensor_url)["name"]
 
     except error.URLError as e:
         logger.warning(
@@ -399,18 +1145,62 @@ def observation_to_sensor_trace(url: str, return_url: bool = False) -> str | Non
         logger.warning(f"Missing expected key: {e}")
 
 
+def invalidate_stale_route(
+    sensor_name: SensorID,
+    datastream_name: ObservedProperties | str,
+    e: error.HTTPError,
+) -> None:
+    """
+    Drop the routed ids of an observation FROST rejected with `e` which the
+    rejection shows to be stale: the Datastream id on a 404/410, or on a 400
+    whose message names the Datastream; the FeatureOfInterest id only if the
+    message names it, as it is not looked up again after provisioning.
+    """
+    if e.code != 400 and e.code not in STALE_ROUTE_CODES:
+        return
+    try:
+        message = e.read().decode("UTF-8", "replace")
+    except Exception:
+        message = ""
+    if "FeatureOfInterest" in message:
+        datastream_routes.invalidate_feature_of_interest(sensor_name, datastream_name)
+    elif e.code in STALE_ROUTE_CODES or "Datastream" in message:
+        datastream_routes.invalidate(sensor_name, datastream_name)
+
+
 def frost_observation_upload(
     sensor_name: SensorID,
     observation_set: Tuple[Observation, ObservedProperties],
     app_name: str | None = None,
 ) -> None:
-    """Upload an observation set to the FROST server."""
+    """
+    Upload an observation set to the FROST server.
+
+    The observation is POSTed to `/Observations`, referencing its Datastream
+    and FeatureOfInterest by the ids kept in the routing table.
+    """
     observation, datastream_name = observation_set
-    push_link = find_datastream_url(sensor_name, datastream_name, CONTAINER_ENVIRONMENT)
     try:
-        make_frost_object(observation, push_link, app_name)
+        datastream_id = get_datastream_id(sensor_name, datastream_name)
+        if datastream_id is None:
+            raise FrostUploadFailure(
+                f"No datastream {datastream_name} found for {sensor_name}."
+            )
+        get_frost_client().post_json(
+            ENTITY_ENDPOINTS["Observation"],
+            observation_body(
+                observation,
+                datastream_id,
+                datastream_routes.feature_of_interest(sensor_name, datastream_name),
+            ),
+        )
         netmon.add_named_count("push_success", sensor_name, 1)
         netmon.add_named_time("last_push_time", sensor_name, time.time())
+    except error.HTTPError as e:
+        # the datastream may have been removed server side:
+        invalidate_stale_route(sensor_name, datastream_name, e)
+        netmon.add_named_count("push_fail", sensor_name, 1)
+        raise FrostUploadFailure(f"Unable to upload payload: {e}")
     except Exception as e:
         netmon.add_named_count("push_fail", sensor_name, 1)
         raise FrostUploadFailure(f"Unable to upload payload: {e}")
@@ -0,0 +1,581 @@
+"""
+Asyncio interactions with FROST API.
+
+Mirrors the upload path of `frost.py` (`filter_query`, `make_frost_object`,
+`make_frost_datastream`, `frost_observation_upload`) on top of an asyncio
+client which pipelines requests over a few keep-alive connections, so that a
+single event loop can keep hundreds of uploads in flight.
+"""
+
+# standard
+import asyncio
+import collections
+import io
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Tuple, Union, TYPE_CHECKING
+from urllib import error
+from urllib.parse import quote, urlsplit, urlunsplit
+
+# internal
+from sensorthings_utils.config import (
+    CONTAINER_ENVIRONMENT,
+    FROST_CREDENTIALS,
+    FROST_ENDPOINT_DEFAULT,
+)
+from sensorthings_utils.exceptions import FrostUploadFailure
+from sensorthings_utils.frost import (
+    ENTITY_ENDPOINTS,
+    DatastreamId,
+    _id_from_location,
+    _quote,
+    datastream_routes,
+    invalidate_stale_route,
+    observation_body,
+)
+from sensorthings_utils.frost_client import (
+    _IDEMPOTENT_METHODS,
+    FrostResponse,
+    _FrostClientBase,
+)
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.transformers.types import ObservedProperties, SensorID
+
+# typing
+if TYPE_CHECKING:
+    from sensorthings_utils.sensor_things.core import Datastream, SensorThingsObject
+
+logger = logging.getLogger(__name__)
+debug_logger = logging.getLogger("debug")
+
+__all__ = [
+    "AsyncFrostClient",
+    "get_async_frost_client",
+    "filter_query",
+    "make_frost_object",
+    "make_frost_datastream",
+    "find_datastream_id",
+    "get_datastream_id",
+    "frost_observation_upload",
+]
+
+
+class _ConnectionClosed(error.URLError):
+    """
+    The connection closed before the response to a request was read.
+
+    `sent` is False if the request was never written, so FROST cannot have
+    acted on it.
+    """
+
+    def __init__(self, reason: object, sent: bool = True):
+        super().__init__(reason)
+        self.sent = sent
+
+
+class _PipelinedConnection:
+    """
+    A keep-alive HTTP/1.1 connection with pipelined requests.
+
+    Requests are written as soon as they are made, without waiting for earlier
+    responses. HTTP/1.1 answers in request order, so a single reader task
+    resolves the pending futures first in, first out.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        self.closed = False
+        # private:
+        self._reader = reader
+        self._writer = writer
+        self._pending: collections.deque[asyncio.Future] = collections.deque()
+        self._wakeup = asyncio.Event()
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def request(self, raw_request: bytes) -> FrostResponse:
+        if self.closed:
+            raise _ConnectionClosed("connection closed", sent=False)
+        future = asyncio.get_running_loop().create_future()
+        # queue the future and write in one step, keeping both in order:
+        self._pending.append(future)
+        self._writer.write(raw_request)
+        self._wakeup.set()
+        try:
+            await self._writer.drain()
+        except (ConnectionError, OSError) as e:
+            self.close(e)
+        return await future
+
+    async def _read_loop(self) -> None:
+        reason: Exception | None = None
+        try:
+            while True:
+                if not self._pending:
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+                    continue
+                response, will_close = await _read_response(self._reader)
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_result(response)
+                if will_close:
+                    break
+        except asyncio.CancelledError:
+            reason = ConnectionAbortedError("connection closed by client")
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, ValueError) as e:
+            reason = e
+        finally:
+            self._fail_pending(reason)
+
+    def _fail_pending(self, reason: Exception | None) -> None:
+        self.closed = True
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(
+                    _ConnectionClosed(reason or "connection closed by FROST")
+                )
+        self._writer.close()
+
+    def close(self, reason: Exception | None = None) -> None:
+        if not self.closed:
+            self._reader_task.cancel()
+            self._fail_pending(reason)
+
+
+async def _read_response(
+    reader: asyncio.StreamReader,
+) -> tuple[FrostResponse, bool]:
+    """Read one response, return it and whether the server closes afterwards."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("connection closed by FROST")
+    version, status, reason = (
+        status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""]
+    )[:3]
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    will_close = (
+        headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+    )
+    status_code = int(status)
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # trailers, up to the final blank line:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+        data = bytes(body)
+    elif "content-length" in headers:
+        data = await reader.readexactly(int(headers["content-length"]))
+    elif status_code in (204, 304) or status_code < 200:
+        data = b""
+    else:
+        data = await reader.read()
+        will_close = True
+    return (
+        FrostResponse(url="", status=status_code, reason=reason, headers=headers, body=data),
+        will_close,
+    )
+
+
+class AsyncFrostClient(_FrostClientBase):
+    """
+    Asyncio FROST API client pipelining requests over keep-alive connections.
+
+    At most `connections` connections are opened per host, each carrying up to
+    `pipeline_depth` requests awaiting their response; requests beyond
+    `connections * pipeline_depth` wait for a free slot. Must be used from a
+    single event loop.
+
+    Errors are raised as their `urllib.error` equivalents, as by `FrostClient`.
+
+    Parameters:
+        base_url (str): FROST service root, e.g. `http://web:8080/.../v1.1`.
+        credentials (str | None): base64 encoded `user:password`.
+        container_environment (bool): rewrite `localhost` links to `web`.
+        connections (int): maximum connections per host.
+        pipeline_depth (int): maximum requests in flight per connection.
+        timeout (float): connect and response timeout (s) of each request.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        credentials: str | None = FROST_CREDENTIALS,
+        *,
+        container_environment: bool = CONTAINER_ENVIRONMENT,
+        connections: int = 4,
+        pipeline_depth: int = 16,
+        timeout: float = 30.0,
+    ):
+        super().__init__(
+            base_url, credentials, container_environment=container_environment
+        )
+        self.connections = connections
+        self.pipeline_depth = pipeline_depth
+        self.timeout = timeout
+        # private:
+        self._slots = asyncio.Semaphore(connections * pipeline_depth)
+        self._hosts: dict[tuple[str, str], list[_PipelinedConnection]] = {}
+        self._connecting: dict[tuple[str, str], asyncio.Lock] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"AsyncFrostClient(base_url={self.base_url}, "
+            f"connections={self.connections}, pipeline_depth={self.pipeline_depth})"
+        )
+
+    @property
+    def max_in_flight(self) -> int:
+        """Concurrency limit: requests sent and awaiting their response."""
+        return self.connections * self.pipeline_depth
+
+    async def _connection(self, scheme: str, netloc: str) -> _PipelinedConnection:
+        """Return the least busy connection, opening one if that one is busy."""
+        key = (scheme, netloc)
+        lock = self._connecting.setdefault(key, asyncio.Lock())
+        async with lock:
+            live = [c for c in self._hosts.get(key, []) if not c.closed]
+            self._hosts[key] = live
+            least_busy = min(live, key=lambda c: c.in_flight, default=None)
+            if least_busy is not None and (
+                least_busy.in_flight == 0 or len(live) >= self.connections
+            ):
+                return least_busy
+            parts = urlsplit(f"{scheme}://{netloc}")
+            port = parts.port or (443 if scheme == "https" else 80)
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(
+                        parts.hostname, port, ssl=(scheme == "https") or None
+                    ),
+                    self.timeout,
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                raise error.URLError(e)
+            connection = _PipelinedConnection(reader, writer)
+            live.append(connection)
+            return connection
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> FrostResponse:
+        """Send a request over a pipelined connection and read the response."""
+        url = self.url(url)
+        parts = urlsplit(url)
+        target = urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        request_headers = {"Host": parts.netloc, **self.headers, **(headers or {})}
+        if body is not None:
+            request_headers["Content-Length"] = str(len(body))
+        raw_request = (
+            f"{method} {target} HTTP/1.1\r\n".encode("latin-1")
+            + "".join(f"{k}: {v}\r\n" for k, v in request_headers.items()).encode(
+                "latin-1"
+            )
+            + b"\r\n"
+            + (body or b"")
+        )
+
+        async with self._slots:
+            for attempt in range(2):
+                connection = await self._connection(parts.scheme, parts.netloc)
+                try:
+                    response = await asyncio.wait_for(
+                        connection.request(raw_request), self.timeout
+                    )
+                    break
+                except _ConnectionClosed as e:
+                    # closed before answering: retry on a new one, unless FROST
+                    # may have acted on it (a POST would be created twice).
+                    if attempt == 0 and (
+                        not e.sent or method in _IDEMPOTENT_METHODS
+                    ):
+                        debug_logger.debug(f"FROST connection closed ({e}), retrying.")
+                        continue
+                    raise error.URLError(e.reason)
+                except asyncio.TimeoutError as e:
+                    # the responses behind this one cannot be trusted either:
+                    connection.close(e)
+                    raise error.URLError(f"FROST request timed out: {url}")
+
+        response.url = url
+        if response.status >= 400:
+            raise error.HTTPError(
+                url,
+                response.status,
+                response.reason,
+                response.headers,  # type: ignore
+                io.BytesIO(response.body),
+            )
+        return response
+
+    async def get_json(self, url: str) -> Any:
+        return (await self.request("GET", url)).json()
+
+    async def post_json(self, url: str, data: Any) -> FrostResponse:
+        """POST `data` (JSON serialisable, or already encoded bytes)."""
+        body = data if isinstance(data, bytes) else json.dumps(data).encode("UTF-8")
+        return await self.request(
+            "POST", url, body=body, headers={"Content-Type": "application/json"}
+        )
+
+    async def close(self) -> None:
+        for connections in self._hosts.values():
+            for connection in connections:
+                connection.close()
+        self._hosts.clear()
+
+
+_async_frost_client: AsyncFrostClient | None = None
+_async_frost_client_key: tuple[asyncio.AbstractEventLoop, str] | None = None
+
+
+def get_async_frost_client() -> AsyncFrostClient:
+    """
+    Return the AsyncFrostClient of the running event loop for `$FROST_ENDPOINT`.
+
+    Connections and pipeline depth are read from `$FROST_ASYNC_CONNECTIONS` and
+    `$FROST_PIPELINE_DEPTH`, the timeout from `$FROST_TIMEOUT`. The client is
+    rebuilt if the endpoint or the event loop changes.
+    """
+    global _async_frost_client, _async_frost_client_key
+    frost_endpoint = os.getenv("FROST_ENDPOINT") or FROST_ENDPOINT_DEFAULT
+    key = (asyncio.get_running_loop(), frost_endpoint)
+    if _async_frost_client is None or _async_frost_client_key != key:
+        _async_frost_client = AsyncFrostClient(
+            frost_endpoint,
+            connections=int(os.getenv("FROST_ASYNC_CONNECTIONS", 4)),
+            pipeline_depth=int(os.getenv("FROST_PIPELINE_DEPTH", 16)),
+            timeout=float(os.getenv("FROST_TIMEOUT", 30)),
+        )
+        _async_frost_client_key = key
+    return _async_frost_client
+
+
+async def filter_query(
+    filter_string: str,
+    entity: str | None,
+    url: str | None,
+) -> Dict[str, Any]:
+    """Async `frost.filter_query`: query the FROST server and return result."""
+    client = get_async_frost_client()
+    if not url:
+        query_url = client.url(f"{entity}?$filter=" + quote(filter_string))
+    else:
+        query_url = client.url(url + "?$filter=" + quote(filter_string))
+    try:
+        return await client.get_json(query_url)
+    except error.HTTPError:
+        raise
+    except error.URLError as e:
+        logger.critical(
+            "FROST connection refused, pointing to "
+            f"{client.base_url}. Is server up and listening? "
+            f"{query_url=}"
+        )
+        raise error.URLError(e)
+
+
+async def check_existing_object(entity: "SensorThingsObject") -> bool:
+    """Async `frost.check_existing_object`."""
+    match entity.st_type:
+        case "Sensor" | "Thing" | "ObservedProperty" | "Locations":
+            if (
+                await filter_query(
+                    entity=ENTITY_ENDPOINTS[entity.st_type],
+                    filter_string=f"name eq {_quote(entity.name)}",
+                    url=None,
+                )
+            )["value"]:
+                return True
+        case "Datastream":
+            sensor_name = entity.iot_links["sensors"][0].name  # type: ignore
+            if (
+                await filter_query(
+                    entity="/Datastreams",
+                    filter_string=(
+                        f"name eq {_quote(entity.name)} and "
+                        f"Sensor/name eq {_quote(sensor_name)}"
+                    ),
+                    url=None,
+                )
+            )["value"]:
+                return True
+    return False
+
+
+async def make_frost_object(
+    entity: Union["SensorThingsObject", "Observation"],
+    iot_url: str | None = None,
+    application_name: str | None = None,
+    resolve_links: bool = True,
+) -> Dict[str, str]:
+    """
+    Async `frost.make_frost_object`: add a SensorThingsObject to the FROST
+    server, return FROST IoT Links (only the self URL and id for Observations,
+    or when `resolve_links` is False).
+    """
+    if await check_existing_object(entity):
+        logger.info(f"Creation Skipped: {entity.st_type} {entity.name} already exists.")
+        return {}
+
+    client = get_async_frost_client()
+    url = iot_url or ENTITY_ENDPOINTS[entity.st_type]
+    response = await client.post_json(
+        url,
+        entity.model_dump_json(exclude={"iot_links", "id", "st_type"}).encode(
+            "UTF-8"
+        ),
+    )
+    # "Location" does not refer to a SensorThings Location
+    new_object_url = client.rewrite(response.getheader("Location") or "")
+    logger.info(f"New {entity.st_type} created at {new_object_url}")
+
+    if isinstance(entity, Observation) or not resolve_links:
+        return {
+            "self_url": new_object_url,
+            "iot_id": _id_from_location(new_object_url) or "",
+        }
+
+    created = await client.get_json(new_object_url)
+    iot_links = {
+        name.split("@")[0].lower() + "_url": link
+        for name, link in created.items()
+        if name.endswith("@iot.navigationLink")
+    }
+    iot_links.update({"self_url": new_object_url})
+    return iot_links
+
+
+async def make_frost_datastream(
+    entity: "Datastream",
+    sensor_id: int,
+    thing_id: int,
+    observed_property_id: int,
+) -> None:
+    """Async `frost.make_frost_datastream`."""
+    if await check_existing_object(entity):
+        logger.info(f"Creation Skipped: {entity.st_type} {entity.name} already exists.")
+        return None
+    data = entity.model_dump(exclude={"iot_links", "id", "st_type"})
+    data.update(
+        {
+            "Thing": {"@iot.id": thing_id},
+            "Sensor": {"@iot.id": sensor_id},
+            "ObservedProperty": {"@iot.id": observed_property_id},
+        }
+    )
+    try:
+        response = await get_async_frost_client().post_json("/Datastreams", data)
+        logger.info(f"New Datastream created at {response.getheader('Location')}")
+    except error.HTTPError as e:
+        logger.critical(f"{e} {e.read()}")
+
+
+async def find_datastream_id(
+    sensor_name: SensorID, datastream_name: ObservedProperties | str
+) -> DatastreamId | None:
+    """Async `frost.find_datastream_id`."""
+    if isinstance(datastream_name, ObservedProperties):
+        datastream_name = datastream_name.value
+    datastreams = (
+        await filter_query(
+            entity="/Datastreams",
+            filter_string=(
+                f"name eq {_quote(datastream_name)} and "
+                f"Sensor/name eq {_quote(sensor_name)}"
+            ),
+            url=None,
+        )
+    )["value"]
+    if not datastreams:
+        logger.warning(f"Datastream {datastream_name} not found for {sensor_name}.")
+        return None
+    return datastreams[0]["@iot.id"]
+
+
+# datastream lookups in progress, shared by concurrent uploads of a datastream:
+_lookups: dict[tuple[SensorID, str], "asyncio.Future[DatastreamId | None]"] = {}
+
+
+async def get_datastream_id(
+    sensor_name: SensorID, datastream_name: ObservedProperties | str
+) -> DatastreamId | None:
+    """
+    Return the id of a datastream, from the shared routing table where
+    possible. Concurrent misses for the same datastream share a single lookup.
+    """
+    datastream_id = datastream_routes.get(sensor_name, datastream_name)
+    if datastream_id is not None:
+        return datastream_id
+    if isinstance(datastream_name, ObservedProperties):
+        datastream_name = datastream_name.value
+    key = (sensor_name, datastream_name)
+    lookup = _lookups.get(key)
+    if lookup is None:
+        lookup = asyncio.ensure_future(find_datastream_id(sensor_name, datastream_name))
+        _lookups[key] = lookup
+        lookup.add_done_callback(lambda _: _lookups.pop(key, None))
+    datastream_id = await asyncio.shield(lookup)
+    if datastream_id is not None:
+        datastream_routes.put(sensor_name, datastream_name, datastream_id)
+    return datastream_id
+
+
+async def frost_observation_upload(
+    sensor_name: SensorID,
+    observation_set: Tuple[Observation, ObservedProperties],
+    app_name: str | None = None,
+) -> None:
+    """Async `frost.frost_observation_upload`: upload an observation set."""
+    observation, datastream_name = observation_set
+    try:
+        datastream_id = await get_datastream_id(sensor_name, datastream_name)
+        if datastream_id is None:
+            raise FrostUploadFailure(
+                f"No datastream {datastream_name} found for {sensor_name}."
+            )
+        await get_async_frost_client().post_json(
+            ENTITY_ENDPOINTS["Observation"],
+            observation_body(
+                observation,
+                datastream_id,
+                datastream_routes.feature_of_interest(sensor_name, datastream_name),
+            ),
+        )
+        netmon.add_named_count("push_success", sensor_name, 1)
+        netmon.add_named_time("last_push_time", sensor_name, time.time())
+    except error.HTTPError as e:
+        # the datastream may have been removed server side:
+        invalidate_stale_route(sensor_name, datastream_name, e)
+        netmon.add_named_count("push_fail", sensor_name, 1)
+        raise FrostUploadFailure(f"Unable to upload payload: {e}")
+    except Exception as e:
+        netmon.add_named_count("push_fail", sensor_name, 1)
+        raise FrostUploadFailure(f"Unable to upload payload: {e}")
+    return None
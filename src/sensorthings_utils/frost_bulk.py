@@ -0,0 +1,220 @@
+"""Bulk Observation uploads using FROST's `CreateObservations` extension."""
+
+# standard
+from urllib import error
+from dataclasses import dataclass
+from typing import Any, Callable, Tuple
+import logging
+import threading
+import time
+
+# internal
+from sensorthings_utils.exceptions import FrostUploadFailure
+from sensorthings_utils.frost import (
+    DatastreamId,
+    datastream_routes,
+    get_datastream_id,
+)
+from sensorthings_utils.frost_client import get_frost_client
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.transformers.types import ObservedProperties, SensorID
+
+logger = logging.getLogger(__name__)
+main_logger = logging.getLogger("main")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["BulkObservationUploader", "PendingObservation"]
+
+# order of the values in each dataArray row:
+DATA_ARRAY_COMPONENTS = ["phenomenonTime", "result"]
+# appended to the rows of a datastream with a provisioned FeatureOfInterest:
+FEATURE_COMPONENT = "FeatureOfInterest/id"
+
+
+@dataclass
+class PendingObservation:
+    """An observation waiting to be uploaded, and the sensor it came from."""
+
+    sensor_name: SensorID
+    observation_set: Tuple[Observation, ObservedProperties]
+    queued_at: float
+
+
+class BulkObservationUploader:
+    """
+    Buffer observations and push them to FROST in `CreateObservations` requests.
+
+    Pending observations are grouped by datastream, and uploaded as one
+    dataArray request when `max_size` observations are pending or when the
+    oldest pending observation is older than `max_age` seconds. FROST answers
+    with one entry per row, which is mapped back to the sensor that produced
+    it for `netmon`.
+
+    Parameters:
+        max_size (int): number of pending observations which triggers a flush.
+        max_age (float): age (s) of the oldest observation which triggers a
+            flush. Age based flushing requires `start()`.
+        on_failure (Callable | None): receives the observations rejected by
+            flushes of the background thread and `stop()`.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 500,
+        max_age: float = 5.0,
+        on_failure: Callable[[list["PendingObservation"]], object] | None = None,
+    ):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.on_failure = on_failure
+        # private:
+        self._pending: dict[DatastreamId, list[PendingObservation]] = {}
+        self._pending_count = 0
+        self._oldest: float | None = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        return self._pending_count
+
+    def add(
+        self,
+        sensor_name: SensorID,
+        observation_set: Tuple[Observation, ObservedProperties],
+    ) -> list[PendingObservation]:
+        """
+        Queue an observation for upload. Returns the failed observations if the
+        queue reached `max_size` and was flushed, else an empty list.
+
+        Raises FrostUploadFailure if FROST cannot be reached to look up the
+        datastream of the observation.
+        """
+        _, datastream_name = observation_set
+        try:
+            datastream_id = get_datastream_id(sensor_name, datastream_name)
+        except error.URLError as e:
+            netmon.add_named_count("push_fail", sensor_name, 1)
+            raise FrostUploadFailure(f"Unable to look up datastream: {e}")
+        now = time.time()
+        pending = PendingObservation(sensor_name, observation_set, now)
+        if datastream_id is None:
+            netmon.add_named_count("push_fail", sensor_name, 1)
+            main_logger.error(
+                f"No datastream {datastream_name} found for {sensor_name}, "
+                "observation dropped."
+            )
+            return [pending]
+        with self._lock:
+            self._pending.setdefault(datastream_id, []).append(pending)
+            self._pending_count += 1
+            self._oldest = self._oldest or now
+            full = self._pending_count >= self.max_size
+        return self.flush() if full else []
+
+    def flush(self, raise_errors: bool = False) -> list[PendingObservation]:
+        """
+        Upload everything pending, return the observations FROST rejected.
+
+        If the request as a whole fails, every pending observation is returned
+        as failed, or FrostUploadFailure is raised if `raise_errors` is set.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._oldest = None
+        if not pending:
+            return []
+
+        rows = [p for group in pending.values() for p in group]
+        body = [
+            _data_array(datastream_id, group)
+            for datastream_id, group in pending.items()
+        ]
+        try:
+            results = self._post(body)
+        except (error.URLError, ValueError) as e:
+            main_logger.error(
+                f"Bulk upload of {len(rows)} observations failed: {e}"
+            )
+            for p in rows:
+                netmon.add_named_count("push_fail", p.sensor_name, 1)
+            if raise_errors:
+                raise FrostUploadFailure(f"Bulk upload failed: {e}")
+            return rows
+
+        failed = []
+        now = time.time()
+        # FROST returns one entry per row, in the order the rows were sent:
+        for p, result in zip(rows, results):
+            if isinstance(result, str) and "Observations(" in result:
+                netmon.add_named_count("push_success", p.sensor_name, 1)
+                netmon.add_named_time("last_push_time", p.sensor_name, now)
+            else:
+                netmon.add_named_count("push_fail", p.sensor_name, 1)
+                failed.append(p)
+        if failed:
+            main_logger.error(
+                f"FROST rejected {len(failed)} of {len(rows)} observations: "
+                f"{sorted({p.sensor_name for p in failed})}"
+            )
+        return failed
+
+    def _post(self, body: list[dict[str, Any]]) -> list[Any]:
+        results = get_frost_client().post_json("/CreateObservations", body).json()
+        debug_logger.debug(f"CreateObservations response: {results}")
+        return results
+
+    # threading methods  #######################################################
+    def start(self) -> None:
+        """Start a thread flushing pending observations older than `max_age`."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._flush_loop, daemon=True, name="bulk-uploader"
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flushing thread and upload whatever is still pending."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(self.max_age + 1)
+        self._handle_failures(self.flush())
+
+    def _flush_loop(self) -> None:
+        while not self._stop_event.wait(max(self.max_age / 4, 0.1)):
+            oldest = self._oldest
+            if oldest and time.time() - oldest >= self.max_age:
+                self._handle_failures(self.flush())
+
+    def _handle_failures(self, failed: list[PendingObservation]) -> None:
+        if failed and self.on_failure is not None:
+            self.on_failure(failed)
+
+
+def _data_array(
+    datastream_id: DatastreamId, group: list[PendingObservation]
+) -> dict[str, Any]:
+    """The `CreateObservations` entry of the pending observations of a datastream."""
+    components = list(DATA_ARRAY_COMPONENTS)
+    rows = [_to_row(p.observation_set[0]) for p in group]
+    feature_id = datastream_routes.feature_of_interest(
+        group[0].sensor_name, group[0].observation_set[1]
+    )
+    if feature_id is not None:
+        components.append(FEATURE_COMPONENT)
+        for row in rows:
+            row.append(feature_id)
+    return {
+        "Datastream": {"@iot.id": datastream_id},
+        "components": components,
+        "dataArray@iot.count": len(group),
+        "dataArray": rows,
+    }
+
+
+def _to_row(observation: Observation) -> list[Any]:
+    data = observation.model_dump(mode="json")
+    return [data[component] for component in DATA_ARRAY_COMPONENTS]
@@ -0,0 +1,276 @@
+"""Persistent HTTP/1.1 client for the FROST API."""
+
+# standard
+import http.client
+import io
+import json
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+from urllib import error
+from urllib.parse import urlsplit, urlunsplit
+
+# internal
+from sensorthings_utils.config import (
+    CONTAINER_ENVIRONMENT,
+    FROST_ENDPOINT_DEFAULT,
+    FROST_CREDENTIALS,
+)
+
+logger = logging.getLogger(__name__)
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["FrostClient", "FrostResponse", "get_frost_client"]
+
+# errors raised when a kept-alive connection was closed by the server while idle:
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+# safe to send again if the connection closed before the response was read:
+_IDEMPOTENT_METHODS = ("GET", "HEAD")
+
+
+@dataclass
+class FrostResponse:
+    """A fully read response from the FROST server."""
+
+    url: str
+    status: int
+    reason: str
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    def getheader(self, name: str, default: str | None = None) -> str | None:
+        return self.headers.get(name.lower(), default)
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class _HostPool:
+    """Bounded pool of persistent connections to a single host."""
+
+    def __init__(self, scheme: str, netloc: str, size: int, timeout: float):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        connection_class = (
+            http.client.HTTPSConnection
+            if self.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        return connection_class(self.netloc, timeout=self.timeout)
+
+    def acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        """Return a connection, and whether it is a reused (idle) one."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise error.URLError(f"No free connection to {self.netloc}.")
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def release(self, connection: http.client.HTTPConnection, reusable: bool):
+        if reusable:
+            self._idle.put(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class _FrostClientBase:
+    """URL handling and default headers shared by the sync and async clients."""
+
+    def __init__(
+        self,
+        base_url: str,
+        credentials: str | None = FROST_CREDENTIALS,
+        *,
+        container_environment: bool = CONTAINER_ENVIRONMENT,
+    ):
+        self.container_environment = container_environment
+        self.base_url = self.rewrite(base_url.rstrip("/"))
+        self.headers = {"Accept": "application/json"}
+        if credentials:
+            self.headers["Authorization"] = f"Basic {credentials}"
+
+    def rewrite(self, url: str) -> str:
+        """Point `localhost` links returned by FROST at the `web` container."""
+        if not self.container_environment:
+            return url
+        parts = urlsplit(url)
+        if parts.hostname != "localhost":
+            return url
+        return urlunsplit(parts._replace(netloc=parts.netloc.replace("localhost", "web")))
+
+    def url(self, path_or_url: str) -> str:
+        """Return an absolute URL for an entity path (`/Things`) or a full link."""
+        if path_or_url.startswith(("http://", "https://")):
+            return self.rewrite(path_or_url)
+        return self.base_url + path_or_url
+
+
+class FrostClient(_FrostClientBase):
+    """
+    FROST API client holding persistent HTTP/1.1 connections.
+
+    The base URL (rewritten for container environments) and the Basic auth
+    header are resolved once. Every request reuses an idle keep-alive
+    connection to its host, of which at most `pool_size` are open at a time.
+
+    Errors are raised as their `urllib.error` equivalents: an `HTTPError` for
+    any status >= 400 and a `URLError` when the server cannot be reached.
+
+    Parameters:
+        base_url (str): FROST service root, e.g. `http://web:8080/.../v1.1`.
+        credentials (str | None): base64 encoded `user:password`.
+        container_environment (bool): rewrite `localhost` links to `web`.
+        pool_size (int): maximum connections per host.
+        timeout (float): connect and read timeout (s) of each request.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        credentials: str | None = FROST_CREDENTIALS,
+        *,
+        container_environment: bool = CONTAINER_ENVIRONMENT,
+        pool_size: int = 4,
+        timeout: float = 30.0,
+    ):
+        super().__init__(
+            base_url, credentials, container_environment=container_environment
+        )
+        self.pool_size = pool_size
+        self.timeout = timeout
+        # private:
+        self._pools: dict[tuple[str, str], _HostPool] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"FrostClient(base_url={self.base_url}, pool_size={self.pool_size})"
+
+    def _pool(self, scheme: str, netloc: str) -> _HostPool:
+        with self._lock:
+            pool = self._pools.get((scheme, netloc))
+            if pool is None:
+                pool = _HostPool(scheme, netloc, self.pool_size, self.timeout)
+                self._pools[(scheme, netloc)] = pool
+            return pool
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> FrostResponse:
+        """Send a request over a pooled connection and read the response."""
+        url = self.url(url)
+        parts = urlsplit(url)
+        target = urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        request_headers = {**self.headers, **(headers or {})}
+        pool = self._pool(parts.scheme, parts.netloc)
+
+        for attempt in range(2):
+            connection, reused = pool.acquire()
+            sent = False
+            try:
+                connection.request(method, target, body=body, headers=request_headers)
+                sent = True
+                response = connection.getresponse()
+                data = response.read()
+            except _STALE_CONNECTION_ERRORS as e:
+                pool.release(connection, reusable=False)
+                # an idle connection closed by the server: retry on a new one,
+                # unless FROST may have acted on it (a POST would be created
+                # twice).
+                if (
+                    reused
+                    and attempt == 0
+                    and (not sent or method in _IDEMPOTENT_METHODS)
+                ):
+                    debug_logger.debug(f"Stale FROST connection ({e}), retrying.")
+                    continue
+                raise error.URLError(e)
+            except (OSError, http.client.HTTPException) as e:
+                pool.release(connection, reusable=False)
+                raise error.URLError(e)
+            pool.release(connection, reusable=not response.will_close)
+            break
+
+        frost_response = FrostResponse(
+            url=url,
+            status=response.status,
+            reason=response.reason,
+            headers={k.lower(): v for k, v in response.getheaders()},
+            body=data,
+        )
+        if response.status >= 400:
+            raise error.HTTPError(
+                url,
+                response.status,
+                response.reason,
+                response.headers,
+                io.BytesIO(data),
+            )
+        return frost_response
+
+    def get_json(self, url: str) -> Any:
+        return self.request("GET", url).json()
+
+    def post_json(self, url: str, data: Any) -> FrostResponse:
+        """POST `data` (JSON serialisable, or already encoded bytes)."""
+        body = data if isinstance(data, bytes) else json.dumps(data).encode("UTF-8")
+        return self.request(
+            "POST", url, body=body, headers={"Content-Type": "application/json"}
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+
+
+_frost_client: FrostClient | None = None
+_frost_client_endpoint: str | None = None
+_frost_client_lock = threading.Lock()
+
+
+def get_frost_client() -> FrostClient:
+    """
+    Return the shared FrostClient for `$FROST_ENDPOINT`.
+
+    Pool size and timeout are read from `$FROST_POOL_SIZE` and `$FROST_TIMEOUT`.
+    The client is rebuilt if the endpoint changes.
+    """
+    global _frost_client, _frost_client_endpoint
+    frost_endpoint = os.getenv("FROST_ENDPOINT") or FROST_ENDPOINT_DEFAULT
+    with _frost_client_lock:
+        if _frost_client is None or _frost_client_endpoint != frost_endpoint:
+            if _frost_client is not None:
+                _frost_client.close()
+            _frost_client = FrostClient(
+                frost_endpoint,
+                pool_size=int(os.getenv("FROST_POOL_SIZE", 4)),
+                timeout=float(os.getenv("FROST_TIMEOUT", 30)),
+            )
+            _frost_client_endpoint = frost_endpoint
+        return _frost_client
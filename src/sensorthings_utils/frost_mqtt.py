@@ -0,0 +1,254 @@
+"""Observation uploads over FROST's MQTT create interface."""
+
+# standard
+import json
+import logging
+import os
+import threading
+import time
+from typing import Tuple
+from urllib.parse import urlsplit
+
+# external
+from paho.mqtt.client import Client as mqttClient
+from paho.mqtt.client import MQTT_ERR_NO_CONN, MQTT_ERR_SUCCESS
+from paho.mqtt.enums import CallbackAPIVersion
+
+# internal
+from sensorthings_utils.config import (
+    CONTAINER_ENVIRONMENT,
+    FROST_ENDPOINT_DEFAULT,
+    FROST_PASSWORD,
+    FROST_USER,
+)
+from sensorthings_utils.exceptions import FrostUploadFailure
+from sensorthings_utils.frost import (
+    DatastreamId,
+    datastream_routes,
+    get_datastream_id,
+    observation_fields,
+)
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.transformers.types import ObservedProperties, SensorID
+
+logger = logging.getLogger(__name__)
+main_logger = logging.getLogger("main")
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["FrostMqttPublisher", "get_frost_mqtt_publisher", "close_frost_mqtt_publisher"]
+
+ObservationSet = Tuple[Observation, ObservedProperties]
+# (publishing application, sensor, observation) of a message not acknowledged:
+UnackedMessage = Tuple[str | None, SensorID, ObservationSet]
+
+
+class FrostMqttPublisher:
+    """
+    Create Observations by publishing them to FROST's MQTT interface.
+
+    FROST creates an Observation for every message published to
+    `<version>/Datastreams(<id>)/Observations`. Messages are published with
+    QoS 1 over one persistent connection, without waiting for each
+    acknowledgement: paho holds up to `max_queued` unacknowledged messages and
+    resends them after a reconnect. Acknowledged messages count as a push
+    success in `netmon`; a full queue raises `FrostUploadFailure`.
+
+    Note that FROST cannot report a rejected message back over MQTT, an
+    acknowledgement only means that the message reached FROST.
+
+    Parameters:
+        host (str): FROST MQTT host, the host of the FROST endpoint by default.
+        port (int): FROST MQTT port.
+        version (str): SensorThings version prefix of the topics.
+        username (str | None): FROST user, if FROST authentication is enabled.
+        password (str | None): FROST password.
+        max_queued (int): unacknowledged messages held before publishing fails.
+        keepalive (int): MQTT keep alive interval (s).
+        client (mqttClient | None): paho client to publish with, a new one by
+            default.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 1883,
+        *,
+        version: str = "v1.1",
+        username: str | None = FROST_USER,
+        password: str | None = FROST_PASSWORD,
+        max_queued: int = 10000,
+        keepalive: int = 60,
+        client: mqttClient | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.version = version
+        self.keepalive = keepalive
+        # private:
+        self._client = client or mqttClient(
+            CallbackAPIVersion.VERSION2, client_id=f"stu-frost-{os.getpid()}"
+        )
+        if username:
+            self._client.username_pw_set(username, password)
+        self._client.max_queued_messages_set(max_queued)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._client.on_publish = self._on_publish
+        # mid -> (app name, sensor, observation) awaiting its PUBACK:
+        self._unacked: dict[int, UnackedMessage] = {}
+        # PUBACKs which arrived before `publish` returned their mid:
+        self._early_acks: set[int] = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def __repr__(self) -> str:
+        return f"FrostMqttPublisher(host={self.host}, port={self.port})"
+
+    def __len__(self) -> int:
+        """Number of messages awaiting acknowledgement."""
+        with self._lock:
+            return len(self._unacked)
+
+    def topic(self, datastream_id: DatastreamId) -> str:
+        return f"{self.version}/Datastreams({datastream_id})/Observations"
+
+    # callbacks ################################################################
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code == 0:
+            event_logger.info(f"Connected to FROST MQTT at {self.host}:{self.port}.")
+        else:
+            main_logger.warning(f"FROST MQTT connection failed: {reason_code}")
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        if reason_code != 0:
+            main_logger.warning(
+                f"FROST MQTT connection lost ({reason_code}), reconnecting."
+            )
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        with self._lock:
+            message = self._unacked.pop(mid, None)
+            if message is None:
+                self._early_acks.add(mid)
+                return
+        self._acknowledged(message[1])
+
+    def _acknowledged(self, sensor_name: SensorID) -> None:
+        netmon.add_named_count("push_success", sensor_name, 1)
+        netmon.add_named_time("last_push_time", sensor_name, time.time())
+        netmon.set_count("frost_mqtt_unacked", len(self))
+
+    # publishing ###############################################################
+    def start(self) -> None:
+        """Connect in the background, paho reconnects on its own from then on."""
+        if not self._started:
+            self._client.connect_async(self.host, self.port, self.keepalive)
+            self._client.loop_start()
+            self._started = True
+
+    def publish(
+        self,
+        sensor_name: SensorID,
+        observation_set: ObservationSet,
+        app_name: str | None = None,
+    ) -> None:
+        """Publish an observation set, raise `FrostUploadFailure` if it cannot be queued."""
+        observation, datastream_name = observation_set
+        self.start()
+        try:
+            datastream_id = get_datastream_id(sensor_name, datastream_name)
+        except Exception as e:
+            netmon.add_named_count("push_fail", sensor_name, 1)
+            raise FrostUploadFailure(f"Unable to upload payload: {e}")
+        if datastream_id is None:
+            netmon.add_named_count("push_fail", sensor_name, 1)
+            raise FrostUploadFailure(
+                f"Unable to upload payload: no datastream {datastream_name} "
+                f"for {sensor_name}."
+            )
+        payload = json.dumps(
+            observation_fields(
+                observation,
+                datastream_routes.feature_of_interest(sensor_name, datastream_name),
+            ),
+            separators=(",", ":"),
+        )
+        info = self._client.publish(self.topic(datastream_id), payload, qos=1)
+        # while disconnected, QoS 1 messages are queued and sent on reconnect:
+        if info.rc not in (MQTT_ERR_SUCCESS, MQTT_ERR_NO_CONN):
+            netmon.add_named_count("push_fail", sensor_name, 1)
+            raise FrostUploadFailure(
+                f"Unable to upload payload: MQTT publish failed ({info.rc})."
+            )
+        with self._lock:
+            acknowledged = info.mid in self._early_acks
+            if acknowledged:
+                self._early_acks.discard(info.mid)
+            else:
+                self._unacked[info.mid] = (app_name, sensor_name, observation_set)
+        if acknowledged:
+            self._acknowledged(sensor_name)
+        netmon.add_count("frost_mqtt_published", 1)
+        netmon.set_count("frost_mqtt_unacked", len(self))
+
+    def close(self, timeout: float = 5) -> list[UnackedMessage]:
+        """
+        Disconnect after waiting up to `timeout` for outstanding
+        acknowledgements; return the messages which were never acknowledged,
+        with the name of the application which published them.
+        """
+        deadline = time.monotonic() + timeout
+        while len(self) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self._started:
+            self._client.disconnect()
+            self._client.loop_stop()
+            self._started = False
+        with self._lock:
+            unacked = list(self._unacked.values())
+            self._unacked.clear()
+        for _, sensor_name, _ in unacked:
+            netmon.add_named_count("push_fail", sensor_name, 1)
+        netmon.set_count("frost_mqtt_unacked", 0)
+        return unacked
+
+
+_frost_mqtt_publisher: FrostMqttPublisher | None = None
+_frost_mqtt_publisher_lock = threading.Lock()
+
+
+def get_frost_mqtt_publisher() -> FrostMqttPublisher:
+    """
+    Return the shared FrostMqttPublisher.
+
+    The broker is read from `$FROST_MQTT_HOST` and `$FROST_MQTT_PORT`, by
+    default the host of `$FROST_ENDPOINT` (`web` in a container environment)
+    on port 1883. The topic version is the last path segment of the endpoint.
+    """
+    global _frost_mqtt_publisher
+    with _frost_mqtt_publisher_lock:
+        if _frost_mqtt_publisher is None:
+            frost_endpoint = urlsplit(
+                os.getenv("FROST_ENDPOINT") or FROST_ENDPOINT_DEFAULT
+            )
+            default_host = frost_endpoint.hostname or "localhost"
+            if CONTAINER_ENVIRONMENT and default_host == "localhost":
+                default_host = "web"
+            _frost_mqtt_publisher = FrostMqttPublisher(
+                os.getenv("FROST_MQTT_HOST", default_host),
+                int(os.getenv("FROST_MQTT_PORT", 1883)),
+                version=frost_endpoint.path.rstrip("/").rsplit("/", 1)[-1] or "v1.1",
+            )
+        return _frost_mqtt_publisher
+
+
+def close_frost_mqtt_publisher(timeout: float = 5) -> list[UnackedMessage]:
+    """Close the shared publisher if it was used, return unacknowledged messages."""
+    global _frost_mqtt_publisher
+    with _frost_mqtt_publisher_lock:
+        publisher, _frost_mqtt_publisher = _frost_mqtt_publisher, None
+    if publisher is None:
+        return []
+    return publisher.close(timeout)
@@ -1,5 +1,5 @@
 # standard
-from typing import List, Optional
+from typing import Iterable, List, Optional
 import logging
 from pathlib import Path
 import importlib
@@ -20,9 +20,27 @@ from sensorthings_utils.sensor_things.extensions import (
     SensorArrangement,
 )
 import sensorthings_utils.frost as frost
-from sensorthings_utils.connections import SensorApplicationConnection
+from sensorthings_utils.connections import (
+    MQTTSensorApplicationConnection,
+    SensorApplicationConnection,
+)
+from sensorthings_utils.frost_mqtt import (
+    close_frost_mqtt_publisher,
+    get_frost_mqtt_publisher,
+)
 from sensorthings_utils.monitor import netmon
+from sensorthings_utils.readiness import (
+    Probe,
+    tcp_probe,
+    wait_until_ready,
+    warn_unready,
+)
+from sensorthings_utils.registry import EntityRegistry
+from sensorthings_utils.runtime import RUNTIMES, AsyncRuntime
+from sensorthings_utils.sinks import FrostMqttSink
+from sensorthings_utils.spool import spool
 from sensorthings_utils.transformers.types import SensorID, SupportedSensors
+from sensorthings_utils.watcher import SensorConfigWatcher
 
 
 # import from config.py:
@@ -70,32 +88,124 @@ def parse_application_config(config_path: Path) -> set[SensorApplicationConnecti
     return connections
 
 
-def _setup_sensor_arrangements(sensor_config: SensorConfig) -> None:
+def _setup_sensor_arrangements(
+    sensor_configs: List[SensorConfig],
+    sensor_registry: dict[SensorID, SupportedSensors],
+    workers: int = 4,
+) -> threading.Thread:
     """
-    Turns a SensorConfig file into database entities on the FROST server.
+    Turns SensorConfig files into database entities on the FROST server.
+
+    Provisioning runs in the background on `workers` threads, see
+    `frost.provision`, and is retried with backoff while it fails as a whole;
+    configs unchanged since the last run are served from the entity registry.
+    Each sensor is added to `sensor_registry` as soon as it is set up, so
+    connections stream its observations while the remaining sensors are still
+    being set up.
 
     Args
-        sensor_config (SensorConfig)
+        sensor_configs (List[SensorConfig])
+        sensor_registry (dict[SensorID, SupportedSensors]): registry shared
+            with the connections.
+        workers (int): provisioning threads.
 
     Returns
-        None. POSTS entities to the FROST database instance.
+        The provisioning thread. POSTS entities to the FROST database instance.
     """
-    if not sensor_config.is_valid:
-        netmon.add_count("sensor_config_fail", 1)
-        main_logger.warning(
-            f"{sensor_config._filepath} is an invalid sensor configuration " "file."
+    sensor_arrangements = []
+    sensor_models: dict[SensorID, SupportedSensors] = {}
+    for sensor_config in sensor_configs:
+        if not sensor_config.is_valid:
+            netmon.add_count("sensor_config_fail", 1)
+            main_logger.warning(
+                f"{sensor_config._filepath} is an invalid sensor configuration "
+                "file."
+            )
+            continue
+        sensor_models[sensor_config.name] = SupportedSensors(sensor_config.model)
+        sensor_arrangements.append(SensorArrangement(sensor_config))
+
+    def register(sensor_arrangement: SensorArrangement, sensor_name: SensorID):
+        sensor_registry[sensor_name] = sensor_models[sensor_name]
+
+    def provision():
+        start = time.monotonic()
+        # retried until FROST, its queries and the entity registry answer:
+        provisioned = frost.provision_with_retries(
+            sensor_arrangements,
+            workers=workers,
+            on_provisioned=register,
+            open_registry=EntityRegistry,
+        )
+        event_logger.info(
+            f"Provisioned {len(provisioned)}/{len(sensor_arrangements)} sensors "
+            f"in {time.monotonic() - start:.1f}s."
+        )
+
+    thread = threading.Thread(target=provision, name="provisioning", daemon=True)
+    thread.start()
+    return thread
+
+
+def _readiness_probes(
+    connections: set[SensorApplicationConnection],
+) -> dict[str, Probe]:
+    """FROST, and its MQTT broker when a `frost_mqtt` sink publishes to it."""
+    probes: dict[str, Probe] = {"FROST": frost._check_frost_connection}
+    for connection in connections:
+        if isinstance(connection.sink, FrostMqttSink):
+            publisher = get_frost_mqtt_publisher()
+            probes[f"FROST MQTT {publisher.host}:{publisher.port}"] = tcp_probe(
+                publisher.host, publisher.port
+            )
+    return probes
+
+
+def _broker_probes(
+    connections: set[SensorApplicationConnection],
+) -> dict[str, Probe]:
+    """
+    The MQTT brokers of the sensor applications; each connection retries its
+    own broker, so these are only reported, not waited for.
+    """
+    return {
+        f"MQTT {connection.host}:{connection.port}": tcp_probe(
+            connection.host, connection.port
         )
-        return None
+        for connection in connections
+        if isinstance(connection, MQTTSensorApplicationConnection)
+    }
+
 
-    sensor_arrangement = SensorArrangement(sensor_config)
-    frost.initial_setup(sensor_arrangement)
+def _spool_unacknowledged(
+    sensor_connections: Iterable[SensorApplicationConnection],
+) -> None:
+    """
+    Close the FROST MQTT publisher and spool the observations it published
+    but FROST never acknowledged, for the connections which spool failures;
+    those of other connections are dropped.
+    """
+    spooling = {conn.app_name for conn in sensor_connections if conn._spools}
+    dropped = 0
+    for app_name, sensor_id, st_obs in close_frost_mqtt_publisher():
+        if app_name in spooling:
+            spool.append(sensor_id, st_obs)
+        else:
+            dropped += 1
+    spool.sync()
+    if dropped:
+        main_logger.warning(
+            f"Dropped {dropped} observations published over MQTT but never "
+            "acknowledged by FROST (spool_failures disabled)."
+        )
 
 
 def push_available(
     sensor_config_paths: List[Path] = generate_sensor_config_files(),
     exclude: Optional[List[SensorID]] = None,
     frost_endpoint: Optional[str] = None,
-    start_delay: int = 30,
+    ready_timeout: float = 300,
+    runtime: Optional[str] = None,
 ) -> None:
     """
     Start app threads and begin collecting data, pushing to FROST server.
@@ -104,37 +214,74 @@ def push_available(
         - sensor_config_path: a list sensor configuration files.
         - exclude: sensors to exclude.
         - frost_endpoint: HTTP FROST endpoint to push too.
-        - start_delay: a delay before starting the loop.
+        - ready_timeout: seconds to wait for FROST (and its MQTT broker with
+          a `frost_mqtt` sink) to answer before giving up; the brokers of the
+          applications are not waited for.
+        - runtime: "threads" (one thread per connection) or "asyncio" (every
+          connection as a task on one event loop, see `AsyncRuntime`),
+          defaults to $CONNECTION_RUNTIME or "threads".
     Raises
-        - None.
+        - DependencyNotReady: if a dependency did not answer in time.
+        - ValueError: if the runtime is unknown.
     """
+    runtime = runtime or os.getenv("CONNECTION_RUNTIME") or "threads"
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown runtime {runtime!r}, expected one of {RUNTIMES}.")
     os.environ["FROST_ENDPOINT"] = (
         frost_endpoint or os.getenv("FROST_ENDPOINT") or FROST_ENDPOINT_DEFAULT
     )
+    # generate a list of connections
+    sensor_connections = parse_application_config(RUNTIME_APPLICATION_CONFIG_FILE)
     # TODO: frost_endpoint run in containers is pointing to container reference
     event_logger.info(
-        f"Sensor stream starts in {start_delay}s, target: "
+        f"Sensor stream starts once its dependencies are ready, target: "
         f"{os.getenv('FROST_ENDPOINT')}."
     )
-    time.sleep(start_delay)
+    time_to_ready = wait_until_ready(
+        _readiness_probes(sensor_connections), deadline=ready_timeout
+    )
+    event_logger.info(f"Dependencies ready after {time_to_ready:.1f}s.")
+    warn_unready(_broker_probes(sensor_connections))
     # INITIAL SETUP ############################################################
+    # filled as sensors are provisioned:
     sensor_registry: dict[SensorID, SupportedSensors] = {}
+    sensor_configs: List[SensorConfig] = []
     for f in sensor_config_paths:
         if exclude and f.name in exclude:
             continue
         sensor_config = SensorConfig(f)
-        sensor_registry[sensor_config.name] = SupportedSensors(sensor_config.model)
         netmon.expected_sensors.add(sensor_config.name)
-        _setup_sensor_arrangements(sensor_config)
-    # generate a list of connections
-    sensor_connections = parse_application_config(RUNTIME_APPLICATION_CONFIG_FILE)
+        sensor_configs.append(sensor_config)
+    workers = int(os.getenv("FROST_PROVISION_WORKERS", 4))
+    provisioning = _setup_sensor_arrangements(
+        sensor_configs, sensor_registry, workers=workers
+    )
+    # sensor configs added, edited or removed while running are applied:
+    watcher = SensorConfigWatcher(
+        sensor_registry,
+        sensor_configs=sensor_configs,
+        interval=float(os.getenv("SENSOR_CONFIG_WATCH_INTERVAL", 10)),
+        workers=workers,
+        registry=EntityRegistry(),
+        exclude=exclude or (),
+    )
+    watcher.start(after=provisioning)
 
-    netmon.set_starting_threads([_.app_name for _ in sensor_connections])
+    # observations which failed to upload (also in a previous run) are replayed:
+    spool.start_replayer(after=provisioning)
 
-    for connection in sensor_connections:
-        connection.start_pull_transform_push_thread(sensor_registry)
-        # network monitor will be responsible for restarting dead threads:
-        netmon.connections.add(connection)
+    async_runtime = None
+    if runtime == "asyncio":
+        # the runtime supervises its connection tasks, netmon only its thread:
+        async_runtime = AsyncRuntime(sensor_connections)
+        netmon.set_starting_threads([async_runtime.name])
+        async_runtime.start(sensor_registry)
+    else:
+        netmon.set_starting_threads([_.app_name for _ in sensor_connections])
+        for connection in sensor_connections:
+            connection.start_pull_transform_push_thread(sensor_registry)
+            # network monitor will be responsible for restarting dead threads:
+            netmon.connections.add(connection)
 
     event_logger.info(
         f"Started {threading.active_count()-1} application threads: "
@@ -147,11 +294,20 @@ def push_available(
             # integration with monitoring tools.
             netmon.report(interval=5)
     except KeyboardInterrupt:
+        watcher.stop()
+        if async_runtime is not None:
+            event_logger.info(f"Stopping {async_runtime}")
+            async_runtime.stop()
+        # also without a live thread (asyncio runtime, or a thread which died),
+        # its pipeline and sink still hold observations:
         for conn in sensor_connections:
+            event_logger.info(f"Stopping {conn.app_name}")
+            conn.stop_pull_transform_push_thread()
             if conn._thread and conn._thread.is_alive():
-                event_logger.info(f"Stopping thread for {conn.app_name}")
-                conn.stop_pull_transform_push_thread()
                 conn._thread.join(5)
+        # before spooling what is left, so that replay cannot race it:
+        spool.stop_replayer()
+        _spool_unacknowledged(sensor_connections)
 
     event_logger.info("Successfully shutdown connections.")
     return None
@@ -38,6 +38,27 @@ class _NetworkMonitor:
         self.rejected_payloads: dict[SensorID, int] = defaultdict(int)
         self.sensor_config_fail: int = 0
         self.payloads_received: dict[str, int] = defaultdict(int)
+        self.datastream_route_hits: int = 0
+        self.datastream_route_misses: int = 0
+        self.upload_queue_depth: dict[str, int] = defaultdict(int)
+        self.upload_queue_wait: dict[str, float] = defaultdict(float)
+        self.upload_busy_time: dict[str, float] = defaultdict(float)
+        self.upload_workers: dict[str, int] = defaultdict(int)
+        self.upload_start_time: dict[str, float] = defaultdict(float)
+        self.keyed_queue_depth: dict[str, int] = defaultdict(int)
+        # app name → (share group, worker id) of shared MQTT subscriptions:
+        self.shared_subscriptions: dict[str, tuple[str, str]] = {}
+        self.task_restarts: dict[str, int] = defaultdict(int)
+        self.payload_queue_high_water: dict[str, int] = defaultdict(int)
+        self.payload_queue_dropped: dict[str, int] = defaultdict(int)
+        self.payload_queue_spilled: dict[str, int] = defaultdict(int)
+        self.spool_size: int = 0
+        self.spool_replayed: int = 0
+        self.spool_replay_rate: float = 0.0
+        self.frost_mqtt_published: int = 0
+        self.frost_mqtt_unacked: int = 0
+        self.sink_writes: dict[str, int] = defaultdict(int)
+        self.time_to_ready: dict[str, float] = defaultdict(float)
         self.connections: set["SensorApplicationConnection"] = set()
         self.first_report_issued: bool = False
         self._lock = threading.Lock()
@@ -57,6 +78,11 @@ class _NetworkMonitor:
             self.__setattr__(attr, v)
         return None
 
+    def set_count(self, attr: str, value: float):
+        with self._lock:
+            self.__setattr__(attr, value)
+        return None
+
     def reduce_count(self, attr: str, count: int = 1):
         with self._lock:
             v = self.__getattribute__(attr) - count
@@ -67,12 +93,26 @@ class _NetworkMonitor:
         with self._lock:
             self.__getattribute__(attr)[application] = time
 
-    def add_named_count(self, attr: str, application: str, count: int = 1):
+    def add_named_count(self, attr: str, application: str, count: float = 1):
         """For counts associated with named applications."""
 
         with self._lock:
             self.__getattribute__(attr)[application] += count
 
+    def set_named_value(self, attr: str, application: str, value: float):
+        """For gauges (latest value wins) associated with named applications."""
+
+        with self._lock:
+            self.__getattribute__(attr)[application] = value
+
+    def upload_utilisation(self, application: str) -> float:
+        """Fraction of uploader worker time spent uploading since start."""
+        workers = self.upload_workers.get(application, 0)
+        elapsed = time.time() - self.upload_start_time.get(application, 0)
+        if not workers or elapsed <= 0:
+            return 0.0
+        return self.upload_busy_time[application] / (workers * elapsed)
+
     def _to_html(self, health_report: list[str]) -> None:
         health_file_html = ROOT_DIR / "logs" / "health.html"
 
@@ -138,16 +178,33 @@ class _NetworkMonitor:
                         c.restart_pull_transform_push_thread()
 
             health_report.append(thread_msg)
+            for k, v in self.task_restarts.items():
+                msg = f"WARNING: connection task {k} restarted {v} times."
+                health_report.append(msg)
+                main_logger.warning(msg)
             # Report succesful pushes:
             uptime = str((datetime.now() - self.start_time))
             uptime = uptime.split(".")[0] + " hrs"
             msg = f"Uptime: {uptime}"
             health_report.append(msg)
             main_logger.info(msg)
+            if self.time_to_ready:
+                msg = "Time to ready: " + ", ".join(
+                    f"{k} {v:.1f}s" for k, v in self.time_to_ready.items()
+                )
+                health_report.append(msg)
+                main_logger.info(msg)
             for k, v in self.payloads_received.items():
                 msg = f"Payloads received from {k} : {v}"
                 health_report.append(msg)
                 main_logger.info(msg)
+            for k, (group, worker) in self.shared_subscriptions.items():
+                msg = (
+                    f"Shared subscription of {k} (group {group}): worker "
+                    f"{worker} received {self.payloads_received[k]} payloads."
+                )
+                health_report.append(msg)
+                main_logger.info(msg)
             for k, v in self.rejected_payloads.items():
                 msg = f"Payloads rejected for {k} : {v}"
                 health_report.append(msg)
@@ -167,6 +224,59 @@ class _NetworkMonitor:
                 health_report.append(msg)
                 main_logger.warning(msg)
 
+            for k in self.upload_workers:
+                msg = (
+                    f"Upload queue for {k}: {self.upload_queue_depth[k]} queued, "
+                    f"{self.upload_queue_wait[k]:.2f}s average wait, "
+                    f"{self.upload_utilisation(k):.0%} of "
+                    f"{self.upload_workers[k]} workers busy."
+                )
+                health_report.append(msg)
+                main_logger.info(msg)
+            for k, v in self.keyed_queue_depth.items():
+                msg = f"Processing queues for {k}: {v} payloads queued."
+                health_report.append(msg)
+                main_logger.info(msg)
+            for k, v in self.payload_queue_high_water.items():
+                dropped = self.payload_queue_dropped[k]
+                msg = (
+                    f"Payload queue for {k}: high-water mark {v}, "
+                    f"{dropped} dropped, "
+                    f"{self.payload_queue_spilled[k]} spilled to disk."
+                )
+                health_report.append(msg)
+                if dropped:
+                    main_logger.warning("WARNING: " + msg)
+                else:
+                    main_logger.info(msg)
+            msg = (
+                f"Spooled observations: {self.spool_size}. Replayed so far: "
+                f"{self.spool_replayed} (last replay "
+                f"{self.spool_replay_rate:.1f} observations/s)."
+            )
+            health_report.append(msg)
+            if self.spool_size:
+                main_logger.warning("WARNING: " + msg)
+            else:
+                main_logger.info(msg)
+            msg = (
+                f"Datastream routing table: {self.datastream_route_hits} hits, "
+                f"{self.datastream_route_misses} misses."
+            )
+            health_report.append(msg)
+            main_logger.info(msg)
+            for k, v in self.sink_writes.items():
+                msg = f"Observations written to the local sink of {k} →  {v}"
+                health_report.append(msg)
+                main_logger.info(msg)
+            if self.frost_mqtt_published:
+                msg = (
+                    f"FROST MQTT: {self.frost_mqtt_published} observations "
+                    f"published, {self.frost_mqtt_unacked} awaiting acknowledgement."
+                )
+                health_report.append(msg)
+                main_logger.info(msg)
+
             non_responsive_applications = self.expected_sensors - (
                 self.push_success.keys()
             )
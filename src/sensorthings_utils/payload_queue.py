@@ -0,0 +1,274 @@
+"""Bounded queue of application payloads received over MQTT."""
+
+# standard
+import json
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import IO, List, Tuple
+
+# internal
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.paths import LOGS_DIR
+
+main_logger = logging.getLogger("main")
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["PayloadQueue", "BLOCK", "DROP_OLDEST", "SPILL", "OVERFLOW_POLICIES"]
+
+OVERFLOW_DIR = LOGS_DIR / "overflow"
+
+BLOCK, DROP_OLDEST, SPILL = "block", "drop_oldest", "spill"
+OVERFLOW_POLICIES = (BLOCK, DROP_OLDEST, SPILL)
+
+# raw MQTT message payload, decoded by the consumer:
+Payload = bytes
+# a queued payload, with the spill file offset past its line if it was spilled:
+_Entry = Tuple[Payload, int | None]
+
+
+class PayloadQueue:
+    """
+    Bounded FIFO between an MQTT client's callback and a connection's loop.
+
+    Payloads are queued as the raw bytes received, so that the MQTT client's
+    network thread does no more than append them; the consumer takes them off
+    in batches with `get_batch` and decodes them itself.
+
+    At most `maxsize` payloads are held in memory. What `put` does once the
+    queue is full depends on `overflow`:
+
+    - "block": wait for room, stalling the MQTT client's network loop so that
+      the broker holds back further messages,
+    - "drop_oldest": discard the oldest queued payload,
+    - "spill": append the payload to a JSONL file under `spill_dir`. Payloads
+      arriving while any are spilled are spilled too, and they are read back
+      in order as the in-memory queue drains, also after a restart. The
+      offset of the last spilled payload handed to the consumer is kept in a
+      `.offset` file next to it, so that a restart resumes after it.
+
+    The high-water mark of the in-memory queue, dropped payloads and spilled
+    payloads are reported to `netmon` under `name`.
+
+    Parameters:
+        name (str): name used for netmon entries and the spill file.
+        maxsize (int): payloads held in memory.
+        overflow ("block" | "drop_oldest" | "spill"): overflow policy.
+        spill_dir (Path): directory of the spill file.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 10000,
+        overflow: str = SPILL,
+        spill_dir: Path = OVERFLOW_DIR,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy {overflow!r}, expected one of "
+                f"{OVERFLOW_POLICIES}."
+            )
+        if maxsize < 1:
+            raise ValueError("A payload queue must hold at least one payload.")
+        self.name = name
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.spill_path = Path(spill_dir) / f"{name}.jsonl"
+        self.offset_path = self.spill_path.with_suffix(".offset")
+        # private:
+        self._queue: queue.Queue[_Entry] = queue.Queue(maxsize=maxsize)
+        self._high_water = 0
+        self._closed = threading.Event()
+        # spill file state, under `_spill_lock`:
+        self._spill_lock = threading.Lock()
+        self._spill_file: IO[str] | None = None
+        self._spilled = 0
+        # file offsets: past the last line read back into memory, and past the
+        # last line taken by the consumer:
+        self._read_offset = 0
+        self._consumed_offset = 0
+        if overflow == SPILL and self.spill_path.exists():
+            self._read_offset = self._consumed_offset = self._load_offset()
+            with open(self.spill_path, "r", encoding="utf-8") as f:
+                f.seek(self._read_offset)
+                self._spilled = sum(1 for line in f if line.strip())
+            if self._spilled:
+                event_logger.info(
+                    f"{self._spilled} payloads of {name} left on disk by a "
+                    "previous run are queued."
+                )
+                self._unspill()
+            else:
+                self._remove_spill_file()
+
+    def __repr__(self) -> str:
+        return (
+            f"PayloadQueue(name={self.name}, maxsize={self.maxsize}, "
+            f"overflow={self.overflow})"
+        )
+
+    def __len__(self) -> int:
+        """Queued payloads, in memory and spilled."""
+        return self._queue.qsize() + self._spilled
+
+    def accepting(self) -> bool:
+        """False while `put` would block."""
+        return self.overflow != BLOCK or not self._queue.full()
+
+    def put(self, payload: Payload) -> None:
+        """Queue a payload, applying the overflow policy if the queue is full."""
+        if self.overflow == SPILL:
+            with self._spill_lock:
+                # payloads queue up behind those already spilled:
+                if self._spilled:
+                    self._spill(payload)
+                    # the consumer may have drained memory in the meantime:
+                    if self._queue.empty():
+                        self._unspill()
+                    return
+                try:
+                    self._queue.put_nowait((payload, None))
+                except queue.Full:
+                    self._spill(payload)
+                    return
+        elif self.overflow == DROP_OLDEST:
+            while True:
+                try:
+                    self._queue.put_nowait((payload, None))
+                    break
+                except queue.Full:
+                    self._drop_oldest()
+        else:
+            while True:
+                try:
+                    self._queue.put((payload, None), timeout=1)
+                    break
+                except queue.Full:
+                    if self._closed.is_set():
+                        netmon.add_named_count("payload_queue_dropped", self.name)
+                        return
+        self._record_depth()
+
+    def get(self, timeout: float | None = None) -> Payload:
+        """Take the oldest payload, raises `queue.Empty` after `timeout`."""
+        return self.get_batch(1, timeout=timeout)[0]
+
+    def get_batch(self, max_items: int, timeout: float | None = None) -> List[Payload]:
+        """
+        Take up to `max_items` of the oldest payloads, waiting `timeout` for
+        the first one; raises `queue.Empty` if none came.
+
+        Payloads after the first are taken under a single acquisition of the
+        queue's lock, instead of one per payload. Taken payloads count as
+        done for `queue.Queue.join`.
+        """
+        entries = [self._queue.get(timeout=timeout)]
+        q = self._queue
+        with q.mutex:
+            for _ in range(min(max_items - 1, len(q.queue))):
+                entries.append(q.queue.popleft())
+            if len(entries) > 1:
+                q.not_full.notify(len(entries) - 1)
+            # as `task_done` would, once per payload:
+            q.unfinished_tasks -= len(entries)
+            if not q.unfinished_tasks:
+                q.all_tasks_done.notify_all()
+        offsets = [offset for _, offset in entries if offset is not None]
+        if offsets or self._spilled:
+            with self._spill_lock:
+                if offsets:
+                    self._consume(offsets[-1])
+                if self._spilled:
+                    self._unspill()
+        return [payload for payload, _ in entries]
+
+    def open(self) -> None:
+        """Accept payloads again after `close`."""
+        self._closed.clear()
+
+    def close(self) -> None:
+        """Release blocked producers, spilled payloads stay on disk."""
+        self._closed.set()
+        with self._spill_lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def _record_depth(self) -> None:
+        # not locked: the callback thread is the only producer.
+        depth = self._queue.qsize()
+        if depth > self._high_water:
+            self._high_water = depth
+            netmon.set_named_value("payload_queue_high_water", self.name, depth)
+
+    def _drop_oldest(self) -> None:
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            return
+        self._queue.task_done()
+        netmon.add_named_count("payload_queue_dropped", self.name)
+        debug_logger.debug(f"{self.name}: payload queue full, oldest dropped.")
+
+    def _spill(self, payload: Payload) -> None:
+        if self._spill_file is None:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            self._spill_file = open(self.spill_path, "a", encoding="utf-8")
+        if not self._spilled:
+            main_logger.warning(
+                f"{self.name}: payload queue full ({self.maxsize}), spilling "
+                f"to {self.spill_path}."
+            )
+        # as a JSON string, payloads may span lines or not be UTF-8:
+        line = json.dumps(payload.decode("utf-8", "surrogateescape"))
+        self._spill_file.write(line + "\n")
+        self._spill_file.flush()
+        self._spilled += 1
+        netmon.set_named_value("payload_queue_spilled", self.name, self._spilled)
+
+    def _unspill(self) -> None:
+        """Move spilled payloads back into memory while there is room."""
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            f.seek(self._read_offset)
+            while self._spilled and not self._queue.full():
+                line = f.readline()
+                if not line:
+                    break
+                if line.strip():
+                    payload = json.loads(line).encode("utf-8", "surrogateescape")
+                    self._queue.put_nowait((payload, f.tell()))
+                    self._spilled -= 1
+            self._read_offset = f.tell()
+        if not self._spilled and self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        netmon.set_named_value("payload_queue_spilled", self.name, self._spilled)
+
+    def _consume(self, offset: int) -> None:
+        """Record that the spilled payloads up to `offset` reached the consumer."""
+        self._consumed_offset = offset
+        if not self._spilled and offset >= self._read_offset:
+            self._remove_spill_file()
+            event_logger.info(f"{self.name}: spilled payloads all consumed.")
+            return
+        tmp = self.offset_path.with_suffix(".tmp")
+        tmp.write_text(str(offset), encoding="utf-8")
+        os.replace(tmp, self.offset_path)
+
+    def _load_offset(self) -> int:
+        try:
+            return int(self.offset_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _remove_spill_file(self) -> None:
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self.spill_path.unlink(missing_ok=True)
+        self.offset_path.unlink(missing_ok=True)
+        self._read_offset = self._consumed_offset = 0
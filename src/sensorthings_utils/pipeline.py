@@ -0,0 +1,276 @@
+"""Bounded upload queue served by a pool of uploader threads, and a keyed
+executor processing the work of each sensor in order."""
+
+# standard
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Hashable, Tuple
+
+# internal
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.transformers.types import ObservedProperties, SensorID
+
+main_logger = logging.getLogger("main")
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["UploadPipeline", "KeyedExecutor"]
+
+ObservationSet = Tuple[Observation, ObservedProperties]
+UploadFn = Callable[[SensorID, ObservationSet], None]
+FailureFn = Callable[[Exception, SensorID], object]
+# (callable, args, kwargs) of a task on a KeyedExecutor:
+Task = Tuple[Callable[..., object], Tuple[Any, ...], dict[str, Any]]
+
+# smoothing factor of the moving average of queue wait times:
+_WAIT_EWMA_ALPHA = 0.1
+
+
+class UploadPipeline:
+    """
+    Decouple ingest from upload: a bounded queue and a pool of uploader threads.
+
+    Connections `submit` transformed observations and return to their drain
+    loop straight away; `workers` threads take them off the queue and call
+    `upload`. A full queue blocks `submit`, pushing back on the connection
+    rather than growing without limit.
+
+    Queue depth, a moving average of the time spent waiting in the queue and
+    the time workers spend uploading are reported to `netmon` under `name`.
+
+    Parameters:
+        name (str): name used for threads and netmon entries (the app name).
+        upload (UploadFn): called with (sensor_id, observation_set).
+        workers (int): number of uploader threads.
+        maxsize (int): queue capacity.
+        on_failure (FailureFn | None): called with an upload exception and
+            the sensor it belongs to.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        upload: UploadFn,
+        *,
+        workers: int = 2,
+        maxsize: int = 1000,
+        on_failure: FailureFn | None = None,
+    ):
+        self.name = name
+        self.upload = upload
+        self.workers = workers
+        self.on_failure = on_failure
+        # private:
+        self._queue: queue.Queue[tuple[SensorID, ObservationSet, float]] = (
+            queue.Queue(maxsize=maxsize)
+        )
+        self._threads: list[threading.Thread] = []
+        self._stop_event = threading.Event()
+        self._wait_ewma = 0.0
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def submit(
+        self,
+        sensor_id: SensorID,
+        observation_set: ObservationSet,
+        timeout: float | None = None,
+    ) -> None:
+        """Queue an observation, blocking while the queue is full."""
+        self._queue.put((sensor_id, observation_set, time.monotonic()), timeout=timeout)
+        netmon.set_named_value("upload_queue_depth", self.name, self._queue.qsize())
+
+    def join(self) -> None:
+        """Block until every queued observation has been handled."""
+        self._queue.join()
+
+    # threading methods  #######################################################
+    def start(self) -> None:
+        """Start (or top up) the uploader threads."""
+        self._stop_event.clear()
+        self._threads = [t for t in self._threads if t.is_alive()]
+        netmon.set_named_value("upload_workers", self.name, self.workers)
+        if not netmon.upload_start_time.get(self.name):
+            netmon.set_named_value("upload_start_time", self.name, time.time())
+        for i in range(len(self._threads), self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                daemon=True,
+                name=f"{self.name}-uploader-{i}",
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5) -> None:
+        """Stop the uploader threads once the queue has been drained."""
+        deadline = time.monotonic() + timeout
+        # with no threads running, nothing is going to drain it:
+        while (
+            self._queue.unfinished_tasks
+            and any(t.is_alive() for t in self._threads)
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.05)
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+    def drain(self) -> list[tuple[SensorID, ObservationSet]]:
+        """Remove and return everything still queued, e.g. after `stop()`."""
+        drained = []
+        while True:
+            try:
+                sensor_id, observation_set, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            drained.append((sensor_id, observation_set))
+            self._queue.task_done()
+        netmon.set_named_value("upload_queue_depth", self.name, 0)
+        return drained
+
+    def _worker_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                sensor_id, observation_set, queued_at = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            started = time.monotonic()
+            self._record_wait(started - queued_at)
+            try:
+                self.upload(sensor_id, observation_set)
+            except Exception as e:
+                if self.on_failure is not None:
+                    self.on_failure(e, sensor_id)
+                else:
+                    main_logger.error(f"{self.name} upload failed: {e}")
+            finally:
+                netmon.add_named_count(
+                    "upload_busy_time", self.name, time.monotonic() - started
+                )
+                netmon.set_named_value(
+                    "upload_queue_depth", self.name, self._queue.qsize()
+                )
+                self._queue.task_done()
+
+    def _record_wait(self, wait: float) -> None:
+        # not locked: a lost update only skews the average slightly.
+        self._wait_ewma += _WAIT_EWMA_ALPHA * (wait - self._wait_ewma)
+        netmon.set_named_value("upload_queue_wait", self.name, self._wait_ewma)
+
+
+class KeyedExecutor:
+    """
+    Run tasks on a pool of threads, in submission order for each key.
+
+    Every key (a sensor id) is routed to one of `workers` threads by a stable
+    hash, and each thread has a bounded queue of its own. The tasks of a key
+    therefore run one after the other in the order they were submitted, so
+    that the phenomenonTimes of a sensor's observations reach FROST in
+    sequence, while tasks of keys routed to other threads run in parallel. A
+    full queue blocks `submit`.
+
+    The number of queued tasks is reported to `netmon` under `name`.
+
+    Parameters:
+        name (str): name used for threads and netmon entries (the app name).
+        workers (int): number of threads.
+        maxsize (int): capacity of the queue of each thread.
+        on_failure (FailureFn | None): called with a task's exception and its
+            key.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        workers: int = 4,
+        maxsize: int = 1000,
+        on_failure: FailureFn | None = None,
+    ):
+        self.name = name
+        self.workers = max(1, workers)
+        self.on_failure = on_failure
+        # private:
+        self._queues: list[queue.Queue[tuple[Hashable, Task]]] = [
+            queue.Queue(maxsize=maxsize) for _ in range(self.workers)
+        ]
+        self._threads: list[threading.Thread | None] = [None] * self.workers
+        self._stop_event = threading.Event()
+
+    def __len__(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def __repr__(self) -> str:
+        return f"KeyedExecutor(name={self.name}, workers={self.workers})"
+
+    def worker_for(self, key: Hashable) -> int:
+        """Index of the thread running the tasks of `key`."""
+        return zlib.crc32(str(key).encode("UTF-8")) % self.workers
+
+    def submit(
+        self,
+        key: Hashable,
+        fn: Callable[..., object],
+        *args: Any,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Queue `fn(*args, **kwargs)` behind the earlier tasks of `key`."""
+        task: Task = (fn, args, kwargs)
+        self._queues[self.worker_for(key)].put((key, task), timeout=timeout)
+        netmon.set_named_value("keyed_queue_depth", self.name, len(self))
+
+    def join(self) -> None:
+        """Block until every queued task has run."""
+        for q in self._queues:
+            q.join()
+
+    # threading methods  #######################################################
+    def start(self) -> None:
+        """Start (or restart) the threads."""
+        self._stop_event.clear()
+        for i, thread in enumerate(self._threads):
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    args=(self._queues[i],),
+                    daemon=True,
+                    name=f"{self.name}-keyed-{i}",
+                )
+                thread.start()
+                self._threads[i] = thread
+
+    def stop(self, timeout: float = 5) -> None:
+        """Stop the threads once their queues have been drained."""
+        deadline = time.monotonic() + timeout
+        while (
+            any(q.unfinished_tasks for q in self._queues)
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.05)
+        self._stop_event.set()
+        for thread in self._threads:
+            if thread is not None:
+                thread.join(max(deadline - time.monotonic(), 0))
+
+    def _worker_loop(self, tasks: "queue.Queue[tuple[Hashable, Task]]") -> None:
+        while not self._stop_event.is_set():
+            try:
+                key, (fn, args, kwargs) = tasks.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                if self.on_failure is not None:
+                    self.on_failure(e, key)  # type: ignore
+                else:
+                    main_logger.error(f"{self.name} task for {key} failed: {e}")
+            finally:
+                tasks.task_done()
+                netmon.set_named_value("keyed_queue_depth", self.name, len(self))
@@ -0,0 +1,311 @@
+"""Plan and apply provisioning as a diff between sensor configs and FROST."""
+
+# standard
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, TYPE_CHECKING
+
+# internal
+from sensorthings_utils import frost
+from sensorthings_utils.frost import ENTITY_ENDPOINTS, EntityIndex
+from sensorthings_utils.registry import EntityIds, EntityRegistry, config_hash
+from sensorthings_utils.transformers.types import SensorID
+
+if TYPE_CHECKING:
+    from sensorthings_utils.sensor_things.core import SensorThingsObject
+    from sensorthings_utils.sensor_things.extensions import SensorArrangement
+
+logger = logging.getLogger(__name__)
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["Change", "ProvisioningPlan", "plan", "apply", "CREATE", "UPDATE", "SKIP"]
+
+CREATE, UPDATE, SKIP = "create", "update", "skip"
+
+# Datastream navigation links which can be changed → key in `iot_links`:
+DATASTREAM_LINKS = {"Thing": "things", "ObservedProperty": "observedProperties"}
+
+# (st_type, key) → the entity as returned by FROST
+FrostState = Dict[Tuple[str, Any], Dict[str, Any]]
+
+
+@dataclass
+class Change:
+    """The create, update or skip of one entity of the sensor configs."""
+
+    action: str
+    st_type: str
+    name: str
+    sensor: SensorID
+    iot_id: Any = None
+    # changed fields → value in the sensor config:
+    fields: Dict[str, Any] = field(default_factory=dict)
+    # changed Datastream links → name of the entity to link to:
+    links: Dict[str, str] = field(default_factory=dict)
+    # the existing Thing a new Location is created for:
+    thing_id: Any = None
+
+    def __str__(self) -> str:
+        symbol = {CREATE: "+", UPDATE: "~", SKIP: "="}[self.action]
+        summary = f"{symbol} {self.st_type} {self.name}"
+        if self.action == UPDATE:
+            summary += f" ({', '.join([*self.fields, *self.links])})"
+        return summary
+
+    @property
+    def batched(self) -> bool:
+        """True if applied in a `$batch` request, False if by `frost.provision`."""
+        return self.action == UPDATE or self.thing_id is not None
+
+    def request(self, index: EntityIndex) -> Dict[str, Any]:
+        """The `$batch` request of a batched change, links resolved in `index`."""
+        if self.action == CREATE:
+            return {
+                "method": "post",
+                "url": f"Things({frost._id_literal(self.thing_id)})/Locations",
+                "body": self.fields,
+            }
+        body = dict(self.fields)
+        for st_type, name in self.links.items():
+            body[st_type] = {"@iot.id": index.get(st_type, name)}
+        return {
+            "method": "patch",
+            "url": f"{ENTITY_ENDPOINTS[self.st_type][1:]}"
+            f"({frost._id_literal(self.iot_id)})",
+            "body": body,
+        }
+
+
+@dataclass
+class ProvisioningPlan:
+    """
+    The changes provisioning the sensor arrangements on FROST takes.
+
+    Entities shared by several arrangements appear once, under the first
+    sensor using them. `entity_ids` holds the ids of the existing entities of
+    each sensor, in the form kept by the `EntityRegistry`.
+    """
+
+    sensor_arrangements: List["SensorArrangement"]
+    changes: List[Change] = field(default_factory=list)
+    entity_ids: Dict[SensorID, EntityIds] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        """Number of changes which are not skips."""
+        return sum(change.action != SKIP for change in self.changes)
+
+    def of(self, action: str) -> List[Change]:
+        return [change for change in self.changes if change.action == action]
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.of(CREATE))} to create, {len(self.of(UPDATE))} to update, "
+            f"{len(self.of(SKIP))} unchanged."
+        )
+
+
+def _entities(
+    sensor_arrangement: "SensorArrangement",
+) -> Iterator[Tuple["SensorThingsObject", Any]]:
+    """Every entity of an arrangement with its key, Locations under their Thing."""
+    for thing in sensor_arrangement.get_entities("Thing"):
+        yield thing, thing.name
+        for location in thing.iot_links["locations"]:
+            yield location, (thing.name, location.name)  # type: ignore
+    for st_type in ("Sensor", "ObservedProperty", "Datastream"):
+        for entity in sensor_arrangement.get_entities(st_type):  # type: ignore
+            yield entity, EntityIndex.key(entity)
+
+
+def _fetch_state(
+    sensor_arrangements: List["SensorArrangement"], batch_size: int
+) -> FrostState:
+    """
+    The existing entities of the arrangements, with one query per `batch_size`
+    names of each entity type. Locations are expanded with their Thing.
+    """
+
+    def names(st_type: str) -> set[str]:
+        return {
+            entity.name
+            for sensor_arrangement in sensor_arrangements
+            for entity in sensor_arrangement.get_entities(st_type)  # type: ignore
+        }
+
+    state: FrostState = {}
+    for st_type in ("Thing", "Sensor", "ObservedProperty"):
+        for found in frost.query_names(
+            st_type,
+            names(st_type),
+            expand="Locations" if st_type == "Thing" else None,
+            top=batch_size,
+            batch_size=batch_size,
+        ):
+            state[(st_type, found["name"])] = found
+            for location in found.get("Locations", []):
+                state[("Location", (found["name"], location["name"]))] = location
+    for found in frost.query_names(
+        "Datastream",
+        names("Sensor"),
+        field="Sensor/name",
+        expand=",".join(
+            f"{st_type}($select=name)" for st_type in ("Sensor", *DATASTREAM_LINKS)
+        ),
+        batch_size=batch_size,
+    ):
+        state[("Datastream", (found["Sensor"]["name"], found["name"]))] = found
+    return state
+
+
+def _normalised(value: Any) -> Any:
+    # FROST omits empty properties, configs hold them as None or {}:
+    return None if value in (None, {}) else value
+
+
+def _differences(entity: "SensorThingsObject", found: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of `entity` which differ from those FROST returned."""
+    desired = entity.model_dump(
+        mode="json", exclude={"iot_links", "id", "st_type", "name"}
+    )
+    return {
+        name: value
+        for name, value in desired.items()
+        if _normalised(value) != _normalised(found.get(name))
+    }
+
+
+def _relinks(entity: "SensorThingsObject", found: Dict[str, Any]) -> Dict[str, str]:
+    """The links of a Datastream which point elsewhere on FROST."""
+    if entity.st_type != "Datastream":
+        return {}
+    relinks = {}
+    for st_type, link in DATASTREAM_LINKS.items():
+        name = entity.iot_links[link][0].name  # type: ignore
+        if (found.get(st_type) or {}).get("name") != name:
+            relinks[st_type] = name
+    return relinks
+
+
+def plan(
+    sensor_arrangements: Iterable["SensorArrangement"], batch_size: int = 50
+) -> ProvisioningPlan:
+    """
+    The changes that would provision the sensor arrangements on FROST.
+
+    The FROST state of all arrangements is fetched in bulk (see
+    `_fetch_state`), after which every entity is compared locally: missing
+    entities are created, entities with changed fields or Datastreams linked
+    to another Thing or ObservedProperty are updated, the rest is skipped.
+    """
+    sensor_arrangements = list(sensor_arrangements)
+    state = _fetch_state(sensor_arrangements, batch_size)
+    provisioning_plan = ProvisioningPlan(sensor_arrangements)
+    planned: set[Tuple[str, Any]] = set()
+    for sensor_arrangement in sensor_arrangements:
+        sensor = frost._sensor_name(sensor_arrangement)
+        entity_ids: EntityIds = {}
+        for entity, key in _entities(sensor_arrangement):
+            found = state.get((entity.st_type, key))
+            if found is not None and entity.st_type in EntityIndex.indexed_types:
+                entity_ids[(entity.st_type, entity.name)] = found["@iot.id"]
+            if (entity.st_type, key) in planned:
+                continue
+            planned.add((entity.st_type, key))
+            if found is None:
+                change = Change(CREATE, entity.st_type, entity.name, sensor)
+                # a Location of an existing Thing is created in a batch:
+                if entity.st_type == "Location" and ("Thing", key[0]) in state:
+                    change.thing_id = state[("Thing", key[0])]["@iot.id"]
+                    change.fields = entity.model_dump(
+                        mode="json", exclude={"iot_links", "id", "st_type"}
+                    )
+            else:
+                fields, links = _differences(entity, found), _relinks(entity, found)
+                change = Change(
+                    UPDATE if fields or links else SKIP,
+                    entity.st_type,
+                    entity.name,
+                    sensor,
+                    iot_id=found["@iot.id"],
+                    fields=fields,
+                    links=links,
+                )
+            provisioning_plan.changes.append(change)
+        provisioning_plan.entity_ids[sensor] = entity_ids
+    debug_logger.debug(f"Provisioning plan: {provisioning_plan.summary()}")
+    return provisioning_plan
+
+
+def apply(
+    provisioning_plan: ProvisioningPlan,
+    workers: int = 4,
+    registry: EntityRegistry | None = None,
+    batch_size: int = 100,
+) -> List[Change]:
+    """
+    Apply a provisioning plan, return the changes which failed.
+
+    Arrangements with entities to create are set up with `frost.provision`.
+    Updates, and Locations new to an existing Thing, are then sent in `$batch`
+    requests of `batch_size`. With a `registry`, arrangements are registered
+    once all of their changes have been applied.
+    """
+    failed: List[Change] = []
+    creating = {
+        change.sensor for change in provisioning_plan.of(CREATE) if not change.batched
+    }
+    created = {
+        sensor: sensor_arrangement
+        for sensor_arrangement in provisioning_plan.sensor_arrangements
+        if (sensor := frost._sensor_name(sensor_arrangement)) in creating
+    }
+    if created:
+        provisioned = frost.provision(
+            created.values(), workers=workers, registry=registry
+        )
+        failed += [
+            change
+            for change in provisioning_plan.of(CREATE)
+            if not change.batched and change.sensor not in provisioned
+        ]
+
+    batched = [change for change in provisioning_plan.changes if change.batched]
+    # Datastreams may be relinked to entities created above:
+    index = EntityIndex()
+    for st_type in DATASTREAM_LINKS:
+        index.load(st_type, {c.links[st_type] for c in batched if st_type in c.links})
+    unresolved = [
+        change
+        for change in batched
+        if any(index.get(*link) is None for link in change.links.items())
+    ]
+    batched = [change for change in batched if change not in unresolved]
+    for change in unresolved:
+        logger.critical(f"Unable to {change.action} {change}: link target missing.")
+    failed += unresolved
+    responses = frost.batch_requests(
+        [change.request(index) for change in batched], batch_size=batch_size
+    )
+    for change, response in zip(batched, responses):
+        if not 200 <= response.get("status", 0) < 300:
+            logger.critical(
+                f"Unable to {change.action} {change}: {response.get('body')}"
+            )
+            failed.append(change)
+    event_logger.info(
+        f"Provisioning plan applied: {len(created)} sensors set up, "
+        f"{len(batched)} batched changes, {len(failed)} failed."
+    )
+
+    if registry is not None:
+        failing = {change.sensor for change in failed}
+        for sensor_arrangement in provisioning_plan.sensor_arrangements:
+            sensor = frost._sensor_name(sensor_arrangement)
+            if sensor not in created and sensor not in failing:
+                registry.register(
+                    sensor,
+                    config_hash(sensor_arrangement),
+                    provisioning_plan.entity_ids[sensor],
+                )
+    return failed
@@ -0,0 +1,88 @@
+"""Readiness probing of the services st-utils depends on."""
+
+# standard
+import logging
+import socket
+import time
+from typing import Callable, Dict, List
+
+# internal
+from sensorthings_utils.exceptions import DependencyNotReady
+from sensorthings_utils.monitor import netmon
+
+main_logger = logging.getLogger("main")
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["Probe", "tcp_probe", "wait_until_ready", "warn_unready"]
+
+# a probe raises while its service is not ready:
+Probe = Callable[[], object]
+
+
+def tcp_probe(host: str, port: int, timeout: float = 5) -> Probe:
+    """Probe accepting a TCP connection, e.g. of an MQTT broker."""
+
+    def probe() -> None:
+        socket.create_connection((host, port), timeout=timeout).close()
+
+    return probe
+
+
+def wait_until_ready(
+    probes: Dict[str, Probe],
+    deadline: float = 300,
+    initial_backoff: float = 0.5,
+    max_backoff: float = 15,
+) -> float:
+    """
+    Poll `probes` until each has succeeded once, return the seconds it took.
+
+    Probes which have not succeeded yet are retried with exponential backoff,
+    from `initial_backoff` up to `max_backoff` seconds between rounds. The
+    time each dependency took to become ready is recorded in `netmon`.
+
+    Raises:
+        DependencyNotReady: if some probe still fails after `deadline` seconds.
+    """
+    start = time.monotonic()
+    pending = dict(probes)
+    errors: Dict[str, Exception] = {}
+    backoff = initial_backoff
+    while True:
+        for name, probe in list(pending.items()):
+            try:
+                probe()
+            except Exception as e:
+                errors[name] = e
+                debug_logger.debug(f"{name} not ready: {e}")
+                continue
+            elapsed = time.monotonic() - start
+            del pending[name]
+            netmon.set_named_value("time_to_ready", name, elapsed)
+            event_logger.info(f"{name} ready after {elapsed:.1f}s.")
+        if not pending:
+            return time.monotonic() - start
+        if time.monotonic() - start + backoff > deadline:
+            raise DependencyNotReady(
+                f"Not ready after {deadline}s: "
+                + ", ".join(f"{name} ({errors[name]})" for name in pending)
+            )
+        time.sleep(backoff)
+        backoff = min(backoff * 2, max_backoff)
+
+
+def warn_unready(probes: Dict[str, Probe]) -> List[str]:
+    """
+    Run `probes` once and log a warning for each which fails, for
+    dependencies worth reporting but not worth waiting for; return the names
+    of those not ready.
+    """
+    unready = []
+    for name, probe in probes.items():
+        try:
+            probe()
+        except Exception as e:
+            unready.append(name)
+            main_logger.warning(f"{name} not ready ({e}), starting without it.")
+    return unready
@@ -0,0 +1,135 @@
+"""Persistent registry of the FROST ids of provisioned sensor configs."""
+
+# standard
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple, TYPE_CHECKING
+
+# internal
+from sensorthings_utils.paths import LOGS_DIR
+from sensorthings_utils.transformers.types import SensorID
+
+if TYPE_CHECKING:
+    from sensorthings_utils.sensor_things.extensions import SensorArrangement
+
+main_logger = logging.getLogger("main")
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["EntityRegistry", "config_hash", "REGISTRY_FILE"]
+
+REGISTRY_FILE = LOGS_DIR / "entity_registry.sqlite3"
+
+# (st_type, name) → @iot.id
+EntityIds = Dict[Tuple[str, str], Any]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS configs (
+    sensor TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    registered_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    sensor TEXT NOT NULL REFERENCES configs(sensor) ON DELETE CASCADE,
+    st_type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    iot_id TEXT NOT NULL,
+    PRIMARY KEY (sensor, st_type, name)
+);
+"""
+
+
+def config_hash(sensor_arrangement: "SensorArrangement") -> str:
+    """Content hash of the SensorConfig a sensor arrangement was built from."""
+    data = json.dumps(
+        sensor_arrangement._sensor_config.data, sort_keys=True, default=str
+    )
+    return hashlib.sha256(data.encode("UTF-8")).hexdigest()
+
+
+class EntityRegistry:
+    """
+    SQLite registry of the FROST `@iot.id`s of each provisioned sensor config.
+
+    A sensor config is `register`ed with the content hash of its SensorConfig
+    once it has been set up on FROST. After a restart, `lookup` returns the ids
+    of a config whose hash is unchanged, so that it needs no FROST queries;
+    changed configs miss and are set up again.
+
+    Ids are stored as JSON, FROST ids can be numbers or strings.
+
+    Parameters:
+        path (Path): the SQLite database, created on first use.
+    """
+
+    def __init__(self, path: Path | str = REGISTRY_FILE):
+        self.path = Path(path)
+        # private:
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"EntityRegistry(path={self.path})"
+
+    def __len__(self) -> int:
+        """Number of registered sensor configs."""
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM configs").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # provisioning workers share the connection, under `_lock`:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA foreign_keys = ON")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def lookup(self, sensor_name: SensorID, config_hash: str) -> EntityIds | None:
+        """Registered ids of a sensor config, None if unknown or changed since."""
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT hash FROM configs WHERE sensor = ?", (sensor_name,)
+            ).fetchone()
+            if row is None or row[0] != config_hash:
+                return None
+            rows = db.execute(
+                "SELECT st_type, name, iot_id FROM entities WHERE sensor = ?",
+                (sensor_name,),
+            ).fetchall()
+        return {(st_type, name): json.loads(iot_id) for st_type, name, iot_id in rows}
+
+    def register(
+        self, sensor_name: SensorID, config_hash: str, entity_ids: EntityIds
+    ) -> None:
+        """Replace the registered ids of a sensor config."""
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM configs WHERE sensor = ?", (sensor_name,))
+            db.execute(
+                "INSERT INTO configs VALUES (?, ?, ?)",
+                (sensor_name, config_hash, time.time()),
+            )
+            db.executemany(
+                "INSERT INTO entities VALUES (?, ?, ?, ?)",
+                [
+                    (sensor_name, st_type, name, json.dumps(iot_id))
+                    for (st_type, name), iot_id in entity_ids.items()
+                ],
+            )
+        debug_logger.debug(f"Registered {len(entity_ids)} entities of {sensor_name}.")
+
+    def forget(self, sensor_name: SensorID) -> None:
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM configs WHERE sensor = ?", (sensor_name,))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,266 @@
+"""Asyncio runtime: every connection as a task on a single event loop."""
+
+# standard
+import asyncio
+import logging
+import socket
+import threading
+from typing import Callable, Iterable, TYPE_CHECKING
+
+# external
+from paho.mqtt.client import MQTT_ERR_SUCCESS, Client as mqttClient
+
+# internal
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.transformers.types import SensorID, SupportedSensors
+
+if TYPE_CHECKING:
+    from sensorthings_utils.connections import SensorApplicationConnection
+
+main_logger = logging.getLogger("main")
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["AsyncRuntime", "PahoAsyncBridge", "RUNTIMES"]
+
+RUNTIMES = ("threads", "asyncio")
+
+
+class PahoAsyncBridge:
+    """
+    Drive a paho client from an asyncio event loop instead of its own thread.
+
+    The client's socket is registered with the loop: it is read when readable,
+    written when paho has data to send, and `loop_misc` (keepalives, retries)
+    runs every `misc_interval` seconds. paho callbacks, `on_message`
+    included, therefore run on the event loop thread.
+
+    Reading pauses while `can_read` returns False, e.g. while a payload queue
+    is full, until `resume` is called; the broker then holds back messages.
+
+    When the connection is lost (the socket closes, or `loop_misc` fails on a
+    missed keepalive), the client reconnects off the loop, as paho's own
+    `loop_start` thread would, with a delay doubling from `reconnect_delay`
+    up to `max_reconnect_delay` seconds; its new socket is registered again.
+    Call `close` before disconnecting deliberately.
+
+    Parameters:
+        client (mqttClient): the paho client, not yet connected.
+        loop (asyncio.AbstractEventLoop): the loop to drive it from.
+        can_read (Callable[[], bool]): whether another message can be taken.
+        misc_interval (float): seconds between `loop_misc` calls.
+        reconnect_delay (float): seconds before the first reconnect attempt.
+        max_reconnect_delay (float): longest delay between attempts.
+    """
+
+    def __init__(
+        self,
+        client: mqttClient,
+        loop: asyncio.AbstractEventLoop,
+        can_read: Callable[[], bool] = lambda: True,
+        misc_interval: float = 1.0,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 120.0,
+    ):
+        self.client = client
+        self.loop = loop
+        self.can_read = can_read
+        self.misc_interval = misc_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        # private:
+        self._sock: socket.socket | None = None
+        self._reading = False
+        self._misc_task: asyncio.Task | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._closing = False
+        # the socket may be opened by `connect` on another thread:
+        client.on_socket_open = self._threadsafe(self._on_socket_open)
+        client.on_socket_close = self._threadsafe(self._on_socket_close)
+        client.on_socket_register_write = self._threadsafe(self._on_register_write)
+        client.on_socket_unregister_write = self._threadsafe(
+            self._on_unregister_write
+        )
+
+    def _threadsafe(self, callback: Callable) -> Callable:
+        def call(client, userdata, sock):
+            self.loop.call_soon_threadsafe(callback, sock)
+
+        return call
+
+    def _on_socket_open(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self.resume()
+        self._misc_task = self.loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, sock: socket.socket) -> None:
+        if self._reading:
+            self.loop.remove_reader(sock)
+            self._reading = False
+        self.loop.remove_writer(sock)
+        self._sock = None
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+            self._misc_task = None
+        self._schedule_reconnect()
+
+    def _on_register_write(self, sock: socket.socket) -> None:
+        self.loop.add_writer(sock, self.client.loop_write)
+
+    def _on_unregister_write(self, sock: socket.socket) -> None:
+        self.loop.remove_writer(sock)
+
+    def _read(self) -> None:
+        if not self.can_read():
+            # backpressure: stop reading until `resume`.
+            self.loop.remove_reader(self._sock)  # type: ignore
+            self._reading = False
+            return
+        self.client.loop_read()
+
+    def resume(self) -> None:
+        """Read from the socket again, after a pause."""
+        if self._sock is not None and not self._reading:
+            self.loop.add_reader(self._sock, self._read)
+            self._reading = True
+
+    async def _misc_loop(self) -> None:
+        while self.client.loop_misc() == MQTT_ERR_SUCCESS:
+            await asyncio.sleep(self.misc_interval)
+        self._misc_task = None
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        if self._closing or (
+            self._reconnect_task is not None and not self._reconnect_task.done()
+        ):
+            return
+        self._reconnect_task = self.loop.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.reconnect_delay
+        while not self._closing:
+            main_logger.warning(f"MQTT connection lost, reconnecting in {delay:.0f}s.")
+            await asyncio.sleep(delay)
+            try:
+                # blocking connect, the new socket is registered by
+                # `_on_socket_open`:
+                await asyncio.to_thread(self.client.reconnect)
+                return
+            except (OSError, ValueError) as e:
+                debug_logger.debug(f"MQTT reconnect failed: {e!r}")
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def close(self) -> None:
+        """Stop reconnecting, before a deliberate disconnect."""
+        self._closing = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+
+
+class AsyncRuntime:
+    """
+    Run connections as tasks on one event loop, in one thread.
+
+    HTTP connections poll with `asyncio.sleep` between requests instead of
+    sleeping a thread each, and MQTT connections are driven by a
+    `PahoAsyncBridge`; see `SensorApplicationConnection.run`. Blocking calls
+    (application SDKs, sink flushes) go to the loop's default executor, a
+    bounded thread pool shared by all connections.
+
+    Each connection is supervised: a task which ends (max retries exceeded)
+    or fails is restarted after `restart_delay` seconds, and the restart
+    counted in `netmon.task_restarts`. This replaces the thread liveness
+    checks of `netmon.report` for the connections.
+
+    Parameters:
+        connections (Iterable[SensorApplicationConnection]): to run.
+        restart_delay (float): seconds before restarting a connection.
+        name (str): name of the runtime thread.
+    """
+
+    def __init__(
+        self,
+        connections: Iterable["SensorApplicationConnection"],
+        restart_delay: float = 30.0,
+        name: str = "connection-runtime",
+    ):
+        self.connections = list(connections)
+        self.restart_delay = restart_delay
+        self.name = name
+        # private:
+        self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopping: asyncio.Event | None = None
+        self._started = threading.Event()
+
+    def __repr__(self) -> str:
+        return f"AsyncRuntime(connections={len(self.connections)})"
+
+    async def run(self, sensor_registry: dict[SensorID, SupportedSensors]) -> None:
+        """Run and supervise every connection until `stop` (or cancelled)."""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._started.set()
+        tasks = [
+            asyncio.create_task(
+                self._supervise(connection, sensor_registry), name=connection.app_name
+            )
+            for connection in self.connections
+        ]
+        event_logger.info(f"{self} started {len(tasks)} connection tasks.")
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for connection in self.connections:
+                connection.stop_pull_transform_push_thread()
+
+    async def _supervise(
+        self,
+        connection: "SensorApplicationConnection",
+        sensor_registry: dict[SensorID, SupportedSensors],
+    ) -> None:
+        if not connection._preflight():
+            event_logger.warning(
+                f"Preflight check failed for {connection.app_name}; not starting "
+                "connection."
+            )
+            return
+        while True:
+            try:
+                await connection.run(sensor_registry)
+                main_logger.warning(f"{connection.app_name} task stopped.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                main_logger.error(f"{connection.app_name} task failed: {e!r}")
+            netmon.add_named_count("task_restarts", connection.app_name)
+            await asyncio.sleep(self.restart_delay)
+            event_logger.info(f"Restarting {connection.app_name} task.")
+            connection._stop_event.clear()
+
+    # threading methods  #######################################################
+    def start(self, sensor_registry: dict[SensorID, SupportedSensors]) -> None:
+        """Run the event loop in a background thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._started.clear()
+            self._thread = threading.Thread(
+                target=asyncio.run,
+                args=(self.run(sensor_registry),),
+                daemon=True,
+                name=self.name,
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 15) -> None:
+        """Cancel every connection task and stop the event loop."""
+        if self._thread is None:
+            return
+        self._started.wait(timeout)
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join(timeout)
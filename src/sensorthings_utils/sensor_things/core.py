@@ -99,6 +99,23 @@ class Location(SensorThingsObject):
     location: dict
 
 
+class FeatureOfInterest(SensorThingsObject):
+    encodingType: Annotated[
+        str, StringConstraints(strip_whitespace=True, min_length=1, max_length=255)
+    ]
+    feature: dict
+
+    @classmethod
+    def from_location(cls, location: Location) -> "FeatureOfInterest":
+        """The FeatureOfInterest FROST derives from a Location."""
+        return cls(
+            name=location.name,
+            description=location.description,
+            encodingType=location.encodingType,
+            feature=location.location,
+        )
+
+
 class ObservedProperty(SensorThingsObject):
     definition: Annotated[
         str, StringConstraints(strip_whitespace=True, min_length=1, max_length=255)
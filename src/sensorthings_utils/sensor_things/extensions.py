@@ -3,7 +3,19 @@ Extensions and wrappers to facilitate OGC SensorThings compliant implementations
 """
 
 # standard
-from typing import Dict, List, Any, Type, Literal, Optional, Tuple, TYPE_CHECKING
+from collections import defaultdict
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Any,
+    Callable,
+    Type,
+    Literal,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+)
 from pathlib import Path
 import logging
 
@@ -30,7 +42,7 @@ debug_logger = logging.getLogger("debug")
 if TYPE_CHECKING:
     ...
 
-__all__ = ["SensorConfig", "SensorArrangement"]
+__all__ = ["SensorConfig", "SensorArrangement", "FleetArrangement"]
 
 main_logger = logging.getLogger("main")
 
@@ -404,3 +416,171 @@ class SensorArrangement:
             if sensor_things_object.__class__.__name__ == entity:
                 entity_list.append(sensor_things_object)
         return entity_list
+
+    def deep_insert(
+        self,
+        thing: "SensorThingsObject",
+        existing_id: Callable[["SensorThingsObject"], Any] = lambda entity: None,
+    ) -> Dict[str, Any]:
+        """
+        Return a FROST deep insert payload creating `thing` with its Locations
+        and Datastreams in one POST to `/Things`.
+
+        The Sensor and ObservedProperty of each Datastream are referenced by
+        the `@iot.id` returned by `existing_id`, or nested if it returns None.
+        A nested entity is created once per Datastream nesting it: entities
+        shared by several Datastreams should exist beforehand.
+        """
+
+        def fields(entity: "SensorThingsObject") -> Dict[str, Any]:
+            return entity.model_dump(
+                mode="json", exclude={"iot_links", "id", "st_type"}
+            )
+
+        def reference_or_fields(entity: "SensorThingsObject") -> Dict[str, Any]:
+            iot_id = existing_id(entity)
+            return {"@iot.id": iot_id} if iot_id is not None else fields(entity)
+
+        payload = fields(thing)
+        payload["Locations"] = [
+            fields(location) for location in thing.iot_links.get("locations", [])
+        ]
+        payload["Datastreams"] = [
+            {
+                **fields(ds),
+                "Sensor": reference_or_fields(ds.iot_links["sensors"][0]),
+                "ObservedProperty": reference_or_fields(
+                    ds.iot_links["observedProperties"][0]
+                ),
+            }
+            for ds in self.get_entities("Datastream")
+            if ds.iot_links["things"][0].name == thing.name  # type: ignore
+        ]
+        return payload
+
+
+class FleetArrangement:
+    """
+    The sensor arrangements of a fleet, sharing their common entities.
+
+    Sensor configs repeat the same ObservedProperties, and often the same Thing
+    and Location. These are interned by type and name: every arrangement is
+    relinked to one shared instance of each, whose links gather those of all
+    arrangements, so that the Datastreams of the whole fleet form one graph.
+    `entities` lists each unique entity once.
+
+    FROST names are unique, so entities of the same name must be identical;
+    for those that are not, the first declaration is kept and the conflict is
+    logged and listed in `conflicts`.
+
+    Parameters:
+        sensor_arrangements (Iterable[SensorArrangement]): the fleet, whose
+            arrangements are relinked in place.
+    """
+
+    interned_types = ("Thing", "Location", "ObservedProperty")
+
+    def __init__(self, sensor_arrangements: Iterable[SensorArrangement]):
+        self.sensor_arrangements = list(sensor_arrangements)
+        self.conflicts: List[Tuple[str, str]] = []
+        # private:
+        self._entities: Dict[Tuple[str, Any], SensorThingsObject] = {}
+        # Thing name → arrangements linking it:
+        self._thing_users: Dict[str, List[SensorArrangement]] = defaultdict(list)
+        for sensor_arrangement in self.sensor_arrangements:
+            self._intern(sensor_arrangement)
+            for thing in sensor_arrangement.get_entities("Thing"):
+                self._thing_users[thing.name].append(sensor_arrangement)
+
+    def __repr__(self) -> str:
+        return (
+            f"FleetArrangement (SensorArrangements={len(self.sensor_arrangements)}, "
+            + f"SensorThingsObjects={len(self._entities)})"
+        )
+
+    def __len__(self) -> int:
+        """Number of unique entities."""
+        return len(self._entities)
+
+    @staticmethod
+    def _key(entity: "SensorThingsObject") -> Tuple[str, Any]:
+        # datastream names are only unique per sensor:
+        if entity.st_type == "Datastream":
+            sensor = entity.iot_links["sensors"][0].name  # type: ignore
+            return (entity.st_type, (sensor, entity.name))
+        return (entity.st_type, entity.name)
+
+    @staticmethod
+    def _content(entity: "SensorThingsObject") -> Dict[str, Any]:
+        return entity.model_dump(mode="json", exclude={"iot_links", "id", "st_type"})
+
+    def _intern(self, sensor_arrangement: SensorArrangement) -> None:
+        """Relink an arrangement to the shared instances of its entities."""
+        # id of a duplicate → the shared instance replacing it:
+        shared: Dict[int, "SensorThingsObject"] = {}
+        duplicates: List["SensorThingsObject"] = []
+        for entity in sensor_arrangement.linked_arrangement:
+            first = self._entities.setdefault(self._key(entity), entity)
+            if first is entity or entity.st_type not in self.interned_types:
+                continue
+            if self._content(first) != self._content(entity):
+                self.conflicts.append((entity.st_type, entity.name))
+                main_logger.warning(
+                    f"{entity.st_type} {entity.name} differs between sensor "
+                    "configs, the first declaration is used."
+                )
+            shared[id(entity)] = first
+            duplicates.append(entity)
+        if not shared:
+            return
+        # links are compared by identity, entities link back to each other:
+        for entity in sensor_arrangement.linked_arrangement:
+            for link, linked in entity.iot_links.items():
+                entity.iot_links[link] = [shared.get(id(e), e) for e in linked]
+        for duplicate in duplicates:
+            first = shared[id(duplicate)]
+            for link, linked in duplicate.iot_links.items():
+                first_links = first.iot_links.setdefault(link, [])
+                first_links.extend(
+                    e for e in linked if not any(e is f for f in first_links)
+                )
+        sensor_arrangement.linked_arrangement = tuple(
+            shared.get(id(e), e) for e in sensor_arrangement.linked_arrangement
+        )
+
+    def entities(
+        self,
+        st_type: Literal[
+            "Sensor", "Thing", "Location", "Datastream", "ObservedProperty"
+        ],
+    ) -> List["SensorThingsObject"]:
+        """The unique entities of a type across the fleet."""
+        return [e for (t, _), e in self._entities.items() if t == st_type]
+
+    def sharing_things(
+        self, sensor_arrangement: SensorArrangement
+    ) -> List[SensorArrangement]:
+        """`sensor_arrangement` and the other arrangements linking one of its Things."""
+        sharing = {id(sensor_arrangement): sensor_arrangement}
+        for thing in sensor_arrangement.get_entities("Thing"):
+            for user in self._thing_users[thing.name]:
+                sharing.setdefault(id(user), user)
+        return list(sharing.values())
+
+    def deep_insert(
+        self,
+        thing: "SensorThingsObject",
+        existing_id: Callable[["SensorThingsObject"], Any] = lambda entity: None,
+    ) -> Dict[str, Any]:
+        """
+        `SensorArrangement.deep_insert` of a Thing with the Datastreams of every
+        arrangement linking it.
+        """
+        payload: Dict[str, Any] = {}
+        for sensor_arrangement in self._thing_users[thing.name]:
+            arrangement_payload = sensor_arrangement.deep_insert(thing, existing_id)
+            if not payload:
+                payload = arrangement_payload
+            else:
+                payload["Datastreams"] += arrangement_payload["Datastreams"]
+        return payload
@@ -0,0 +1,246 @@
+"""Destinations for transformed observations."""
+
+# standard
+import asyncio
+import inspect
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, ClassVar
+
+# internal
+from sensorthings_utils import frost_async
+from sensorthings_utils.frost import frost_observation_upload
+from sensorthings_utils.frost_bulk import BulkObservationUploader, PendingObservation
+from sensorthings_utils.frost_mqtt import get_frost_mqtt_publisher
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.paths import LOGS_DIR
+from sensorthings_utils.pipeline import ObservationSet
+from sensorthings_utils.spool import ObservationSpool
+from sensorthings_utils.transformers.types import SensorID
+
+main_logger = logging.getLogger("main")
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = [
+    "ObservationSink",
+    "FrostHttpSink",
+    "FrostBulkSink",
+    "FrostMqttSink",
+    "FileSink",
+    "NullSink",
+    "SINKS",
+    "make_sink",
+]
+
+FailureFn = Callable[[list[PendingObservation]], object]
+
+
+class ObservationSink(ABC):
+    """
+    Abstract base class of a destination for transformed observations.
+
+    Connections `write` every observation to their sink, and call `flush` at
+    the end of a payload. A sink which cannot accept an observation raises
+    `FrostUploadFailure`; observations a sink rejects later (e.g. in a bulk
+    request) are handed to `on_failure` instead.
+
+    Parameters:
+        app_name (str): application writing to the sink.
+        on_failure (FailureFn | None): receives observations rejected after
+            `write` returned.
+    """
+
+    # True if failed observations should be spooled for replay to FROST:
+    uploads_to_frost: ClassVar[bool] = True
+
+    def __init__(self, app_name: str, on_failure: FailureFn | None = None):
+        self.app_name = app_name
+        self.on_failure = on_failure
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(app_name={self.app_name})"
+
+    @abstractmethod
+    def write(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        """Write a single observation."""
+        pass
+
+    async def awrite(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        """Asyncio `write`, on a worker thread unless a sink has a native one."""
+        await asyncio.to_thread(self.write, sensor_id, observation_set)
+
+    def flush(self) -> None:
+        """Called once a payload has been written."""
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def _failed(self, failed: list[PendingObservation]) -> None:
+        if failed and self.on_failure is not None:
+            self.on_failure(failed)
+
+
+class FrostHttpSink(ObservationSink):
+    """One FROST HTTP request per observation."""
+
+    def write(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        frost_observation_upload(sensor_id, observation_set, self.app_name)
+
+    async def awrite(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        await frost_async.frost_observation_upload(
+            sensor_id, observation_set, self.app_name
+        )
+
+
+class FrostBulkSink(ObservationSink):
+    """
+    Observations uploaded in FROST `CreateObservations` requests.
+
+    Parameters:
+        max_size (int): pending observations which trigger an upload.
+        max_age (float): seconds between uploads, 0 to upload once per payload
+            (on `flush`).
+    """
+
+    def __init__(
+        self,
+        app_name: str,
+        on_failure: FailureFn | None = None,
+        *,
+        max_size: int = 500,
+        max_age: float = 0,
+    ):
+        super().__init__(app_name, on_failure)
+        self.max_age = max_age
+        # private:
+        self._uploader = BulkObservationUploader(
+            max_size=max_size, max_age=max_age, on_failure=on_failure
+        )
+
+    def write(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        self._failed(self._uploader.add(sensor_id, observation_set))
+
+    def flush(self) -> None:
+        if not self.max_age:
+            self._failed(self._uploader.flush())
+
+    def start(self) -> None:
+        if self.max_age:
+            self._uploader.start()
+
+    def stop(self) -> None:
+        self._uploader.stop()
+
+
+class FrostMqttSink(ObservationSink):
+    """Observations published to FROST's MQTT create topics, see `frost_mqtt`."""
+
+    def write(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        get_frost_mqtt_publisher().publish(sensor_id, observation_set, self.app_name)
+
+    async def awrite(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        # publishing only queues the message with paho, it does not block:
+        self.write(sensor_id, observation_set)
+
+
+class FileSink(ObservationSink):
+    """
+    Observations appended to local JSONL segment files, without FROST.
+
+    Segments use the spool format, so a directory can be uploaded later with
+    `ObservationSpool(path).replay()`.
+
+    Parameters:
+        path (Path | None): segment directory, `logs/observations/<app_name>`
+            by default.
+    """
+
+    uploads_to_frost = False
+
+    def __init__(
+        self,
+        app_name: str,
+        on_failure: FailureFn | None = None,
+        *,
+        path: Path | str | None = None,
+    ):
+        super().__init__(app_name, on_failure)
+        self.path = Path(path) if path else LOGS_DIR / "observations" / app_name
+        # private:
+        self._segments = ObservationSpool(self.path, report_size=False)
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def write(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        self._segments.append(sensor_id, observation_set)
+        netmon.add_named_count("sink_writes", self.app_name, 1)
+
+    def flush(self) -> None:
+        self._segments.sync()
+
+    def stop(self) -> None:
+        # no replayer was started, this closes the open segment:
+        self._segments.stop_replayer()
+
+
+class NullSink(ObservationSink):
+    """Observations counted and discarded, e.g. to benchmark unpack+transform."""
+
+    uploads_to_frost = False
+
+    def __init__(self, app_name: str, on_failure: FailureFn | None = None):
+        super().__init__(app_name, on_failure)
+        self.counts: Counter[SensorID] = Counter()
+        # private:
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def write(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        with self._lock:
+            self.counts[sensor_id] += 1
+        netmon.add_named_count("sink_writes", self.app_name, 1)
+
+    async def awrite(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        self.write(sensor_id, observation_set)
+
+
+SINKS: dict[str, type[ObservationSink]] = {
+    "frost": FrostHttpSink,
+    "frost_bulk": FrostBulkSink,
+    "frost_mqtt": FrostMqttSink,
+    "file": FileSink,
+    "null": NullSink,
+}
+
+
+def make_sink(
+    sink: str,
+    app_name: str,
+    on_failure: FailureFn | None = None,
+    **options: Any,
+) -> ObservationSink:
+    """
+    Return the sink registered as `sink` in `SINKS`. Options the sink does not
+    take are ignored, so connections can pass all of theirs.
+    """
+    try:
+        sink_class = SINKS[sink]
+    except KeyError:
+        raise ValueError(
+            f"Unknown sink '{sink}' for {app_name}, expected one of "
+            f"{sorted(SINKS)}."
+        ) from None
+    parameters = inspect.signature(sink_class.__init__).parameters
+    accepted = {k: v for k, v in options.items() if k in parameters}
+    return sink_class(app_name, on_failure, **accepted)
@@ -0,0 +1,306 @@
+"""Durable on-disk spool for observations which did not reach FROST."""
+
+# standard
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Iterator
+from urllib import error
+
+# internal
+from sensorthings_utils.exceptions import FrostUploadFailure
+from sensorthings_utils.frost import get_datastream_id
+from sensorthings_utils.frost_bulk import BulkObservationUploader
+from sensorthings_utils.frost_client import get_frost_client
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.paths import LOGS_DIR
+from sensorthings_utils.pipeline import ObservationSet
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.transformers.types import ObservedProperties, SensorID
+
+main_logger = logging.getLogger("main")
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["ObservationSpool", "spool"]
+
+SPOOL_DIR = LOGS_DIR / "spool"
+
+
+class ObservationSpool:
+    """
+    Append-only JSONL spool of observations waiting to be (re)uploaded.
+
+    Records are appended to the newest segment file and fsync'ed in batches:
+    every `fsync_batch` records or `fsync_interval` seconds, whichever comes
+    first. A replayer thread periodically checks whether FROST is reachable
+    and, if so, closes the current segment and uploads the closed segments,
+    oldest first, with `CreateObservations` requests of `replay_batch` rows.
+    Observations whose datastream is not known yet (e.g. still being
+    provisioned) stay spooled for a later replay.
+
+    Spool size and replay rate are reported to `netmon`.
+
+    Parameters:
+        directory (Path): where segment files live, created on first use.
+        fsync_batch (int): records between fsyncs.
+        fsync_interval (float): maximum seconds between fsyncs.
+        max_segment_bytes (int): size at which a new segment is started.
+        replay_interval (float): seconds between replay attempts.
+        replay_batch (int): observations per replay request.
+        report_size (bool): report the spool size to `netmon`.
+    """
+
+    def __init__(
+        self,
+        directory: Path = SPOOL_DIR,
+        *,
+        fsync_batch: int = 100,
+        fsync_interval: float = 1.0,
+        max_segment_bytes: int = 4 * 1024 * 1024,
+        replay_interval: float = 30.0,
+        replay_batch: int = 500,
+        report_size: bool = True,
+    ):
+        self.directory = Path(directory)
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.replay_interval = replay_interval
+        self.replay_batch = replay_batch
+        self.report_size = report_size
+        # private:
+        self._file: IO[str] | None = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._size: int | None = None
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_replay_attempt = 0.0
+
+    def __len__(self) -> int:
+        """Number of spooled observations."""
+        with self._lock:
+            return self._count()
+
+    def _count(self) -> int:
+        if self._size is None:
+            self._size = sum(1 for _ in self._records_in(self._segments()))
+            self._report_size()
+        return self._size
+
+    def _report_size(self) -> None:
+        if self.report_size:
+            netmon.set_count("spool_size", self._size)
+
+    def _segments(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("*.jsonl"))
+
+    @staticmethod
+    def _records_in(segments: list[Path]) -> Iterator[dict[str, Any]]:
+        for segment in segments:
+            with open(segment, "r", encoding="utf-8") as f:
+                for line in f:
+                    # a torn final line (crash mid-write) is skipped:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        main_logger.warning(f"Skipping corrupt record in {segment}.")
+
+    # writing ##################################################################
+    def append(self, sensor_id: SensorID, observation_set: ObservationSet) -> None:
+        """Spool an observation for later upload."""
+        observation, datastream_name = observation_set
+        if isinstance(datastream_name, ObservedProperties):
+            datastream_name = datastream_name.value
+        record = {
+            "sensor": sensor_id,
+            "datastream": datastream_name,
+            "observation": observation.model_dump(
+                mode="json", exclude={"st_type"}
+            ),
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            size = self._count()
+            if self._file is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._file = open(
+                    self.directory / f"{time.time_ns()}.jsonl", "a", encoding="utf-8"
+                )
+            self._file.write(line)
+            self._unsynced += 1
+            self._size = size + 1
+            if (
+                self._unsynced >= self.fsync_batch
+                or time.monotonic() - self._last_sync >= self.fsync_interval
+            ):
+                self._sync()
+            if self._file.tell() >= self.max_segment_bytes:
+                self._close_segment()
+        self._report_size()
+
+    def sync(self) -> None:
+        """Flush and fsync the current segment."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    # replaying ################################################################
+    def replay(self) -> int:
+        """
+        Upload closed segments to FROST, return the number of observations
+        accepted. Stops at the first request FROST does not accept at all, the
+        remaining observations stay spooled, as do those whose datastream is
+        not known yet.
+        """
+        with self._replay_lock:
+            with self._lock:
+                self._close_segment()
+                segments = self._segments()
+            started = time.monotonic()
+            replayed = 0
+            for segment in segments:
+                records = list(self._records_in([segment]))
+                sent, accepted, kept = self._replay_records(records)
+                replayed += accepted
+                with self._lock:
+                    if kept or sent < len(records):
+                        self._rewrite(segment, kept + records[sent:])
+                    else:
+                        segment.unlink()
+                    self._size = max(self._count() - sent + len(kept), 0)
+                self._report_size()
+                if sent < len(records):
+                    break
+            elapsed = time.monotonic() - started
+            if replayed:
+                netmon.add_count("spool_replayed", replayed)
+                netmon.set_count("spool_replay_rate", replayed / max(elapsed, 1e-6))
+                event_logger.info(
+                    f"Replayed {replayed} spooled observations in {elapsed:.1f}s."
+                )
+            return replayed
+
+    def _replay_records(
+        self, records: list[dict[str, Any]]
+    ) -> tuple[int, int, list[dict[str, Any]]]:
+        """
+        Upload records in batches, return (records handled, records accepted,
+        handled records to keep as their datastream is not known yet).
+        """
+        sent = accepted = 0
+        kept: list[dict[str, Any]] = []
+        for i in range(0, len(records), self.replay_batch):
+            batch = records[i : i + self.replay_batch]
+            uploader = BulkObservationUploader(max_size=len(batch) + 1)
+            unrouted = []
+            try:
+                for r in batch:
+                    if get_datastream_id(r["sensor"], r["datastream"]) is None:
+                        unrouted.append(r)
+                        continue
+                    uploader.add(
+                        r["sensor"], (Observation(**r["observation"]), r["datastream"])
+                    )
+                rejected = uploader.flush(raise_errors=True)
+            except (FrostUploadFailure, error.URLError) as e:
+                # FROST is (still) unavailable, keep the rest spooled.
+                debug_logger.debug(f"Spool replay interrupted: {e}")
+                return sent, accepted, kept
+            if unrouted:
+                main_logger.warning(
+                    f"No datastream for {len(unrouted)} spooled observations yet, "
+                    "keeping them for a later replay."
+                )
+            if rejected:
+                main_logger.warning(
+                    f"FROST rejected {len(rejected)} spooled observations, "
+                    "dropping them."
+                )
+            kept += unrouted
+            sent += len(batch)
+            accepted += len(batch) - len(unrouted) - len(rejected)
+        return sent, accepted, kept
+
+    @staticmethod
+    def _rewrite(segment: Path, records: list[dict[str, Any]]) -> None:
+        tmp = segment.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, segment)
+
+    # threading methods  #######################################################
+    def start_replayer(self, after: threading.Thread | None = None) -> None:
+        """
+        Start a thread replaying the spool whenever FROST is reachable, once
+        the thread `after` (if any) ended.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._replay_loop,
+                args=(after,),
+                daemon=True,
+                name="spool-replayer",
+            )
+            self._thread.start()
+
+    def stop_replayer(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        with self._lock:
+            self._close_segment()
+
+    def _replay_loop(self, after: threading.Thread | None) -> None:
+        # keep syncing, but replay only once `after` ended:
+        while after is not None and after.is_alive():
+            if self._stop_event.is_set():
+                return
+            self.sync()
+            after.join(self.fsync_interval)
+        while not self._stop_event.wait(min(self.fsync_interval, self.replay_interval)):
+            self.sync()
+            if time.monotonic() - self._last_replay_attempt < self.replay_interval:
+                continue
+            self._last_replay_attempt = time.monotonic()
+            if not len(self) or not _frost_reachable():
+                continue
+            try:
+                self.replay()
+            except Exception as e:
+                main_logger.error(f"Spool replay failed: {e}")
+
+
+def _frost_reachable() -> bool:
+    try:
+        get_frost_client().request("GET", "/Datastreams?$top=1")
+        return True
+    except Exception as e:
+        debug_logger.debug(f"FROST not reachable for spool replay: {e}")
+        return False
+
+
+spool = ObservationSpool()
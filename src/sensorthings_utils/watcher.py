@@ -0,0 +1,276 @@
+"""Hot reload of sensor configs from a watched directory."""
+
+# standard
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+# internal
+import sensorthings_utils.frost as frost
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.paths import RUNTIME_SENSOR_CONFIG_PATH
+from sensorthings_utils.registry import EntityRegistry
+from sensorthings_utils.sensor_things.extensions import (
+    SensorArrangement,
+    SensorConfig,
+)
+from sensorthings_utils.transformers.types import SensorID, SupportedSensors
+
+main_logger = logging.getLogger("main")
+event_logger = logging.getLogger("events")
+debug_logger = logging.getLogger("debug")
+
+__all__ = ["SensorConfigWatcher"]
+
+# (st_mtime_ns, st_size) of a config file:
+FileState = Tuple[int, int]
+
+# inotify(7) events: a file written and closed, created, moved or removed.
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_MASK = (
+    _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+)
+
+
+class _Inotify:
+    """
+    Wake ups on changes under watched directories, from Linux inotify.
+
+    Events are not parsed, they only signal that a rescan is due. Raises
+    OSError where inotify is unavailable.
+    """
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def watch(self, directory: Path) -> None:
+        """Watch a directory, watching it again is a no-op."""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _IN_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Unable to watch {directory}")
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to `timeout` for changes, return True if any happened."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class SensorConfigWatcher:
+    """
+    Provision sensor configs added or edited under `path` while running.
+
+    The directory tree is rescanned every `interval` seconds, and straight
+    away (after `settle` seconds) when Linux inotify reports a change. Files
+    are compared by modification time and size:
+
+    - added and changed configs are validated and provisioned as a delta with
+      `frost.provision`; each sensor is added to (or updated in) the shared
+      `sensor_registry` once it is set up,
+    - removed configs have their sensor removed from `sensor_registry`.
+
+    Every update of `sensor_registry` is a single item assignment or removal,
+    so the connection threads reading it keep running. An invalid config is
+    logged and skipped; its sensor keeps streaming with the previous config
+    until the file is fixed. Configs which failed to provision are retried on
+    the next rescan.
+
+    Parameters:
+        sensor_registry (dict[SensorID, SupportedSensors]): registry shared
+            with the connections.
+        path (Path): the sensor config directory.
+        sensor_configs (Iterable[SensorConfig]): configs provisioned at start
+            up, the state the first rescan is compared with. Those whose
+            sensor is not in `sensor_registry` once watching starts (invalid,
+            or failed to provision) are left to the first rescan.
+        interval (float): seconds between rescans.
+        workers (int): provisioning threads.
+        registry (EntityRegistry | None): entity registry passed to
+            `frost.provision`.
+        exclude (Iterable[str]): config file names to ignore.
+        settle (float): seconds to let a burst of file changes finish.
+    """
+
+    def __init__(
+        self,
+        sensor_registry: dict[SensorID, SupportedSensors],
+        path: Path = RUNTIME_SENSOR_CONFIG_PATH,
+        sensor_configs: Iterable[SensorConfig] = (),
+        interval: float = 10.0,
+        workers: int = 4,
+        registry: EntityRegistry | None = None,
+        exclude: Iterable[str] = (),
+        settle: float = 0.5,
+    ):
+        self.sensor_registry = sensor_registry
+        self.path = Path(path)
+        self.interval = interval
+        self.workers = workers
+        self.registry = registry
+        self.exclude = set(exclude)
+        self.settle = settle
+        # private:
+        self._sensors: Dict[Path, SensorID] = {
+            sensor_config._filepath.resolve(): sensor_config.name
+            for sensor_config in sensor_configs
+        }
+        self._files: Dict[Path, FileState] = {
+            f: state for f, state in self._scan().items() if f in self._sensors
+        }
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __repr__(self) -> str:
+        return f"SensorConfigWatcher(path={self.path}, sensors={len(self._sensors)})"
+
+    def _scan(self) -> Dict[Path, FileState]:
+        files = {}
+        for f in self.path.rglob("*.*ml"):
+            if "template" in f.stem or f.name in self.exclude:
+                continue
+            try:
+                stat = f.stat()
+            except FileNotFoundError:
+                continue
+            files[f.resolve()] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def reload(self) -> Dict[str, List[Path]]:
+        """Rescan and apply the changes, return the files added, changed, removed."""
+        files = self._scan()
+        changes: Dict[str, List[Path]] = {
+            "added": [f for f in files if f not in self._files],
+            "changed": [
+                f for f in files if f in self._files and files[f] != self._files[f]
+            ],
+            "removed": [f for f in self._files if f not in files],
+        }
+        self._files = files
+        for f in changes["removed"]:
+            self._remove(f)
+
+        sensor_arrangements: Dict[SensorID, SensorArrangement] = {}
+        sensor_models: Dict[SensorID, SupportedSensors] = {}
+        pending: Dict[SensorID, Path] = {}
+        for f in changes["added"] + changes["changed"]:
+            try:
+                sensor_config = SensorConfig(f)
+                valid = sensor_config.is_valid
+            except Exception as e:
+                debug_logger.debug(f"Unable to load {f}: {e}")
+                valid = False
+            if not valid:
+                netmon.add_count("sensor_config_fail", 1)
+                main_logger.warning(f"{f} is an invalid sensor configuration file.")
+                continue
+            if self._sensors.get(f, sensor_config.name) != sensor_config.name:
+                # the file now configures another sensor:
+                self._remove(f)
+            sensor_models[sensor_config.name] = SupportedSensors(sensor_config.model)
+            sensor_arrangements[sensor_config.name] = SensorArrangement(sensor_config)
+            pending[sensor_config.name] = f
+
+        if sensor_arrangements:
+            event_logger.info(
+                f"Sensor configs changed, provisioning {list(sensor_arrangements)}."
+            )
+
+            def register(sensor_arrangement: SensorArrangement, sensor_name: SensorID):
+                f = pending.pop(sensor_name)
+                self._sensors[f] = sensor_name
+                netmon.expected_sensors.add(sensor_name)
+                self.sensor_registry[sensor_name] = sensor_models[sensor_name]
+
+            try:
+                frost.provision(
+                    sensor_arrangements.values(),
+                    workers=self.workers,
+                    on_provisioned=register,
+                    registry=self.registry,
+                )
+            except Exception as e:
+                main_logger.critical(f"Provisioning changed sensor configs failed: {e}")
+            # retried on the next rescan:
+            for f in pending.values():
+                self._files.pop(f, None)
+        debug_logger.debug(f"{self}: {changes}")
+        return changes
+
+    def _forget_unregistered(self) -> None:
+        """Leave the configs whose sensor is not registered to the next rescan."""
+        for f, sensor_name in list(self._sensors.items()):
+            if sensor_name not in self.sensor_registry:
+                del self._sensors[f]
+                self._files.pop(f, None)
+
+    def _remove(self, f: Path) -> None:
+        sensor_name = self._sensors.pop(f, None)
+        if sensor_name is None:
+            return
+        self.sensor_registry.pop(sensor_name, None)
+        netmon.expected_sensors.discard(sensor_name)
+        event_logger.info(f"Sensor config {f.name} removed, {sensor_name} stopped.")
+
+    # threading methods  #######################################################
+    def start(self, after: threading.Thread | None = None) -> None:
+        """Watch in a background thread, once the thread `after` (if any) ended."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._watch_loop,
+                args=(after,),
+                daemon=True,
+                name="config-watcher",
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 1)
+
+    def _watch_loop(self, after: threading.Thread | None) -> None:
+        if after is not None:
+            after.join()
+        # start up provisioning is over, retry what it did not register:
+        self._forget_unregistered()
+        try:
+            inotify: _Inotify | None = _Inotify()
+        except (OSError, AttributeError, TypeError) as e:
+            debug_logger.debug(f"inotify unavailable ({e}), polling {self.path}.")
+            inotify = None
+        try:
+            while not self._stop_event.is_set():
+                if inotify is not None:
+                    for directory in (self.path, *self.path.rglob("*/")):
+                        inotify.watch(directory)
+                    changed = inotify.wait(self.interval)
+                    if changed and self._stop_event.wait(self.settle):
+                        break
+                elif self._stop_event.wait(self.interval):
+                    break
+                self.reload()
+        finally:
+            if inotify is not None:
+                inotify.close()
@@ -2,16 +2,20 @@
 
 # standard
 import json
+import os
 from pathlib import Path
 import time
 import logging
 import threading
 # external
 import pytest
+from paho.mqtt.client import MQTTv311, MQTTv5, Client as mqttClient
+from paho.mqtt.enums import CallbackAPIVersion
 # internal
 from sensorthings_utils.connections import (
         TTSConnection
         )
+from sensorthings_utils.monitor import netmon
 
 debug_logger = logging.getLogger(__name__)
 debug_logger.setLevel(logging.DEBUG)
@@ -111,3 +115,71 @@ class TestTTSConnectionAuthentication:
         invalid_connection._mqtt_client.loop_stop()
         invalid_connection._mqtt_client.disconnect()
 
+
+
+class _LocalMQTTConnection(TTSConnection):
+    """A TTS connection to a local, unauthenticated broker."""
+
+    def _auth(self) -> None:
+        return None
+
+
+class TestSharedSubscriptions:
+    """
+    Test MQTT v5 shared subscriptions of several workers.
+
+    Testing Strategy:
+        - a share group subscribes to `$share/<group>/<topic>` over MQTT v5,
+        - without one, the plain topic is subscribed to over MQTT 3.1.1,
+        - *online*: two workers of a group split the messages published to a
+          local Mosquitto 2 broker ($MQTT_TEST_HOST, default localhost:1883).
+    """
+
+    def test_subscription(self):
+        topic = "v3/shared-app@ttn/devices/+/up"
+        shared = TTSConnection(
+            "shared-app@ttn", "credentials", "localhost", topic,
+            share_group="ingest", worker_id="worker-1",
+        )
+        assert shared.subscription == f"$share/ingest/{topic}"
+        assert shared._mqtt_client.protocol == MQTTv5
+        assert netmon.shared_subscriptions["shared-app@ttn"] == ("ingest", "worker-1")
+        plain = TTSConnection("plain-app@ttn", "credentials", "localhost", topic)
+        assert plain.subscription == topic
+        assert plain._mqtt_client.protocol == MQTTv311
+
+    @pytest.mark.online
+    def test_split_between_workers(self):
+        host = os.getenv("MQTT_TEST_HOST", "localhost")
+        topic = "v3/shared-test@ttn/devices/+/up"
+        workers = [
+            _LocalMQTTConnection(
+                "shared-test@ttn", "credentials", host, topic, port=1883,
+                share_group="ingest", worker_id=f"worker-{i}",
+            )
+            for i in range(2)
+        ]
+        for worker in workers:
+            worker._pull_data()
+        deadline = time.monotonic() + 5
+        while not all(w._subscribed for w in workers) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        time.sleep(0.5)  # let the SUBACKs arrive
+
+        publisher = mqttClient(CallbackAPIVersion.VERSION2, protocol=MQTTv5)
+        publisher.connect(host, 1883)
+        publisher.loop_start()
+        for i in range(20):
+            publisher.publish(
+                "v3/shared-test@ttn/devices/dev-1/up", json.dumps({"n": i}), qos=1
+            ).wait_for_publish(5)
+        publisher.loop_stop()
+        publisher.disconnect()
+        time.sleep(1)
+
+        received = [len(worker._payload_queue) for worker in workers]
+        for worker in workers:
+            worker._mqtt_client.loop_stop()
+            worker._mqtt_client.disconnect()
+        assert sum(received) == 20
+        assert all(received), f"Messages were not shared: {received}"
@@ -0,0 +1,885 @@
+"""Test the FROST client helpers in frost.py"""
+
+# standard
+import io
+import json
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib import error
+from urllib.parse import unquote, urlsplit
+
+# external
+import pytest
+
+# internal
+import sensorthings_utils.frost as frost
+from sensorthings_utils import provisioning
+from sensorthings_utils.exceptions import FrostUploadFailure
+from sensorthings_utils.frost_client import FrostClient, FrostResponse
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.paths import DEPLOY_DIR
+from sensorthings_utils.registry import EntityRegistry, config_hash
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.sensor_things.extensions import (
+    FleetArrangement,
+    SensorArrangement,
+    SensorConfig,
+)
+from sensorthings_utils.transformers.types import ObservedProperties
+
+ROOT = "http://localhost:8080/FROST-Server/v1.1"
+PUSH_LINK = f"{ROOT}/Datastreams(1)/Observations"
+TEMPLATE = DEPLOY_DIR / "sensor_configs" / "milesight" / "template_milesight.am103l.yaml"
+
+
+class _FakeFrost:
+    """
+    In-memory FROST answering `FrostClient.request`: name filters on the
+    entity collections, paged by `$top`, entity creation and `$batch` updates.
+    """
+
+    def __init__(self, existing: dict[str, list[str]] | None = None):
+        self.entities: dict[str, dict[str, int]] = {}
+        # (collection, id) → fields, and Thing id → Location ids:
+        self.fields: dict[tuple[str, int], dict] = {}
+        self.locations: dict[int, list[int]] = {}
+        self.datastreams: list[dict] = []
+        self.batched: list[tuple[str, str]] = []
+        self.requests: list[tuple[str, str]] = []
+        self.created: list[tuple[str, str]] = []
+        self.delay = 0.0
+        self._pages: dict[str, list] = {}
+        self._lock = threading.RLock()
+        for collection, names in (existing or {}).items():
+            for name in names:
+                self._create(collection, {"name": name})
+
+    def _link(self, collection: str, body: dict) -> int:
+        """Id of a referenced entity, or of a nested (deep insert) one."""
+        return body.get("@iot.id") or self._create(collection, body)
+
+    def _create(self, collection: str, body: dict) -> int:
+        self.created.append((collection, body["name"]))
+        if collection == "Datastreams":
+            links = ("Sensor", "ObservedProperty", "Thing")
+            self.datastreams.append(
+                {
+                    "name": body["name"],
+                    "fields": {k: v for k, v in body.items() if k not in links},
+                    "Sensors": self._link("Sensors", body["Sensor"]),
+                    "ObservedProperties": self._link(
+                        "ObservedProperties", body["ObservedProperty"]
+                    ),
+                    "Things": body.get("Thing", {}).get("@iot.id"),
+                }
+            )
+            return len(self.datastreams)
+        ids = self.entities.setdefault(collection, {})
+        ids[body["name"]] = len(ids) + 1
+        nested_types = ("Locations", "Datastreams")
+        self.fields[(collection, ids[body["name"]])] = {
+            k: v for k, v in body.items() if k not in nested_types
+        }
+        for nested in body.get("Locations", []):
+            location = self._create("Locations", nested)
+            self.locations.setdefault(ids[body["name"]], []).append(location)
+        for nested in body.get("Datastreams", []):
+            thing = {"@iot.id": ids[body["name"]]}
+            self._create("Datastreams", {**nested, "Thing": thing})
+        return ids[body["name"]]
+
+    def _entity(self, collection: str, iot_id: int) -> dict:
+        return {**self.fields[(collection, iot_id)], "@iot.id": iot_id}
+
+    def _find(self, collection: str, query: str, thing: int | None = None) -> list:
+        names = re.findall(r"(?<!/)name eq '((?:[^']|'')*)'", query)
+        if collection == "Datastreams":
+            sensor_names = re.findall(r"Sensor/name eq '([^']*)'", query)
+            ids = [int(i) for i in re.findall(r"(?<![\w@.])id eq (\d+)", query)]
+            found = []
+            for i, ds in enumerate(self.datastreams):
+                if ds.get("deleted"):
+                    continue
+                sensor = self._entity("Sensors", ds["Sensors"])
+                if (
+                    (not ids or i + 1 in ids)
+                    and (not names or ds["name"] in names)
+                    and (not sensor_names or sensor["name"] in sensor_names)
+                    and (thing is None or ds["Things"] == thing)
+                ):
+                    found.append(
+                        {
+                            **ds["fields"],
+                            "@iot.id": i + 1,
+                            "name": ds["name"],
+                            "Sensor": sensor,
+                            "ObservedProperty": self._entity(
+                                "ObservedProperties", ds["ObservedProperties"]
+                            ),
+                            "Thing": ds["Things"]
+                            and self._entity("Things", ds["Things"]),
+                        }
+                    )
+            return found
+        found = [
+            self._entity(collection, iot_id)
+            for name, iot_id in self.entities.get(collection, {}).items()
+            if name.replace("'", "''") in names
+        ]
+        if "$expand=Locations" in query:
+            for thing in found:
+                thing["Locations"] = [
+                    self._entity("Locations", location)
+                    for location in self.locations.get(thing["@iot.id"], [])
+                ]
+        return found
+
+    def request(self, method, url, body=None, headers=None):
+        time.sleep(self.delay)
+        with self._lock:
+            return self._request(method, url, body)
+
+    def _request(self, method, url, body=None):
+        url = unquote(url)
+        self.requests.append((method, url))
+        path, query = urlsplit(url).path, urlsplit(url).query
+        collection, _, iot_id = path.rsplit("/", 1)[-1].rstrip(")").partition("(")
+        if path.endswith("/$batch"):
+            responses = [
+                {"id": request["id"], "status": self._batch(request)}
+                for request in json.loads(body)["requests"]
+            ]
+            body = json.dumps({"responses": responses}).encode()
+            return FrostResponse(url, 200, "OK", {}, body)
+        if method == "POST":
+            iot_id = self._create(collection, json.loads(body))
+            if thing := re.search(r"/Things\((\d+)\)/Locations$", path):
+                self.locations.setdefault(int(thing.group(1)), []).append(iot_id)
+            location = f"{ROOT}/{collection}({iot_id})"
+            return FrostResponse(url, 201, "Created", {"location": location})
+        thing = re.search(r"/Things\((\d+)\)/Datastreams$", path)
+        if "/next/" in path:
+            body = self._page(self._pages.pop(path))
+        elif thing:
+            body = {"value": self._find("Datastreams", query, int(thing.group(1)))}
+        elif iot_id:
+            links = ("Datastreams", "HistoricalLocations", "Locations")
+            body = {f"{link}@iot.navigationLink": f"{url}/{link}" for link in links}
+        else:
+            top = re.search(r"\$top=(\d+)", query)
+            found = self._find(collection, query)
+            body = self._page(found, int(top.group(1)) if top else None)
+        return FrostResponse(url, 200, "OK", {}, json.dumps(body).encode())
+
+    def _batch(self, request: dict) -> int:
+        """Apply a `$batch` request, return its status."""
+        self.batched.append((request["method"], request["url"]))
+        path, _, nested = request["url"].partition("/")
+        collection, _, iot_id = path.rstrip(")").partition("(")
+        if request["method"] == "post":
+            location = self._create(nested, request["body"])
+            self.locations.setdefault(int(iot_id), []).append(location)
+            return 201
+        body = dict(request["body"])
+        if collection == "Datastreams":
+            ds = self.datastreams[int(iot_id) - 1]
+            for link in ("Thing", "ObservedProperty"):
+                if link in body:
+                    ds[frost.ENTITY_ENDPOINTS[link][1:]] = body.pop(link)["@iot.id"]
+            ds["fields"].update(body)
+        else:
+            self.fields[(collection, int(iot_id))].update(body)
+        return 200
+
+    def _page(self, found: list, top: int | None = None) -> dict:
+        if top is None or len(found) <= top:
+            return {"value": found}
+        next_link = f"{ROOT}/next/{len(self._pages)}"
+        self._pages[urlsplit(next_link).path] = found[top:]
+        return {"value": found[:top], "@iot.nextLink": next_link}
+
+    def gets(self, collection: str) -> list[str]:
+        return [
+            url
+            for method, url in self.requests
+            if method == "GET" and f"/{collection}?" in url
+        ]
+
+    def posts(self, collection: str) -> list[str]:
+        return [
+            url
+            for method, url in self.requests
+            if method == "POST" and url.endswith(collection)
+        ]
+
+
+@pytest.fixture
+def fake_frost(monkeypatch):
+    def install(**existing):
+        fake = _FakeFrost(existing)
+        monkeypatch.setattr(
+            FrostClient, "request", lambda client, *args, **kw: fake.request(*args, **kw)
+        )
+        return fake
+
+    return install
+
+
+@pytest.fixture
+def sensor_arrangement(tmp_path):
+    """Build the arrangement of a templated sensor config with the passed names."""
+
+    def make(sensor: str, thing: str = "room-1") -> SensorArrangement:
+        config = (
+            TEMPLATE.read_text()
+            .replace("<SENSOR_ID>", sensor)
+            .replace("<THING_NAME>", thing)
+            .replace("<LOCATION_NAME>", f"{thing} location")
+            .replace("[<LONGITUDE>, <LATITUDE>]", "[4.37, 52.0]")
+        )
+        path = tmp_path / f"{sensor}.yaml"
+        path.write_text(config)
+        return SensorArrangement(SensorConfig(path))
+
+    return make
+
+
+@pytest.fixture
+def observation_set() -> tuple[Observation, ObservedProperties]:
+    observation = Observation(result=400, phenomenonTime=datetime(2025, 1, 1))
+    return (observation, ObservedProperties.CO2_INDOOR)
+
+
+@pytest.fixture(autouse=True)
+def empty_routes():
+    frost.datastream_routes.clear()
+    yield
+    frost.datastream_routes.clear()
+
+
+@pytest.fixture
+def requests(monkeypatch) -> list:
+    """Record (method, url, body) of every FROST request, answer with a 201."""
+    calls = []
+
+    def request(self, method, url, body=None, headers=None):
+        calls.append((method, url, body))
+        return FrostResponse(
+            url, 201, "Created", {"location": f"{ROOT}/Observations(42)"}
+        )
+
+    monkeypatch.setattr(FrostClient, "request", request)
+    return calls
+
+
+class TestDatastreamRoutingTable:
+    """
+    Test the (sensor, observed property) → Datastream id routing table.
+
+    Testing Strategy:
+        - enum and plain string keys are interchangeable,
+        - hits and misses are counted in netmon,
+        - invalidation removes a single entry.
+    """
+
+    def test_enum_and_str_keys(self):
+        frost.datastream_routes.put("sensor-1", "co2", 1)
+        assert frost.datastream_routes.get("sensor-1", ObservedProperties.CO2_INDOOR)
+
+    def test_hits_and_misses_counted(self):
+        hits, misses = netmon.datastream_route_hits, netmon.datastream_route_misses
+        frost.datastream_routes.get("sensor-1", "co2")
+        frost.datastream_routes.put("sensor-1", "co2", 1)
+        frost.datastream_routes.get("sensor-1", "co2")
+        assert netmon.datastream_route_hits == hits + 1
+        assert netmon.datastream_route_misses == misses + 1
+
+    def test_invalidate(self):
+        frost.datastream_routes.put("sensor-1", "co2", 1)
+        frost.datastream_routes.put("sensor-1", "noise", 2)
+        frost.datastream_routes.invalidate("sensor-1", "co2")
+        assert frost.datastream_routes.get("sensor-1", "co2") is None
+        assert len(frost.datastream_routes) == 1
+
+
+class TestObservationUploadRouting:
+    """
+    Test that `frost_observation_upload` creates Observations by Datastream id.
+
+    Testing Strategy:
+        - the observation is POSTed to `/Observations` referencing the id,
+        - a routed id skips the lookup,
+        - a miss looks up and fills the routing table,
+        - the routed FeatureOfInterest is referenced,
+        - a 404/410 from the POST invalidates the routed id, a 400 only if
+          it names the Datastream; the routed FeatureOfInterest is kept
+          unless the 400 names it,
+        - quotes in sensor and datastream names are escaped in lookups.
+    """
+
+    def test_posts_by_datastream_id(self, requests, observation_set):
+        frost.datastream_routes.put("sensor-1", "co2", 7)
+        frost.frost_observation_upload("sensor-1", observation_set)
+        [(method, url, body)] = requests
+        assert (method, url) == ("POST", "/Observations")
+        body = json.loads(body)
+        assert body["Datastream"] == {"@iot.id": 7}
+        assert body["result"] == 400
+
+    def test_routed_id_skips_lookup(self, monkeypatch, requests, observation_set):
+        frost.datastream_routes.put("sensor-1", "co2", 7)
+
+        def no_lookup(*args, **kwargs):
+            raise AssertionError("lookup should not happen on a routing hit")
+
+        monkeypatch.setattr(frost, "find_datastream_id", no_lookup)
+        frost.frost_observation_upload("sensor-1", observation_set)
+        assert len(requests) == 1
+
+    def test_miss_fills_routes(self, monkeypatch, requests, observation_set):
+        monkeypatch.setattr(frost, "find_datastream_id", lambda *_: 7)
+        frost.frost_observation_upload("sensor-1", observation_set)
+        assert frost.datastream_routes.get("sensor-1", "co2") == 7
+
+    def test_feature_of_interest(self, requests, observation_set):
+        frost.datastream_routes.put("sensor-1", "co2", 7)
+        frost.frost_observation_upload("sensor-1", observation_set)
+        frost.datastream_routes.put_feature_of_interest("sensor-1", "co2", 3)
+        frost.frost_observation_upload("sensor-1", observation_set)
+        without, with_feature = (json.loads(body) for _, _, body in requests)
+        assert "FeatureOfInterest" not in without
+        assert with_feature["FeatureOfInterest"] == {"@iot.id": 3}
+
+    def test_unknown_datastream(self, monkeypatch, requests, observation_set):
+        monkeypatch.setattr(frost, "find_datastream_id", lambda *_: None)
+        with pytest.raises(FrostUploadFailure):
+            frost.frost_observation_upload("sensor-1", observation_set)
+        assert not requests
+
+    def test_lookup_quoting(self, monkeypatch):
+        filters = []
+
+        def filter_query(filter_string, *args, **kwargs):
+            filters.append(filter_string)
+            return {"value": [{"@iot.id": 7, "name": "o'clock"}]}
+
+        monkeypatch.setattr(frost, "filter_query", filter_query)
+        assert frost.find_datastream_id("l'atelier", "o'clock") == 7
+        frost._route_datastreams("l'atelier")
+        assert filters == [
+            "name eq 'o''clock' and Sensor/name eq 'l''atelier'",
+            "Sensor/name eq 'l''atelier'",
+        ]
+        assert frost.datastream_routes.get("l'atelier", "o'clock") == 7
+
+    @pytest.mark.parametrize(
+        "code, message, stale, stale_feature",
+        [
+            (404, b"", True, False),
+            (410, b"", True, False),
+            (
+                400,
+                b'{"message": "No such entity \'Datastream\' with id 7"}',
+                True,
+                False,
+            ),
+            (
+                400,
+                b'{"message": "No such entity \'FeatureOfInterest\' with id 3"}',
+                False,
+                True,
+            ),
+            (400, b'{"message": "Invalid phenomenonTime"}', False, False),
+        ],
+    )
+    def test_stale_route_invalidated(
+        self, monkeypatch, observation_set, code, message, stale, stale_feature
+    ):
+        frost.datastream_routes.put("sensor-1", "co2", 7)
+        frost.datastream_routes.put_feature_of_interest("sensor-1", "co2", 3)
+
+        def rejected(self, *args, **kwargs):
+            raise error.HTTPError(
+                "/Observations", code, "", None, io.BytesIO(message)  # type: ignore
+            )
+
+        monkeypatch.setattr(FrostClient, "request", rejected)
+        with pytest.raises(FrostUploadFailure):
+            frost.frost_observation_upload("sensor-1", observation_set)
+        routed = frost.datastream_routes.get("sensor-1", "co2")
+        assert routed == (None if stale else 7)
+        feature = frost.datastream_routes.feature_of_interest("sensor-1", "co2")
+        assert feature == (None if stale_feature else 3)
+
+
+class TestObservationCreation:
+    """
+    Test the fire-and-forget creation path of `make_frost_object`.
+
+    Testing Strategy:
+        - Observations are POSTed once and never read back,
+        - the id is parsed from the `Location` header.
+    """
+
+    def test_no_read_back(self, requests, observation_set):
+        links = frost.make_frost_object(observation_set[0], PUSH_LINK)
+        assert [method for method, *_ in requests] == ["POST"]
+        assert links["iot_id"] == "42"
+
+    @pytest.mark.parametrize(
+        "location, expected",
+        [
+            ("http://localhost/v1.1/Observations(42)", "42"),
+            ("http://localhost/v1.1/Things('room-1')", "room-1"),
+            ("http://localhost/v1.1/Observations", None),
+        ],
+    )
+    def test_id_from_location(self, location, expected):
+        assert frost._id_from_location(location) == expected
+
+
+class TestProvisioning:
+    """
+    Test that provisioning decides create vs skip from a batched entity index.
+
+    Testing Strategy:
+        - Things, Sensors and ObservedProperties of all arrangements are looked
+          up with one `$select=id,name` query per type, not one per entity,
+        - existing entities are skipped, missing ones created once, also when
+          shared by several arrangements,
+        - Datastreams are checked per sensor without reading back Sensors, and
+          routed with the indexed ids,
+        - Datastreams are linked with the indexed ids,
+        - a FeatureOfInterest per Location is created once and routed,
+        - names are quoted, and paged results followed.
+    """
+
+    def test_batched_lookups(self, fake_frost, sensor_arrangement):
+        fake = fake_frost(ObservedProperties=["co2_levels"])
+        arrangements = [sensor_arrangement(f"sensor-{i}") for i in range(5)]
+        assert frost.provision(arrangements) == [f"sensor-{i}" for i in range(5)]
+        for collection in ("Things", "Sensors", "ObservedProperties"):
+            [query] = fake.gets(collection)
+            assert "$select=id,name" in query
+        [query] = [q for q in fake.gets("Datastreams") if "Sensor/name" in q]
+        assert "$expand=Sensor($select=name)" in query
+        # one thing shared by all sensors, deep inserted once with all of their
+        # datastreams; the sensors and new observed properties exist beforehand:
+        assert len(fake.posts("/Things")) == 1
+        assert len(fake.posts("/Sensors")) == 5
+        assert len(fake.posts("/ObservedProperties")) == 3
+        assert not fake.posts("/Datastreams")
+        assert len(fake.entities["ObservedProperties"]) == 4
+        assert frost.datastream_routes.get("sensor-4", "co2") == 19
+
+    def test_provisioning_is_flat(self, fake_frost, sensor_arrangement):
+        def requests(fleet_size: int) -> tuple[int, int]:
+            fake = fake_frost()
+            arrangements = [
+                sensor_arrangement(f"s-{i}", thing=f"room-{i}")
+                for i in range(fleet_size)
+            ]
+            frost.provision(arrangements)
+            created = len(fake.requests)
+            fake.requests.clear()
+            # again, with every entity existing:
+            frost.provision(arrangements)
+            assert not fake.posts("")
+            return created, len(fake.requests)
+
+        (created_2, existing_2), (created_20, existing_20) = requests(2), requests(20)
+        # a FeatureOfInterest, Sensor and deep insert POST and a read back per
+        # new sensor:
+        assert created_20 - created_2 == 18 * 4
+        assert existing_2 == existing_20
+
+    def test_features_of_interest(self, fake_frost, sensor_arrangement):
+        fake = fake_frost(FeaturesOfInterest=["room-0 location"])
+        arrangements = [
+            sensor_arrangement(f"s-{i}", thing=f"room-{i % 2}") for i in range(3)
+        ]
+        frost.provision(arrangements)
+        # one per location, the existing one is reused:
+        [post] = fake.posts("/FeaturesOfInterest")
+        assert fake.fields[("FeaturesOfInterest", 2)]["feature"]["type"] == "Point"
+        assert frost.datastream_routes.feature_of_interest("s-0", "co2") == 1
+        assert frost.datastream_routes.feature_of_interest("s-1", "co2") == 2
+        fake.requests.clear()
+        frost.provision(arrangements)
+        assert len(fake.gets("FeaturesOfInterest")) == 1
+        assert not fake.posts("")
+
+    def test_datastream_check_single_query(self, fake_frost, sensor_arrangement):
+        fake = fake_frost()
+        arrangements = [sensor_arrangement(f"s-{i}") for i in range(5)]
+        frost.provision(arrangements)
+        fake.requests.clear()
+        [co2] = [
+            ds
+            for ds in arrangements[3].get_entities("Datastream")
+            if ds.name == "co2"
+        ]
+        assert frost.check_existing_object(co2, False)
+        assert len(fake.requests) == 1
+
+    def test_existing_entities_skipped(self, fake_frost, sensor_arrangement):
+        names = {
+            "Things": ["room-1"],
+            "Sensors": ["sensor-1"],
+            "ObservedProperties": [
+                "temperature_indoor",
+                "internal_humidity",
+                "co2_levels",
+                "battery_level",
+            ],
+        }
+        fake = fake_frost(**names)
+        frost.initial_setup(sensor_arrangement("sensor-1"))
+        assert not fake.posts("/Things") + fake.posts("/Sensors")
+        assert not fake.posts("/ObservedProperties")
+
+    def test_datastreams_linked_by_index(
+        self, monkeypatch, fake_frost, sensor_arrangement
+    ):
+        fake_frost(Things=["room-0", "room-1"], Sensors=["sensor-0", "sensor-1"])
+        linked = []
+        monkeypatch.setattr(
+            frost, "make_frost_datastream", lambda ds, **ids: linked.append(ids)
+        )
+        frost.initial_setup(sensor_arrangement("sensor-1"))
+        assert {ids["sensor_id"] for ids in linked} == {2}
+        assert {ids["thing_id"] for ids in linked} == {2}
+
+    def test_paging_and_quoting(self, fake_frost):
+        fake = fake_frost(Sensors=[f"sensor-{i}" for i in range(7)] + ["O'Brien"])
+        index = frost.EntityIndex(batch_size=3)
+        index.load("Sensor", [f"sensor-{i}" for i in range(7)] + ["O'Brien", "new"])
+        assert index.get("Sensor", "O'Brien") == 8
+        assert index.get("Sensor", "new") is None
+        assert len(fake.gets("Sensors")) == 3
+        filter_string = " or ".join(f"name eq 'sensor-{i}'" for i in range(7))
+        assert len(frost.filter_query_all(filter_string, "/Sensors", top=2)) == 7
+
+
+class TestDeepInsert:
+    """
+    Test provisioning new sensor arrangements with a deep insert.
+
+    Testing Strategy:
+        - a new sensor takes a Sensor POST, a Thing POST nesting its Locations,
+          Datastreams and new ObservedProperties, and one read back,
+        - existing ObservedProperties are referenced by id,
+        - the created ids are indexed and routed,
+        - arrangements whose Thing exists fall back to entity by entity.
+    """
+
+    def test_payload(self, sensor_arrangement):
+        arrangement = sensor_arrangement("sensor-1")
+        [thing] = arrangement.get_entities("Thing")
+        payload = arrangement.deep_insert(
+            thing, lambda e: 3 if e.name == "co2_levels" else None
+        )
+        assert payload["name"] == "room-1"
+        assert [loc["name"] for loc in payload["Locations"]] == ["room-1 location"]
+        assert len(payload["Datastreams"]) == 4
+        observed_properties = [ds["ObservedProperty"] for ds in payload["Datastreams"]]
+        assert {"@iot.id": 3} in observed_properties
+        assert all("iot_links" not in ds["Sensor"] for ds in payload["Datastreams"])
+
+    def test_new_sensor(self, fake_frost, sensor_arrangement):
+        fake = fake_frost(ObservedProperties=["co2_levels"])
+        index = frost.EntityIndex()
+        arrangement = sensor_arrangement("sensor-1")
+        fake.requests.clear()
+        frost.initial_setup(arrangement, index=index)
+        assert [method for method, _ in fake.requests] == ["POST", "POST", "GET"]
+        assert fake.posts("/Sensors") and fake.posts("/Things")
+        assert len(fake.entities["ObservedProperties"]) == 4
+        assert len(fake.entities["Locations"]) == 1
+        assert {ds["Sensors"] for ds in fake.datastreams} == {1}
+        assert index.get("ObservedProperty", "internal_humidity") is not None
+        assert frost.datastream_routes.get("sensor-1", "co2") == 3
+
+    def test_existing_thing_falls_back(self, fake_frost, sensor_arrangement):
+        fake = fake_frost(Things=["room-1"])
+        frost.initial_setup(sensor_arrangement("sensor-1"))
+        assert not fake.posts("/Things")
+        assert len(fake.posts("/Datastreams")) == 4
+
+
+class TestParallelProvisioning:
+    """
+    Test provisioning sensor arrangements on a worker pool.
+
+    Testing Strategy:
+        - entities shared between arrangements are created exactly once,
+        - every arrangement is reported as soon as it is set up,
+        - a failing arrangement does not stop the others,
+        - provisioning failing as a whole, e.g. on an index query, is retried
+          for the arrangements not set up yet,
+        - a released claim is taken over by a waiting thread.
+    """
+
+    def test_shared_entities_created_once(self, fake_frost, sensor_arrangement):
+        fake = fake_frost()
+        fake.delay = 0.002
+        arrangements = [
+            sensor_arrangement(f"s-{i}", thing=f"room-{i % 3}") for i in range(12)
+        ]
+        provisioned = []
+        sensor_models = frost.provision(
+            arrangements,
+            workers=6,
+            on_provisioned=lambda arrangement, name: provisioned.append(name),
+        )
+        assert sorted(provisioned) == sorted(sensor_models) == sorted(
+            f"s-{i}" for i in range(12)
+        )
+        # datastream names are only unique per sensor:
+        shared = Counter(e for e in fake.created if e[0] != "Datastreams")
+        assert max(shared.values()) == 1
+        assert len(fake.entities["Things"]) == 3
+        assert len(fake.entities["ObservedProperties"]) == 4
+        assert len(fake.datastreams) == 12 * 4
+
+    def test_failure_isolated(self, monkeypatch, fake_frost, sensor_arrangement):
+        fake_frost()
+        setup = frost.initial_setup
+
+        def initial_setup(sensor_arrangement, index=None, fleet=None):
+            if sensor_arrangement.get_entities("Sensor")[0].name == "s-1":
+                raise error.HTTPError("/Things", 500, "", None, None)  # type: ignore
+            return setup(sensor_arrangement, index, fleet)
+
+        monkeypatch.setattr(frost, "initial_setup", initial_setup)
+        arrangements = [sensor_arrangement(f"s-{i}") for i in range(3)]
+        assert frost.provision(arrangements, workers=3) == ["s-0", "s-2"]
+
+    def test_retried(self, monkeypatch, fake_frost, sensor_arrangement):
+        fake_frost()
+        for_arrangements = frost.EntityIndex.for_arrangements.__func__  # type: ignore
+        attempts = []
+
+        def failing_once(cls, sensor_arrangements, **kwargs):
+            attempts.append(len(list(sensor_arrangements)))
+            if len(attempts) == 1:
+                raise error.URLError("index query failed")
+            return for_arrangements(cls, sensor_arrangements, **kwargs)
+
+        monkeypatch.setattr(
+            frost.EntityIndex, "for_arrangements", classmethod(failing_once)
+        )
+        provisioned = []
+        sensor_models = frost.provision_with_retries(
+            [sensor_arrangement(f"s-{i}") for i in range(3)],
+            workers=2,
+            on_provisioned=lambda arrangement, name: provisioned.append(name),
+            retry_delay=0,
+        )
+        assert attempts == [3, 3]
+        assert sorted(sensor_models) == sorted(provisioned) == ["s-0", "s-1", "s-2"]
+
+    def test_claim_taken_over(self, sensor_arrangement):
+        index = frost.EntityIndex()
+        [thing] = sensor_arrangement("s-0").get_entities("Thing")
+        assert index.claim([thing]) == [thing]
+        claims = []
+        waiter = threading.Thread(target=lambda: claims.append(index.claim([thing])))
+        waiter.start()
+        time.sleep(0.05)
+        assert not claims
+        # the claimant failed to create the thing:
+        index.release([thing])
+        waiter.join(1)
+        assert claims == [[thing]]
+
+
+class TestFleetArrangement:
+    """
+    Test merging the sensor arrangements of a fleet into one entity graph.
+
+    Testing Strategy:
+        - identical ObservedProperties, Things and Locations are interned into
+          one instance, linking the Datastreams of every arrangement,
+        - conflicting declarations keep the first and are reported,
+        - arrangements sharing a Thing are found, and deep inserted together.
+    """
+
+    def test_interned(self, sensor_arrangement):
+        arrangements = [sensor_arrangement(f"s-{i}") for i in range(3)]
+        fleet = FleetArrangement(arrangements)
+        assert len(fleet.entities("ObservedProperty")) == 4
+        assert len(fleet.entities("Datastream")) == 12
+        [thing] = fleet.entities("Thing")
+        assert all(a.get_entities("Thing")[0] is thing for a in arrangements)
+        co2 = [
+            a.get("Datastream", "co2").iot_links["observedProperties"][0]
+            for a in arrangements
+        ]
+        assert co2[0] is co2[1] is co2[2]
+        assert len(thing.iot_links["datastreams"]) == 12
+        assert len(thing.iot_links["locations"]) == 1
+        assert not fleet.conflicts
+
+    def test_conflict(self, sensor_arrangement):
+        arrangements = [sensor_arrangement(f"s-{i}") for i in range(2)]
+        arrangements[1].get_entities("Thing")[0].description = "another room"
+        fleet = FleetArrangement(arrangements)
+        assert fleet.conflicts == [("Thing", "room-1")]
+        assert arrangements[1].get_entities("Thing")[0].description != "another room"
+
+    def test_sharing_things(self, sensor_arrangement):
+        arrangements = [
+            sensor_arrangement(f"s-{i}", thing=f"room-{i % 2}") for i in range(4)
+        ]
+        fleet = FleetArrangement(arrangements)
+        assert fleet.sharing_things(arrangements[0]) == arrangements[::2]
+        [thing] = arrangements[1].get_entities("Thing")
+        assert len(fleet.deep_insert(thing)["Datastreams"]) == 8
+
+
+class TestRegistryProvisioning:
+    """
+    Test that provisioning serves unchanged sensor configs from the registry.
+
+    Testing Strategy:
+        - after a restart, registered configs take a single verification query
+          and are routed with their registered ids,
+        - a changed config is set up on FROST again,
+        - a config whose Datastreams were removed server side is set up again.
+    """
+
+    @pytest.fixture
+    def provisioned(self, fake_frost, sensor_arrangement, tmp_path):
+        fake = fake_frost()
+        registry = EntityRegistry(tmp_path / "registry.sqlite3")
+        arrangements = [sensor_arrangement(f"s-{i}") for i in range(3)]
+        frost.provision(arrangements, registry=registry)
+        assert len(registry) == 3
+        fake.requests.clear()
+        frost.datastream_routes.clear()
+        return fake, registry, arrangements
+
+    def test_restart(self, provisioned):
+        fake, registry, arrangements = provisioned
+        routed = []
+        names = frost.provision(
+            arrangements,
+            registry=registry,
+            on_provisioned=lambda arrangement, name: routed.append(name),
+        )
+        assert names == routed == ["s-0", "s-1", "s-2"]
+        # connection check, FeatureOfInterest lookup and the verification of
+        # all 12 datastreams:
+        assert len(fake.requests) == 3
+        assert "id eq 12" in fake.requests[2][1]
+        assert frost.datastream_routes.get("s-2", "co2") == 11
+
+    def test_changed_config(self, provisioned, sensor_arrangement):
+        fake, registry, arrangements = provisioned
+        arrangements[1] = sensor_arrangement("s-1", thing="room-2")
+        frost.provision(arrangements, registry=registry)
+        # only the changed config is set up, its datastreams exist already:
+        assert len(fake.posts("/Things")) == 1
+        assert not fake.posts("/Datastreams")
+        assert registry.lookup("s-1", config_hash(arrangements[1]))
+        assert frost.datastream_routes.get("s-1", "co2") == 7
+
+    def test_removed_datastreams(self, provisioned):
+        fake, registry, arrangements = provisioned
+        for ds in fake.datastreams[:4]:
+            ds["deleted"] = True
+        frost.provision(arrangements, registry=registry)
+        assert len(fake.posts("/Datastreams")) == 4
+        assert len(registry) == 3
+
+
+class TestProvisioningPlan:
+    """
+    Test planning and applying provisioning as a diff against FROST.
+
+    Testing Strategy:
+        - an empty server plans a create of every entity, which apply sets up,
+        - an unchanged fleet plans only skips, with a query per entity type
+          regardless of fleet size,
+        - a changed field is one update, applied in a single `$batch` request
+          and registered,
+        - a Location new to an existing Thing is created in the batch,
+        - Datastreams of a sensor moved to a new Thing are relinked to it.
+    """
+
+    def test_create(self, fake_frost, sensor_arrangement):
+        fake = fake_frost()
+        arrangements = [sensor_arrangement(f"s-{i}") for i in range(2)]
+        plan = provisioning.plan(arrangements)
+        # a thing, its location and four observed properties are shared:
+        assert plan.summary() == "16 to create, 0 to update, 0 unchanged."
+        assert not provisioning.apply(plan)
+        assert len(fake.datastreams) == 8
+        assert not provisioning.plan(arrangements)
+
+    def test_unchanged_fleet(self, fake_frost, sensor_arrangement):
+        def plan_requests(fleet_size: int) -> int:
+            fake = fake_frost()
+            arrangements = [
+                sensor_arrangement(f"s-{i}", thing=f"room-{i}")
+                for i in range(fleet_size)
+            ]
+            provisioning.apply(provisioning.plan(arrangements))
+            fake.requests.clear()
+            assert not provisioning.plan(arrangements)
+            return len(fake.requests)
+
+        assert plan_requests(2) == plan_requests(20) == 4
+
+    def test_update(self, fake_frost, sensor_arrangement, tmp_path):
+        fake = fake_frost()
+        registry = EntityRegistry(tmp_path / "registry.sqlite3")
+        arrangements = [sensor_arrangement(f"s-{i}") for i in range(3)]
+        provisioning.apply(provisioning.plan(arrangements))
+        fake.requests.clear()
+        [sensor] = arrangements[1].get_entities("Sensor")
+        sensor.description = "moved to the attic"
+        plan = provisioning.plan(arrangements)
+        [change] = plan.of(provisioning.UPDATE)
+        assert str(change) == "~ Sensor s-1 (description)"
+        assert not provisioning.apply(plan, registry=registry)
+        assert fake.batched == [("patch", "Sensors(2)")]
+        assert [m for m, _ in fake.requests].count("POST") == 1
+        assert fake.fields[("Sensors", 2)]["description"] == "moved to the attic"
+        assert registry.lookup("s-1", config_hash(arrangements[1]))
+        assert not provisioning.plan(arrangements)
+
+    def test_new_location(self, fake_frost, sensor_arrangement):
+        fake = fake_frost()
+        [arrangement] = [sensor_arrangement("s-0")]
+        provisioning.apply(provisioning.plan([arrangement]))
+        [thing] = arrangement.get_entities("Thing")
+        location = thing.iot_links["locations"][0].model_copy(  # type: ignore
+            update={"name": "second location"}
+        )
+        thing.iot_links["locations"].append(location)  # type: ignore
+        plan = provisioning.plan([arrangement])
+        assert [str(c) for c in plan.of(provisioning.CREATE)] == [
+            "+ Location second location"
+        ]
+        assert not provisioning.apply(plan)
+        assert fake.batched == [("post", "Things(1)/Locations")]
+        assert len(fake.locations[1]) == 2
+
+    def test_relink(self, fake_frost, sensor_arrangement):
+        fake = fake_frost()
+        arrangements = [sensor_arrangement("s-0"), sensor_arrangement("s-1")]
+        provisioning.apply(provisioning.plan(arrangements))
+        arrangements[1] = sensor_arrangement("s-1", thing="room-2")
+        plan = provisioning.plan(arrangements)
+        assert {str(c) for c in plan.of(provisioning.UPDATE)} == {
+            f"~ Datastream {ds.name} (Thing)"
+            for ds in arrangements[1].get_entities("Datastream")
+        }
+        assert not provisioning.apply(plan)
+        assert [ds["Things"] for ds in fake.datastreams] == [1] * 4 + [2] * 4
+        assert not provisioning.plan(arrangements)
@@ -0,0 +1,288 @@
+"""Test the asyncio FROST client and upload path in frost_async.py"""
+
+# standard
+import asyncio
+import json
+from datetime import datetime
+from urllib import error
+
+# external
+import pytest
+
+# internal
+import sensorthings_utils.frost_async as frost_async
+from sensorthings_utils.exceptions import FrostUploadFailure
+import sensorthings_utils.frost as frost
+from sensorthings_utils.frost import datastream_routes
+from sensorthings_utils.frost_async import AsyncFrostClient
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.transformers.types import ObservedProperties
+
+
+class _FakeFrost:
+    """
+    Asyncio FROST stand-in. Reads requests as they arrive (so pipelined ones
+    pile up) and answers them in order after a short delay.
+    """
+
+    def __init__(self, close_every: int = 0):
+        self.close_every = close_every
+        self.connections = 0
+        self.posts: list[bytes] = []
+        self.gets = 0
+        self.max_pipelined = 0
+        self.server: asyncio.Server | None = None
+
+    @property
+    def root(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]  # type: ignore
+        return f"http://{host}:{port}/v1.1"
+
+    async def __aenter__(self) -> "_FakeFrost":
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.server.close()  # type: ignore
+
+    async def _serve(self, reader, writer) -> None:
+        self.connections += 1
+        requests: asyncio.Queue = asyncio.Queue()
+        responder = asyncio.create_task(self._respond(requests, writer))
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while (line := await reader.readline()) != b"\r\n":
+                    name, _, value = line.decode().partition(":")
+                    headers[name.lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await requests.put(request_line.decode().split(" ")[:2] + [body])
+                self.max_pipelined = max(self.max_pipelined, requests.qsize())
+        finally:
+            await requests.put(None)
+            await responder
+
+    async def _respond(self, requests: asyncio.Queue, writer) -> None:
+        answered = 0
+        while (request := await requests.get()) is not None:
+            await asyncio.sleep(0.001)
+            method, path, body = request
+            answered += 1
+            close = self.close_every and answered % self.close_every == 0
+            writer.write(self._response(method, path, body, close))
+            await writer.drain()
+            if close:
+                break
+        writer.close()
+
+    def _response(self, method: str, path: str, body: bytes, close: bool) -> bytes:
+        connection = b"Connection: close\r\n" if close else b""
+        if path.startswith("/v1.1/Missing"):
+            return b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n" + connection + b"\r\n"
+        if method == "POST":
+            self.posts.append(body)
+            location = f"{self.root}/Observations({len(self.posts)})"
+            return (
+                f"HTTP/1.1 201 Created\r\nLocation: {location}\r\n"
+                "Content-Length: 0\r\n"
+            ).encode() + connection + b"\r\n"
+        # GETs are answered chunked, as FROST does:
+        self.gets += 1
+        data = json.dumps(
+            {
+                "value": [
+                    {
+                        "@iot.id": 7,
+                        "name": "co2",
+                    }
+                ]
+            }
+        ).encode()
+        half = len(data) // 2
+        chunks = b"".join(
+            f"{len(part):x}\r\n".encode() + part + b"\r\n"
+            for part in (data[:half], data[half:])
+        )
+        return (
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n"
+            + connection
+            + b"\r\n"
+            + chunks
+            + b"0\r\n\r\n"
+        )
+
+
+def _obs(value) -> tuple[Observation, ObservedProperties]:
+    return (
+        Observation(result=value, phenomenonTime=datetime(2025, 1, 1)),
+        ObservedProperties.CO2_INDOOR,
+    )
+
+
+@pytest.fixture(autouse=True)
+def frost_endpoint(monkeypatch):
+    datastream_routes.clear()
+    yield monkeypatch
+    datastream_routes.clear()
+
+
+class TestAsyncFrostClient:
+    """
+    Test the pipelining AsyncFrostClient against an asyncio fake FROST.
+
+    Testing Strategy:
+        - hundreds of concurrent requests share at most `connections`
+          connections, with several requests pipelined on each,
+        - chunked responses are read,
+        - HTTP errors surface as `urllib.error.HTTPError`,
+        - requests survive the server closing the connection between them,
+        - a POST is not sent again when the connection closes partway through
+          its response, a GET is.
+    """
+
+    def test_pipelined_requests(self):
+        async def run():
+            async with _FakeFrost() as frost:
+                client = AsyncFrostClient(
+                    frost.root, None, connections=2, pipeline_depth=32
+                )
+                responses = await asyncio.gather(
+                    *(client.post_json("/Observations", {"i": i}) for i in range(300))
+                )
+                await client.close()
+                return frost, responses
+
+        frost, responses = asyncio.run(run())
+        assert len(frost.posts) == 300
+        assert sorted(json.loads(p)["i"] for p in frost.posts) == list(range(300))
+        assert all(r.status == 201 for r in responses)
+        assert frost.connections <= 2
+        assert frost.max_pipelined > 1
+
+    def test_chunked_and_errors(self):
+        async def run():
+            async with _FakeFrost() as frost:
+                client = AsyncFrostClient(frost.root, None)
+                data = await client.get_json("/Datastreams")
+                with pytest.raises(error.HTTPError) as e:
+                    await client.get_json("/Missing")
+                await client.close()
+                return data, e.value
+
+        data, e = asyncio.run(run())
+        assert data["value"][0]["name"] == "co2"
+        assert e.code == 404
+
+    def test_server_closes_connection(self):
+        async def run():
+            async with _FakeFrost(close_every=3) as frost:
+                client = AsyncFrostClient(
+                    frost.root, None, connections=1, pipeline_depth=1
+                )
+                for i in range(7):
+                    await client.post_json("/Observations", {"i": i})
+                await client.close()
+                return frost
+
+        frost = asyncio.run(run())
+        assert len(frost.posts) == 7
+        assert frost.connections == 3
+
+    def test_closed_mid_response(self):
+        received: list[bytes] = []
+
+        async def truncate(reader, writer):
+            received.append(await reader.readline())
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n{}")
+            await writer.drain()
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(truncate, "127.0.0.1", 0)
+            host, port = server.sockets[0].getsockname()[:2]
+            client = AsyncFrostClient(f"http://{host}:{port}/v1.1", None)
+            with pytest.raises(error.URLError):
+                await client.post_json("/Observations", {"i": 0})
+            posts = len(received)
+            with pytest.raises(error.URLError):
+                await client.get_json("/Things")
+            await client.close()
+            server.close()
+            return posts
+
+        posts = asyncio.run(run())
+        assert posts == 1
+        assert len(received) == 3
+
+    def test_unreachable(self):
+        async def run():
+            client = AsyncFrostClient("http://127.0.0.1:9/v1.1", None, timeout=1)
+            await client.get_json("/Things")
+
+        with pytest.raises(error.URLError):
+            asyncio.run(run())
+
+
+class TestAsyncObservationUpload:
+    """
+    Test the async upload path.
+
+    Testing Strategy:
+        - the datastream id is looked up once and shared via the routing table,
+        - concurrent uploads all reach FROST and are counted in netmon,
+        - failures raise `FrostUploadFailure`,
+        - lookups build the same quoted filters as the sync client.
+    """
+
+    def test_concurrent_uploads(self, frost_endpoint):
+        success = netmon.push_success.get("sensor-async", 0)
+
+        async def run():
+            async with _FakeFrost() as frost:
+                frost_endpoint.setenv("FROST_ENDPOINT", frost.root)
+                await asyncio.gather(
+                    *(
+                        frost_async.frost_observation_upload("sensor-async", _obs(i))
+                        for i in range(200)
+                    )
+                )
+                await frost_async.get_async_frost_client().close()
+                return frost
+
+        frost = asyncio.run(run())
+        assert len(frost.posts) == 200
+        assert frost.gets == 1
+        assert json.loads(frost.posts[0])["Datastream"] == {"@iot.id": 7}
+        assert netmon.push_success["sensor-async"] == success + 200
+        assert datastream_routes.get("sensor-async", ObservedProperties.CO2_INDOOR)
+
+    def test_upload_failure(self, frost_endpoint):
+        frost_endpoint.setenv("FROST_ENDPOINT", "http://127.0.0.1:9/v1.1")
+        frost_endpoint.setenv("FROST_TIMEOUT", "1")
+
+        with pytest.raises(FrostUploadFailure):
+            asyncio.run(frost_async.frost_observation_upload("sensor-down", _obs(1)))
+
+    def test_lookup_filters_match_sync(self, frost_endpoint):
+        filters: list[tuple[str, str]] = []
+
+        def sync_filter_query(filter_string, *args, **kwargs):
+            filters.append(("sync", filter_string))
+            return {"value": []}
+
+        async def async_filter_query(filter_string, *args, **kwargs):
+            filters.append(("async", filter_string))
+            return {"value": []}
+
+        frost_endpoint.setattr(frost, "filter_query", sync_filter_query)
+        frost_endpoint.setattr(frost_async, "filter_query", async_filter_query)
+        assert frost.find_datastream_id("l'atelier", "o'clock") is None
+        lookup = frost_async.find_datastream_id("l'atelier", "o'clock")
+        assert asyncio.run(lookup) is None
+        (_, sync_filter), (_, async_filter) = filters
+        assert sync_filter == async_filter
+        assert "'l''atelier'" in async_filter
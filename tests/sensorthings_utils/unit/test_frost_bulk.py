@@ -0,0 +1,108 @@
+"""Test bulk observation uploads in frost_bulk.py"""
+
+# standard
+from datetime import datetime
+
+# external
+import pytest
+
+# internal
+import sensorthings_utils.frost_bulk as frost_bulk
+from sensorthings_utils.frost import datastream_routes
+from sensorthings_utils.frost_bulk import BulkObservationUploader
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.transformers.types import ObservedProperties
+
+ROOT = "http://localhost:8080/FROST-Server/v1.1"
+DATASTREAM_IDS = {
+    ("sensor-1", "co2"): 1,
+    ("sensor-1", "noise"): 2,
+    ("sensor-2", "co2"): 3,
+}
+
+
+def _obs(value, datastream=ObservedProperties.CO2_INDOOR):
+    return (Observation(result=value, phenomenonTime=datetime(2025, 1, 1)), datastream)
+
+
+@pytest.fixture
+def posted(monkeypatch) -> list:
+    """Record CreateObservations bodies, reject every result equal to -1."""
+    bodies = []
+
+    def post(self, body):
+        bodies.append(body)
+        rows = [row for ds in body for row in ds["dataArray"]]
+        return [
+            "error" if row[1] == -1 else f"{ROOT}/Observations({i})"
+            for i, row in enumerate(rows)
+        ]
+
+    monkeypatch.setattr(
+        frost_bulk,
+        "get_datastream_id",
+        lambda sensor, ds: DATASTREAM_IDS.get((sensor, getattr(ds, "value", ds))),
+    )
+    monkeypatch.setattr(BulkObservationUploader, "_post", post)
+    return bodies
+
+
+class TestBulkObservationUploader:
+    """
+    Test the CreateObservations uploader.
+
+    Testing Strategy:
+        - observations are grouped per datastream in one request,
+        - a flush is triggered by `max_size`,
+        - rejected rows are attributed to the right sensor,
+        - unknown datastreams fail without a request,
+        - rows reference the routed FeatureOfInterest of their datastream.
+    """
+
+    def test_grouped_by_datastream(self, posted):
+        uploader = BulkObservationUploader(max_size=100)
+        uploader.add("sensor-1", _obs(400))
+        uploader.add("sensor-1", _obs(401))
+        uploader.add("sensor-1", _obs(30, ObservedProperties.NOISE_IN))
+        assert uploader.flush() == []
+        assert len(posted) == 1
+        assert [ds["Datastream"]["@iot.id"] for ds in posted[0]] == [1, 2]
+        assert posted[0][0]["dataArray@iot.count"] == 2
+
+    def test_flush_on_size(self, posted):
+        uploader = BulkObservationUploader(max_size=2)
+        uploader.add("sensor-1", _obs(400))
+        assert not posted
+        uploader.add("sensor-2", _obs(400))
+        assert len(posted) == 1
+        assert len(uploader) == 0
+
+    def test_rejected_rows_map_to_sensor(self, posted):
+        fails = dict(netmon.push_fail)
+        uploader = BulkObservationUploader()
+        uploader.add("sensor-1", _obs(400))
+        uploader.add("sensor-2", _obs(-1))
+        failed = uploader.flush()
+        assert [p.sensor_name for p in failed] == ["sensor-2"]
+        assert netmon.push_fail["sensor-2"] == fails.get("sensor-2", 0) + 1
+        assert netmon.push_fail["sensor-1"] == fails.get("sensor-1", 0)
+
+    def test_unknown_datastream(self, posted):
+        uploader = BulkObservationUploader()
+        failed = uploader.add("sensor-3", _obs(400))
+        assert len(failed) == 1
+        assert uploader.flush() == []
+        assert not posted
+
+    def test_feature_of_interest(self, posted):
+        datastream_routes.put_feature_of_interest("sensor-2", "co2", 5)
+        uploader = BulkObservationUploader(max_size=100)
+        uploader.add("sensor-1", _obs(400))
+        uploader.add("sensor-2", _obs(401))
+        uploader.flush()
+        datastream_routes.clear()
+        without, with_feature = posted[0]
+        assert without["components"] == ["phenomenonTime", "result"]
+        assert with_feature["components"][-1] == "FeatureOfInterest/id"
+        assert with_feature["dataArray"][0][-1] == 5
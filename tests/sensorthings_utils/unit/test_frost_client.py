@@ -0,0 +1,158 @@
+"""Test the pooled FROST HTTP client in frost_client.py"""
+
+# standard
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error
+
+# external
+import pytest
+
+# internal
+from sensorthings_utils.frost_client import FrostClient
+
+
+class _FakeFrostHandler(BaseHTTPRequestHandler):
+    """
+    Answers every GET with an empty collection, every POST with a 201. While
+    `server.drop` is set, requests are read and the connection closed without
+    an answer.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _reply(self, status: int, body: dict, headers: dict | None = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dropped(self) -> bool:
+        if self.server.drop:  # type: ignore
+            self.server.drop -= 1  # type: ignore
+            self.close_connection = True
+            return True
+        return False
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path, self.headers))  # type: ignore
+        if self._dropped():
+            return
+        if self.path.startswith("/missing"):
+            return self._reply(404, {"message": "Nothing found."})
+        self._reply(200, {"value": []})
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        self.server.requests.append(("POST", self.rfile.read(length), self.headers))  # type: ignore
+        if self._dropped():
+            return
+        self._reply(201, {}, {"Location": "http://localhost/v1.1/Things(1)"})
+
+
+class _CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests: list = []
+        self.connections = 0
+        self.drop = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+@pytest.fixture
+def fake_frost():
+    server = _CountingServer(("127.0.0.1", 0), _FakeFrostHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(fake_frost) -> FrostClient:
+    host, port = fake_frost.server_address
+    client = FrostClient(f"http://{host}:{port}/v1.1", "dXNlcjpwYXNz", pool_size=2)
+    yield client
+    client.close()
+
+
+class TestFrostClient:
+    """
+    Test the keep-alive FrostClient against a local HTTP/1.1 server.
+
+    Testing Strategy:
+        - sequential requests share one TCP connection,
+        - the auth header is sent on every request,
+        - HTTP errors surface as `urllib.error.HTTPError`,
+        - a GET is retried when a reused connection closes before the
+          response, a POST FROST may have acted on is not,
+        - `localhost` links are rewritten in container environments.
+    """
+
+    def test_connection_reused(self, client, fake_frost):
+        for _ in range(5):
+            assert client.get_json("/Things") == {"value": []}
+        client.post_json("/Things", {"name": "Room 120"})
+        assert fake_frost.connections == 1
+        assert len(fake_frost.requests) == 6
+
+    def test_concurrency_bounded_by_pool(self, client, fake_frost):
+        threads = [
+            threading.Thread(target=client.get_json, args=("/Things",))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(fake_frost.requests) == 8
+        assert fake_frost.connections <= client.pool_size
+
+    def test_auth_header(self, client, fake_frost):
+        client.get_json("/Things")
+        assert fake_frost.requests[0][2]["Authorization"] == "Basic dXNlcjpwYXNz"
+
+    def test_http_error(self, client):
+        with pytest.raises(error.HTTPError) as e:
+            client.get_json(client.base_url.replace("/v1.1", "/missing"))
+        assert e.value.code == 404
+        assert b"Nothing found" in e.value.read()
+
+    def test_closed_before_response(self, client, fake_frost):
+        client.get_json("/Things")
+        fake_frost.drop = 1
+        assert client.get_json("/Things") == {"value": []}
+        assert len(fake_frost.requests) == 3
+
+        client.get_json("/Things")
+        fake_frost.drop = 1
+        with pytest.raises(error.URLError):
+            client.post_json("/Observations", {"result": 1})
+        assert [r[0] for r in fake_frost.requests].count("POST") == 1
+
+    def test_unreachable(self):
+        client = FrostClient("http://127.0.0.1:9/v1.1", None, timeout=1)
+        with pytest.raises(error.URLError):
+            client.get_json("/Things")
+
+    def test_container_rewrite(self):
+        client = FrostClient(
+            "http://localhost:8080/FROST-Server/v1.1", None, container_environment=True
+        )
+        assert client.base_url == "http://web:8080/FROST-Server/v1.1"
+        assert client.url("/Things") == "http://web:8080/FROST-Server/v1.1/Things"
+        assert client.url("http://example.com/x") == "http://example.com/x"
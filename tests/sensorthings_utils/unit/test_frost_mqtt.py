@@ -0,0 +1,138 @@
+"""Test the FROST MQTT create publisher in frost_mqtt.py"""
+
+# standard
+from datetime import datetime
+from types import SimpleNamespace
+
+# external
+import pytest
+from paho.mqtt.client import MQTT_ERR_QUEUE_SIZE, MQTT_ERR_SUCCESS
+
+# internal
+import sensorthings_utils.frost_mqtt as frost_mqtt
+from sensorthings_utils.frost import datastream_routes
+from sensorthings_utils.exceptions import FrostUploadFailure
+from sensorthings_utils.frost_mqtt import FrostMqttPublisher
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.transformers.types import ObservedProperties
+
+
+class _FakeMqttClient:
+    """Stands in for a paho client; acknowledges on `ack()`, or straight away."""
+
+    def __init__(self, ack_immediately: bool = False, rc: int = MQTT_ERR_SUCCESS):
+        self.ack_immediately = ack_immediately
+        self.rc = rc
+        self.published: list[tuple[str, str, int]] = []
+        self.connected = False
+        self.on_publish = self.on_connect = self.on_disconnect = None
+
+    def username_pw_set(self, username, password):
+        self.credentials = (username, password)
+
+    def max_queued_messages_set(self, n):
+        pass
+
+    def connect_async(self, host, port, keepalive):
+        self.connected = True
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.connected = False
+
+    def publish(self, topic, payload, qos):
+        self.published.append((topic, payload, qos))
+        mid = len(self.published)
+        if self.ack_immediately and self.rc == MQTT_ERR_SUCCESS:
+            # paho may acknowledge before `publish` has returned the mid:
+            self.ack(mid)
+        return SimpleNamespace(rc=self.rc, mid=mid)
+
+    def ack(self, mid):
+        self.on_publish(self, None, mid, 0, None)  # type: ignore
+
+
+def _obs(value):
+    return (
+        Observation(result=value, phenomenonTime=datetime(2025, 1, 1)),
+        ObservedProperties.CO2_INDOOR,
+    )
+
+
+@pytest.fixture(autouse=True)
+def datastream_id(monkeypatch):
+    monkeypatch.setattr(frost_mqtt, "get_datastream_id", lambda *_: 12)
+
+
+class TestFrostMqttPublisher:
+    """
+    Test publishing observations to FROST's MQTT create topics.
+
+    Testing Strategy:
+        - observations go to the datastream topic with QoS 1, referencing the
+          routed FeatureOfInterest,
+        - successes are counted once acknowledged, also when the ack beats
+          `publish`,
+        - a full paho queue raises `FrostUploadFailure`,
+        - unacknowledged messages are returned on close, with their application.
+    """
+
+    def test_publish(self):
+        client = _FakeMqttClient()
+        publisher = FrostMqttPublisher("web", client=client, username="u", password="p")
+        publisher.publish("sensor-mqtt", _obs(412))
+        topic, payload, qos = client.published[0]
+        assert topic == "v1.1/Datastreams(12)/Observations"
+        assert qos == 1
+        assert '"result":412' in payload
+        assert "FeatureOfInterest" not in payload
+        assert client.connected
+        assert client.credentials == ("u", "p")
+
+    def test_feature_of_interest(self):
+        client = _FakeMqttClient()
+        publisher = FrostMqttPublisher("web", client=client)
+        datastream_routes.put_feature_of_interest("sensor-foi", "co2", 5)
+        publisher.publish("sensor-foi", _obs(412))
+        datastream_routes.clear()
+        assert '"FeatureOfInterest":{"@iot.id":5}' in client.published[0][1]
+
+    def test_acknowledged(self):
+        client = _FakeMqttClient()
+        publisher = FrostMqttPublisher("web", client=client)
+        success = netmon.push_success.get("sensor-ack", 0)
+        publisher.publish("sensor-ack", _obs(1))
+        publisher.publish("sensor-ack", _obs(2))
+        assert len(publisher) == 2
+        client.ack(1)
+        assert len(publisher) == 1
+        assert netmon.push_success["sensor-ack"] == success + 1
+
+    def test_early_ack(self):
+        publisher = FrostMqttPublisher("web", client=_FakeMqttClient(ack_immediately=True))
+        success = netmon.push_success.get("sensor-early", 0)
+        publisher.publish("sensor-early", _obs(1))
+        assert len(publisher) == 0
+        assert netmon.push_success["sensor-early"] == success + 1
+
+    def test_queue_full(self):
+        client = _FakeMqttClient(rc=MQTT_ERR_QUEUE_SIZE)
+        publisher = FrostMqttPublisher("web", client=client)
+        with pytest.raises(FrostUploadFailure):
+            publisher.publish("sensor-full", _obs(1))
+
+    def test_close_returns_unacked(self):
+        client = _FakeMqttClient()
+        publisher = FrostMqttPublisher("web", client=client)
+        publisher.publish("sensor-close", _obs(1), "app-close")
+        unacked = publisher.close(timeout=0)
+        assert [(app, sensor) for app, sensor, _ in unacked] == [
+            ("app-close", "sensor-close")
+        ]
+        assert not client.connected
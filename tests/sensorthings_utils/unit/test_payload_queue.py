@@ -0,0 +1,133 @@
+"""Test the bounded MQTT payload queue in payload_queue.py"""
+
+# standard
+import queue
+import threading
+
+# external
+import pytest
+
+# internal
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.payload_queue import (
+    BLOCK,
+    DROP_OLDEST,
+    SPILL,
+    PayloadQueue,
+)
+
+
+def _drain(payload_queue: PayloadQueue) -> list:
+    drained = []
+    while True:
+        try:
+            drained.append(payload_queue.get(timeout=0))
+        except queue.Empty:
+            return drained
+
+
+class TestPayloadQueue:
+    """
+    Test the overflow policies of the payload queue.
+
+    Testing Strategy:
+        - an unknown overflow policy is rejected,
+        - "drop_oldest" keeps the newest payloads and counts the drops,
+        - "block" waits for room, and gives up once closed,
+        - "spill" keeps memory bounded and returns every payload in order,
+          also those left on disk by a previous run, but not those already
+          taken before the restart,
+        - the high-water mark is reported to netmon,
+        - `get_batch` takes up to the requested number of payloads in order,
+          and marks them done.
+    """
+
+    def test_unknown_policy(self, tmp_path):
+        with pytest.raises(ValueError):
+            PayloadQueue("queue-bad", overflow="grow", spill_dir=tmp_path)
+
+    def test_drop_oldest(self, tmp_path):
+        payload_queue = PayloadQueue(
+            "queue-drop", maxsize=3, overflow=DROP_OLDEST, spill_dir=tmp_path
+        )
+        for i in range(5):
+            payload_queue.put(b"%d" % i)
+        assert len(payload_queue) == 3
+        assert _drain(payload_queue) == [b"2", b"3", b"4"]
+        assert payload_queue._queue.unfinished_tasks == 0
+        assert netmon.payload_queue_dropped["queue-drop"] == 2
+        assert netmon.payload_queue_high_water["queue-drop"] == 3
+
+    def test_block(self, tmp_path):
+        payload_queue = PayloadQueue(
+            "queue-block", maxsize=1, overflow=BLOCK, spill_dir=tmp_path
+        )
+        payload_queue.put(b"0")
+        producer = threading.Thread(target=payload_queue.put, args=(b"1",))
+        producer.start()
+        producer.join(0.1)
+        assert producer.is_alive()
+        assert payload_queue.get(timeout=1) == b"0"
+        producer.join(2)
+        assert payload_queue.get(timeout=1) == b"1"
+
+        payload_queue.put(b"2")
+        payload_queue.close()
+        payload_queue.put(b"3")  # returns within a second, dropped
+        assert netmon.payload_queue_dropped["queue-block"] == 1
+
+    def test_spill(self, tmp_path):
+        payload_queue = PayloadQueue(
+            "queue-spill", maxsize=2, overflow=SPILL, spill_dir=tmp_path
+        )
+        payloads = [b"%d" % i for i in range(5)] + [b'{"a":\n1}\xff']
+        for payload in payloads:
+            payload_queue.put(payload)
+        assert payload_queue._queue.qsize() == 2
+        assert len(payload_queue) == 6
+        assert netmon.payload_queue_spilled["queue-spill"] == 4
+        assert _drain(payload_queue) == payloads
+        assert not payload_queue.spill_path.exists()
+        assert netmon.payload_queue_spilled["queue-spill"] == 0
+
+    def test_spill_survives_restart(self, tmp_path):
+        payload_queue = PayloadQueue(
+            "queue-restart", maxsize=1, overflow=SPILL, spill_dir=tmp_path
+        )
+        for i in range(3):
+            payload_queue.put(b"%d" % i)
+        payload_queue.close()
+        restarted = PayloadQueue(
+            "queue-restart", maxsize=1, overflow=SPILL, spill_dir=tmp_path
+        )
+        assert len(restarted) == 2
+        assert _drain(restarted) == [b"1", b"2"]
+
+    def test_spill_restart_after_partial_drain(self, tmp_path):
+        payload_queue = PayloadQueue(
+            "queue-partial", maxsize=2, overflow=SPILL, spill_dir=tmp_path
+        )
+        for i in range(8):
+            payload_queue.put(b"%d" % i)
+        assert payload_queue.get_batch(2, timeout=0) == [b"0", b"1"]
+        assert payload_queue.get_batch(2, timeout=0) == [b"2", b"3"]
+        payload_queue.close()
+        restarted = PayloadQueue(
+            "queue-partial", maxsize=2, overflow=SPILL, spill_dir=tmp_path
+        )
+        # 4 and 5 were read back into memory, but never taken:
+        assert _drain(restarted) == [b"%d" % i for i in range(4, 8)]
+        assert not restarted.spill_path.exists()
+        assert not restarted.offset_path.exists()
+
+    def test_get_batch(self, tmp_path):
+        payload_queue = PayloadQueue("queue-batch", maxsize=10, spill_dir=tmp_path)
+        for i in range(5):
+            payload_queue.put(b"%d" % i)
+        assert payload_queue.get_batch(3, timeout=0) == [b"0", b"1", b"2"]
+        assert payload_queue.get_batch(3, timeout=0) == [b"3", b"4"]
+        assert payload_queue._queue.unfinished_tasks == 0
+        payload_queue._queue.join()  # returns
+        with pytest.raises(queue.Empty):
+            payload_queue.get_batch(3, timeout=0)
+
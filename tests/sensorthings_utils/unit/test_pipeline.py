@@ -0,0 +1,177 @@
+"""Test the upload pipeline in pipeline.py"""
+
+# standard
+import queue
+import threading
+import time
+from datetime import datetime
+
+# external
+import pytest
+
+# internal
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.pipeline import KeyedExecutor, UploadPipeline
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.transformers.types import ObservedProperties
+
+OBSERVATION_SET = (
+    Observation(result=400, phenomenonTime=datetime(2025, 1, 1)),
+    ObservedProperties.CO2_INDOOR,
+)
+
+
+class TestUploadPipeline:
+    """
+    Test the bounded queue and uploader pool.
+
+    Testing Strategy:
+        - every submitted observation is uploaded by a worker thread,
+        - a full queue blocks (times out) the submitter,
+        - upload failures are handed to `on_failure`,
+        - queue depth, wait and busy time are reported to netmon.
+    """
+
+    def test_uploads_on_workers(self):
+        uploaded = []
+
+        def upload(sensor_id, observation_set):
+            uploaded.append(threading.current_thread().name)
+
+        pipeline = UploadPipeline("pipeline-test", upload, workers=3)
+        pipeline.start()
+        for i in range(30):
+            pipeline.submit(f"sensor-{i}", OBSERVATION_SET)
+        pipeline.join()
+        pipeline.stop()
+        assert len(uploaded) == 30
+        assert all(name.startswith("pipeline-test-uploader-") for name in uploaded)
+
+    def test_backpressure(self):
+        release = threading.Event()
+        pipeline = UploadPipeline(
+            "pipeline-full", lambda s, o: release.wait(), workers=1, maxsize=1
+        )
+        pipeline.start()
+        pipeline.submit("sensor-1", OBSERVATION_SET)  # taken by the worker
+        pipeline.submit("sensor-2", OBSERVATION_SET)  # fills the queue
+        with pytest.raises(queue.Full):
+            pipeline.submit("sensor-3", OBSERVATION_SET, timeout=0.1)
+        release.set()
+        pipeline.stop()
+
+    def test_failures_reported(self):
+        failures = []
+
+        def upload(sensor_id, observation_set):
+            raise ValueError(sensor_id)
+
+        pipeline = UploadPipeline(
+            "pipeline-fail",
+            upload,
+            on_failure=lambda e, sensor_id: failures.append(sensor_id),
+        )
+        pipeline.start()
+        pipeline.submit("sensor-1", OBSERVATION_SET)
+        pipeline.join()
+        pipeline.stop()
+        assert failures == ["sensor-1"]
+
+    def test_netmon_metrics(self):
+        pipeline = UploadPipeline("pipeline-metrics", lambda s, o: None, workers=2)
+        pipeline.start()
+        pipeline.submit("sensor-1", OBSERVATION_SET)
+        pipeline.join()
+        pipeline.stop()
+        assert netmon.upload_workers["pipeline-metrics"] == 2
+        assert netmon.upload_queue_depth["pipeline-metrics"] == 0
+        assert netmon.upload_busy_time["pipeline-metrics"] > 0
+        assert 0 <= netmon.upload_utilisation("pipeline-metrics") <= 1
+
+
+class TestKeyedExecutor:
+    """
+    Test the keyed executor running each sensor's tasks on one thread.
+
+    Testing Strategy:
+        - a key is always routed to the same thread,
+        - the tasks of a key run in submission order,
+        - tasks of keys on different threads run in parallel,
+        - task failures are handed to `on_failure` with their key,
+        - stopping runs the tasks still queued first.
+    """
+
+    def test_worker_for(self):
+        executor = KeyedExecutor("keyed-route", workers=4)
+        other = KeyedExecutor("keyed-route-other", workers=4)
+        routes = {executor.worker_for(f"sensor-{i}") for i in range(100)}
+        assert routes == {0, 1, 2, 3}
+        assert all(
+            executor.worker_for(f"sensor-{i}") == other.worker_for(f"sensor-{i}")
+            for i in range(100)
+        )
+
+    def test_ordering_per_key(self):
+        done: dict[str, list[int]] = {f"sensor-{i}": [] for i in range(10)}
+        threads: dict[str, set[str]] = {key: set() for key in done}
+
+        def task(key, i):
+            time.sleep(0.0005 * (i % 3))
+            done[key].append(i)
+            threads[key].add(threading.current_thread().name)
+
+        executor = KeyedExecutor("keyed-order", workers=4)
+        executor.start()
+        for i in range(50):
+            for key in done:
+                executor.submit(key, task, key, i)
+        executor.join()
+        executor.stop()
+        for key in done:
+            assert done[key] == list(range(50))
+            assert threads[key] == {f"keyed-order-keyed-{executor.worker_for(key)}"}
+        assert netmon.keyed_queue_depth["keyed-order"] == 0
+
+    def test_parallel_across_keys(self):
+        executor = KeyedExecutor("keyed-parallel", workers=2)
+        first = "sensor-0"
+        second = next(
+            f"sensor-{i}"
+            for i in range(1, 100)
+            if executor.worker_for(f"sensor-{i}") != executor.worker_for(first)
+        )
+        release = threading.Event()
+        ran = threading.Event()
+        executor.start()
+        executor.submit(first, release.wait, 2)
+        executor.submit(second, ran.set)
+        assert ran.wait(1)  # not held up by the blocked key
+        release.set()
+        executor.stop()
+
+    def test_failures_reported(self):
+        failures = []
+
+        def task(key):
+            raise ValueError(key)
+
+        executor = KeyedExecutor(
+            "keyed-fail", on_failure=lambda e, key: failures.append((e, key))
+        )
+        executor.start()
+        executor.submit("sensor-1", task, "sensor-1")
+        executor.join()
+        executor.stop()
+        assert [key for _, key in failures] == ["sensor-1"]
+        assert isinstance(failures[0][0], ValueError)
+
+    def test_stop_drains(self):
+        done = []
+        executor = KeyedExecutor("keyed-stop", workers=2)
+        executor.start()
+        for i in range(20):
+            executor.submit(f"sensor-{i}", done.append, i)
+        executor.stop()
+        assert sorted(done) == list(range(20))
+        threads = executor._threads  # type: ignore
+        assert not any(thread.is_alive() for thread in threads)  # type: ignore
@@ -0,0 +1,75 @@
+"""Test the readiness waiter in readiness.py"""
+
+# standard
+import socket
+
+# external
+import pytest
+
+# internal
+from sensorthings_utils.exceptions import DependencyNotReady
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.readiness import tcp_probe, wait_until_ready, warn_unready
+
+
+def _ready_after(failures: int):
+    calls = []
+
+    def probe():
+        calls.append(None)
+        if len(calls) <= failures:
+            raise ConnectionError("starting up")
+
+    return probe, calls
+
+
+class TestWaitUntilReady:
+    """
+    Test waiting for dependencies with exponential backoff.
+
+    Testing Strategy:
+        - ready dependencies return straight away,
+        - failing probes are retried until they succeed, succeeded ones are
+          not probed again,
+        - the deadline raises `DependencyNotReady` naming what is not ready,
+        - time to ready is recorded in netmon,
+        - the TCP probe tells a listening port from a closed one,
+        - dependencies which are only reported are probed once, and those
+          which fail are returned.
+    """
+
+    def test_ready(self):
+        probe, calls = _ready_after(0)
+        assert wait_until_ready({"frost": probe}) < 1
+        assert len(calls) == 1
+
+    def test_retried(self):
+        slow, slow_calls = _ready_after(3)
+        fast, fast_calls = _ready_after(0)
+        wait_until_ready({"slow": slow, "fast": fast}, initial_backoff=0.01)
+        assert len(slow_calls) == 4
+        assert len(fast_calls) == 1
+        assert "slow" in netmon.time_to_ready
+
+    def test_deadline(self):
+        probe, calls = _ready_after(1000)
+        with pytest.raises(DependencyNotReady, match="broker"):
+            wait_until_ready(
+                {"broker": probe}, deadline=0.1, initial_backoff=0.01, max_backoff=0.02
+            )
+        assert len(calls) > 2
+
+    def test_tcp_probe(self):
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen()
+            port = server.getsockname()[1]
+            tcp_probe("127.0.0.1", port)()
+        with pytest.raises(OSError):
+            tcp_probe("127.0.0.1", port, timeout=1)()
+
+    def test_warn_unready(self):
+        down, down_calls = _ready_after(1000)
+        up, up_calls = _ready_after(0)
+        assert warn_unready({"broker": down, "frost": up}) == ["broker"]
+        assert len(down_calls) == len(up_calls) == 1
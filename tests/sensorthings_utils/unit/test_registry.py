@@ -0,0 +1,58 @@
+"""Test the entity id registry in registry.py"""
+
+# standard
+import threading
+
+# internal
+from sensorthings_utils.registry import EntityRegistry
+
+IDS = {("Thing", "room-1"): 1, ("Datastream", "co2"): "ds-co2"}
+
+
+class TestEntityRegistry:
+    """
+    Test registering the FROST ids of sensor configs.
+
+    Testing Strategy:
+        - registered ids survive reopening the database, with their types,
+        - a changed config hash misses,
+        - re-registering replaces and forgetting removes a config,
+        - concurrent registrations from several threads.
+    """
+
+    def test_persistent(self, tmp_path):
+        registry = EntityRegistry(tmp_path / "registry.sqlite3")
+        registry.register("sensor-1", "hash-1", IDS)
+        registry.close()
+        assert EntityRegistry(tmp_path / "registry.sqlite3").lookup(
+            "sensor-1", "hash-1"
+        ) == IDS
+
+    def test_changed_hash(self, tmp_path):
+        registry = EntityRegistry(tmp_path / "registry.sqlite3")
+        registry.register("sensor-1", "hash-1", IDS)
+        assert registry.lookup("sensor-1", "hash-2") is None
+        assert registry.lookup("sensor-2", "hash-1") is None
+
+    def test_replace_and_forget(self, tmp_path):
+        registry = EntityRegistry(tmp_path / "registry.sqlite3")
+        registry.register("sensor-1", "hash-1", IDS)
+        registry.register("sensor-1", "hash-2", {("Thing", "room-2"): 2})
+        assert registry.lookup("sensor-1", "hash-2") == {("Thing", "room-2"): 2}
+        registry.forget("sensor-1")
+        assert registry.lookup("sensor-1", "hash-2") is None
+        assert len(registry) == 0
+
+    def test_concurrent(self, tmp_path):
+        registry = EntityRegistry(tmp_path / "registry.sqlite3")
+        threads = [
+            threading.Thread(
+                target=registry.register, args=(f"sensor-{i}", "hash", IDS)
+            )
+            for i in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(registry) == 20
@@ -0,0 +1,221 @@
+"""Test the asyncio connection runtime in runtime.py"""
+
+# standard
+import asyncio
+import json
+import socket
+import threading
+import time
+
+# external
+from paho.mqtt.client import MQTT_ERR_SUCCESS
+
+# internal
+from sensorthings_utils.connections import (
+    HTTPSensorApplicationConnection,
+    TTSConnection,
+)
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.runtime import AsyncRuntime, PahoAsyncBridge
+from sensorthings_utils.transformers.application_unpackers import TTSUnpacker
+from sensorthings_utils.transformers.types import SupportedSensors
+
+TTS_PAYLOAD = {
+    "end_device_ids": {"device_id": "ieq-thcpvl-001", "dev_eui": "24E124707D378803"},
+    "received_at": "2025-12-25T20:08:01.180377996Z",
+    "uplink_message": {
+        "decoded_payload": {
+            "battery": 53,
+            "co2": 4665,
+            "humidity": 75.5,
+            "light_level": 1,
+            "pir": "idle",
+            "pm10": 107,
+            "pm2_5": 101,
+            "pressure": 1017.5,
+            "temperature": 23.1,
+            "tvoc": 1,
+        },
+        "rx_metadata": [{"received_at": "2025-12-25T20:08:00.937463873Z"}],
+    },
+}
+SENSOR_REGISTRY = {"24E124707D378803": SupportedSensors.MILESIGHT_AM308L}
+
+
+class _PollingConnection(HTTPSensorApplicationConnection):
+    """Polls a new copy of the TTS payload every `request_interval`."""
+
+    application_unpacker = TTSUnpacker()
+
+    def __init__(self, app_name: str, fail: bool = False, **kwargs):
+        super().__init__(app_name, "credentials", sink="null", **kwargs)
+        self.fail = fail
+        self.polls = 0
+        self.poll_threads: set[str] = set()
+
+    def _auth(self):
+        return None
+
+    def _pull_data(self):
+        if self.fail:
+            raise RuntimeError("application down")
+        self.polls += 1
+        self.poll_threads.add(threading.current_thread().name)
+        return {**TTS_PAYLOAD, "received_at": f"2025-12-25T20:08:{self.polls:02}Z"}
+
+
+class _FakePahoClient:
+    """The socket side of a paho client, over one end of a socketpair."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.read = 0
+        self.on_socket_open = self.on_socket_close = None
+        self.on_socket_register_write = self.on_socket_unregister_write = None
+
+    def loop_read(self):
+        self.sock.recv(1)
+        self.read += 1
+        return MQTT_ERR_SUCCESS
+
+    def loop_write(self):
+        return MQTT_ERR_SUCCESS
+
+    def loop_misc(self):
+        return MQTT_ERR_SUCCESS
+
+    def reconnect(self):
+        """Open a new socketpair, keeping the broker's end as `peer`."""
+        self.sock, self.peer = socket.socketpair()
+        self.on_socket_open(self, None, self.sock)
+
+
+async def _until(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+class TestAsyncRuntime:
+    """
+    Test running connections as tasks on one event loop.
+
+    Testing Strategy:
+        - HTTP connections poll as tasks, blocking pulls off the loop, and
+          write their observations to their sink,
+        - a failing connection task is restarted and the restart counted,
+        - the runtime thread starts and stops every task,
+        - MQTT messages are drained on the loop and wake the task up,
+        - the paho bridge reads the socket when readable and pauses reading
+          while it cannot take messages,
+        - the paho bridge reconnects when the socket drops and reads the new
+          socket, but not after it is closed deliberately.
+    """
+
+    def test_http_tasks(self):
+        connections = [
+            _PollingConnection(f"poller-{i}", request_interval=0.01) for i in range(20)
+        ]
+        runtime = AsyncRuntime(connections)
+        runtime.start(SENSOR_REGISTRY)
+        time.sleep(0.3)
+        runtime.stop()
+        assert not runtime._thread.is_alive()  # type: ignore
+        for connection in connections:
+            assert connection.polls > 1
+            assert connection.sink.counts["24E124707D378803"] > 1  # type: ignore
+            assert runtime.name not in connection.poll_threads
+
+    def test_restart(self):
+        connection = _PollingConnection("poller-failing", fail=True, max_retries=1)
+        runtime = AsyncRuntime([connection], restart_delay=0)
+
+        async def main():
+            task = asyncio.create_task(runtime.run(SENSOR_REGISTRY))
+            await _until(lambda: netmon.task_restarts["poller-failing"] >= 2)
+            runtime._stopping.set()  # type: ignore
+            await task
+
+        asyncio.run(main())
+        assert netmon.task_restarts["poller-failing"] >= 2
+
+    def test_mqtt_drain(self, monkeypatch):
+        connection = TTSConnection(
+            "runtime-test@ttn", "credentials", "localhost", "v3/runtime-test@ttn/+/up",
+            sink="null",
+        )
+        monkeypatch.setattr(connection, "_auth", lambda: None)
+        client = connection._mqtt_client
+        monkeypatch.setattr(client, "connect", lambda host, port: 0)
+
+        async def main():
+            task = asyncio.create_task(connection.run(SENSOR_REGISTRY))
+            await _until(lambda: connection._on_payload is not None)
+            message = type("Message", (), {"payload": json.dumps(TTS_PAYLOAD)})
+            for _ in range(3):
+                client.on_message(client, None, message)  # type: ignore
+            await _until(lambda: len(connection.sink) == 30)  # type: ignore
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(main())
+        assert connection.sink.counts["24E124707D378803"] == 30  # type: ignore
+        assert netmon.payloads_received["runtime-test@ttn"] == 3
+        assert connection._on_payload is None
+
+    def test_paho_bridge(self):
+        ours, theirs = socket.socketpair()
+        ours.setblocking(False)
+        client = _FakePahoClient(ours)
+        accepting = [True]
+
+        async def main():
+            bridge = PahoAsyncBridge(
+                client, asyncio.get_running_loop(), can_read=lambda: accepting[0]
+            )
+            client.on_socket_open(client, None, ours)  # type: ignore
+            theirs.send(b"a")
+            await _until(lambda: client.read == 1)
+            accepting[0] = False
+            theirs.send(b"b")
+            await asyncio.sleep(0.1)
+            assert client.read == 1
+            accepting[0] = True
+            bridge.resume()
+            await _until(lambda: client.read == 2)
+            bridge.close()
+            client.on_socket_close(client, None, ours)  # type: ignore
+            await asyncio.sleep(0)
+
+        asyncio.run(main())
+        assert client.read == 2
+        ours.close()
+        theirs.close()
+
+    def test_paho_bridge_reconnect(self):
+        ours, theirs = socket.socketpair()
+        client = _FakePahoClient(ours)
+
+        async def main():
+            bridge = PahoAsyncBridge(
+                client, asyncio.get_running_loop(), reconnect_delay=0.01
+            )
+            client.on_socket_open(client, None, ours)  # type: ignore
+            # the broker drops the connection:
+            client.on_socket_close(client, None, ours)  # type: ignore
+            theirs.close()
+            await _until(lambda: client.sock is not ours)
+            assert client.sock is not ours
+            client.peer.send(b"a")
+            await _until(lambda: client.read == 1)
+            bridge.close()
+            last = client.sock
+            client.on_socket_close(client, None, last)  # type: ignore
+            await asyncio.sleep(0.05)
+            assert client.sock is last
+
+        asyncio.run(main())
+        assert client.read == 1
+        ours.close()
+        client.sock.close()
+        client.peer.close()
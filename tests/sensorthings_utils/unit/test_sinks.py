@@ -0,0 +1,209 @@
+"""Test the observation sinks in sinks.py"""
+
+# standard
+import asyncio
+import json
+from datetime import datetime
+
+# external
+import pytest
+
+# internal
+from sensorthings_utils.connections import TTSConnection
+from sensorthings_utils.exceptions import FrostUploadFailure, UnpackError
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.sinks import FileSink, NullSink, ObservationSink, make_sink
+from sensorthings_utils.spool import ObservationSpool
+from sensorthings_utils.transformers.types import ObservedProperties, SupportedSensors
+
+TTS_PAYLOAD = {
+    "end_device_ids": {"device_id": "ieq-thcpvl-001", "dev_eui": "24E124707D378803"},
+    "received_at": "2025-12-25T20:08:01.180377996Z",
+    "uplink_message": {
+        "decoded_payload": {
+            "battery": 53,
+            "co2": 4665,
+            "humidity": 75.5,
+            "light_level": 1,
+            "pir": "idle",
+            "pm10": 107,
+            "pm2_5": 101,
+            "pressure": 1017.5,
+            "temperature": 23.1,
+            "tvoc": 1,
+        },
+        "rx_metadata": [{"received_at": "2025-12-25T20:08:00.937463873Z"}],
+    },
+}
+
+
+def _obs(value):
+    return (
+        Observation(result=value, phenomenonTime=datetime(2025, 1, 1)),
+        ObservedProperties.CO2_INDOOR,
+    )
+
+
+def _tts_connection(**kwargs) -> TTSConnection:
+    connection = TTSConnection(
+        "sink-test@ttn", "credentials", "localhost", "v3/sink-test@ttn/+/up", **kwargs
+    )
+    connection.sensor_registry = {
+        "24E124707D378803": SupportedSensors.MILESIGHT_AM308L
+    }
+    return connection
+
+
+class _FailingSink(ObservationSink):
+    def write(self, sensor_id, observation_set):
+        raise FrostUploadFailure("FROST is down")
+
+
+class TestSinks:
+    """
+    Test the sink implementations and their selection.
+
+    Testing Strategy:
+        - the null sink counts and discards,
+        - the file sink writes spool format segments which can be replayed,
+        - `make_sink` rejects unknown sinks and ignores foreign options,
+        - connections write every transformed observation to their sink,
+          also from the asyncio path,
+        - only FROST sinks spool failures,
+        - stopping a connection whose thread never ran spools what its
+          upload pipeline holds, and can be repeated.
+    """
+
+    def test_null_sink(self):
+        sink = NullSink("null-app")
+        writes = netmon.sink_writes.get("null-app", 0)
+        for i in range(3):
+            sink.write("sensor-1", _obs(i))
+        assert len(sink) == 3
+        assert sink.counts["sensor-1"] == 3
+        assert netmon.sink_writes["null-app"] == writes + 3
+
+    def test_file_sink(self, tmp_path):
+        sink = FileSink("file-app", path=tmp_path / "observations")
+        sink.write("sensor-1", _obs(400))
+        sink.flush()
+        sink.stop()
+        segment = next((tmp_path / "observations").glob("*.jsonl"))
+        record = json.loads(segment.read_text())
+        assert record["sensor"] == "sensor-1"
+        assert record["observation"]["result"] == 400
+        assert len(ObservationSpool(tmp_path / "observations")) == 1
+
+    def test_make_sink(self, tmp_path):
+        assert isinstance(make_sink("null", "app", max_size=10), NullSink)
+        assert make_sink("file", "app", path=tmp_path).path == tmp_path  # type: ignore
+        with pytest.raises(ValueError):
+            make_sink("carrier-pigeon", "app")
+
+    def test_connection_writes_to_sink(self):
+        connection = _tts_connection(sink="null")
+        connection._process_payload(TTS_PAYLOAD)
+        assert connection.sink.counts["24E124707D378803"] == 10  # type: ignore
+        asyncio.run(connection._aprocess_payload(TTS_PAYLOAD))
+        assert connection.sink.counts["24E124707D378803"] == 20  # type: ignore
+
+    def test_local_sinks_do_not_spool(self, tmp_path):
+        connection = _tts_connection(sink="file", sink_path=str(tmp_path))
+        assert connection.spool_failures
+        assert not connection._spools
+        assert _tts_connection()._spools
+
+    def test_failures_handled(self, monkeypatch):
+        spooled = []
+        monkeypatch.setattr(
+            "sensorthings_utils.connections.spool.append",
+            lambda sensor_id, st_obs: spooled.append(sensor_id),
+        )
+        connection = _tts_connection()
+        connection.sink = _FailingSink(connection.app_name)
+        connection._upload("sensor-1", _obs(1))
+        assert spooled == ["sensor-1"]
+
+    def test_stop_without_thread(self, monkeypatch):
+        spooled = []
+        monkeypatch.setattr(
+            "sensorthings_utils.connections.spool.append",
+            lambda sensor_id, st_obs: spooled.append(sensor_id),
+        )
+        connection = _tts_connection(upload_workers=1)
+        connection._upload_pipeline.submit("sensor-1", _obs(1))  # type: ignore
+        connection.stop_pull_transform_push_thread()
+        connection.stop_pull_transform_push_thread()
+        assert spooled == ["sensor-1"]
+
+
+class TestMqttDrain:
+    """
+    Test the MQTT connection loop draining its payload queue.
+
+    Testing Strategy:
+        - raw payloads are decoded on the connection thread, a batch at a
+          time, with one sink flush per batch,
+        - an undecodable payload is handled as an unpack failure, without
+          stopping the batch.
+    """
+
+    def test_batch(self, monkeypatch):
+        connection = _tts_connection(sink="null", drain_batch_size=10)
+        connection._subscribed = True  # no broker
+        monkeypatch.setattr(connection._mqtt_client, "loop_stop", lambda: None)
+        monkeypatch.setattr(connection._mqtt_client, "disconnect", lambda: None)
+        flushes = []
+
+        def flush():
+            flushes.append(len(connection.sink))  # type: ignore
+            connection._stop_event.set()
+
+        monkeypatch.setattr(connection.sink, "flush", flush)
+        handled = []
+        monkeypatch.setattr(
+            connection, "_exception_handler", lambda e, **_: handled.append(e) or 0
+        )
+        for raw_payload in (json.dumps(TTS_PAYLOAD).encode(), b"{", b"[]"):
+            connection._payload_queue.put(raw_payload)
+        connection._pull_transform_push_loop()
+        assert flushes == [10]
+        assert isinstance(handled[0], UnpackError)
+        assert len(handled) == 2
+
+
+class TestKeyedProcessing:
+    """
+    Test processing the sensors of a payload on keyed workers.
+
+    Testing Strategy:
+        - the observations of a payload are uploaded off the calling thread,
+          without flushing the sink on it,
+        - an unregistered sensor is handled with its sensor id.
+    """
+
+    def test_process_workers(self, monkeypatch):
+        connection = _tts_connection(sink="null", process_workers=2)
+        connection.sensor_registry = {
+            "24E124707D378803": SupportedSensors.MILESIGHT_AM308L
+        }
+        monkeypatch.setattr(
+            connection.sink, "flush", lambda: pytest.fail("flushed on the caller")
+        )
+        handled = []
+        monkeypatch.setattr(
+            connection,
+            "_exception_handler",
+            lambda e, **kwargs: handled.append((e, kwargs)) or 0,
+        )
+        connection._keyed_executor.start()  # type: ignore
+        for _ in range(3):
+            connection._process_payload(TTS_PAYLOAD)
+        connection._keyed_executor.join()  # type: ignore
+        connection.sensor_registry = {}
+        connection._process_payload(TTS_PAYLOAD)
+        connection._keyed_executor.stop()  # type: ignore
+        assert connection.sink.counts["24E124707D378803"] == 30  # type: ignore
+        assert len(handled) == 1
+        assert handled[0][1] == {"sensor_id": "24E124707D378803"}
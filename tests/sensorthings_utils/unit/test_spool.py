@@ -0,0 +1,142 @@
+"""Test the on-disk observation spool in spool.py"""
+
+# standard
+import threading
+import time
+from datetime import datetime
+from urllib import error
+
+# external
+import pytest
+
+# internal
+import sensorthings_utils.frost_bulk as frost_bulk
+import sensorthings_utils.spool as spool_module
+from sensorthings_utils.frost_bulk import BulkObservationUploader
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.sensor_things.core import Observation
+from sensorthings_utils.spool import ObservationSpool
+from sensorthings_utils.transformers.types import ObservedProperties
+
+ROOT = "http://localhost:8080/FROST-Server/v1.1"
+
+
+def _obs(value):
+    return (
+        Observation(result=value, phenomenonTime=datetime(2025, 1, 1)),
+        ObservedProperties.CO2_INDOOR,
+    )
+
+
+@pytest.fixture
+def frost(monkeypatch):
+    """
+    A fake FROST accepting every observation unless `frost["up"]` is False,
+    with a datastream for every sensor not in `frost["unprovisioned"]`.
+    """
+    state = {"up": True, "rows": [], "unprovisioned": set()}
+
+    def datastream_id(sensor_name, datastream_name):
+        return None if sensor_name in state["unprovisioned"] else 1
+
+    def post(self, body):
+        if not state["up"]:
+            raise error.URLError("connection refused")
+        rows = [row for ds in body for row in ds["dataArray"]]
+        state["rows"].extend(rows)
+        return [f"{ROOT}/Observations({i})" for i, _ in enumerate(rows)]
+
+    monkeypatch.setattr(frost_bulk, "get_datastream_id", datastream_id)
+    monkeypatch.setattr(spool_module, "get_datastream_id", datastream_id)
+    monkeypatch.setattr(BulkObservationUploader, "_post", post)
+    return state
+
+
+@pytest.fixture
+def spool(tmp_path) -> ObservationSpool:
+    return ObservationSpool(tmp_path / "spool", replay_batch=3)
+
+
+class TestObservationSpool:
+    """
+    Test spooling and replaying observations.
+
+    Testing Strategy:
+        - spooled observations survive a new spool instance (a restart),
+        - replay uploads and removes everything when FROST is up,
+        - replay keeps everything when FROST is down,
+        - a torn record does not break replay,
+        - observations of datastreams not provisioned yet stay spooled for a
+          later replay,
+        - the replayer waits for the thread it is started after.
+    """
+
+    def test_survives_restart(self, spool, tmp_path):
+        for i in range(5):
+            spool.append("sensor-1", _obs(i))
+        spool.stop_replayer()
+        assert len(ObservationSpool(tmp_path / "spool")) == 5
+
+    def test_replay(self, spool, frost):
+        replayed = netmon.spool_replayed
+        for i in range(7):
+            spool.append("sensor-1", _obs(i))
+        assert spool.replay() == 7
+        assert [row[1] for row in frost["rows"]] == list(range(7))
+        assert len(spool) == 0
+        assert not list(spool.directory.glob("*.jsonl"))
+        assert netmon.spool_replayed == replayed + 7
+        assert netmon.spool_size == 0
+
+    def test_frost_down(self, spool, frost):
+        frost["up"] = False
+        for i in range(4):
+            spool.append("sensor-1", _obs(i))
+        assert spool.replay() == 0
+        assert len(spool) == 4
+        frost["up"] = True
+        assert spool.replay() == 4
+
+    def test_torn_record(self, spool, frost):
+        spool.append("sensor-1", _obs(1))
+        spool.stop_replayer()
+        segment = next(spool.directory.glob("*.jsonl"))
+        with open(segment, "a") as f:
+            f.write('{"sensor": "sensor-1", "datas')
+        assert len(ObservationSpool(spool.directory)) == 1
+        assert ObservationSpool(spool.directory).replay() == 1
+
+    def test_unprovisioned_kept(self, spool, frost):
+        frost["unprovisioned"].add("sensor-2")
+        for i in range(4):
+            spool.append("sensor-1", _obs(i))
+            spool.append("sensor-2", _obs(10 + i))
+        assert spool.replay() == 4
+        assert len(spool) == 4
+        frost["unprovisioned"].clear()
+        assert spool.replay() == 4
+        assert sorted(row[1] for row in frost["rows"]) == [0, 1, 2, 3, 10, 11, 12, 13]
+        assert len(spool) == 0
+
+    def test_replayer_after(self, tmp_path, frost, monkeypatch):
+        monkeypatch.setattr(spool_module, "_frost_reachable", lambda: True)
+        spool = ObservationSpool(
+            tmp_path / "spool", fsync_interval=0.01, replay_interval=0.01
+        )
+        spool.append("sensor-1", _obs(1))
+        provisioned = threading.Event()
+        provisioning = threading.Thread(target=provisioned.wait)
+        provisioning.start()
+        spool.start_replayer(after=provisioning)
+        try:
+            assert not provisioned.wait(0.1)
+            assert len(spool) == 1
+            provisioned.set()
+            for _ in range(100):
+                if not len(spool):
+                    break
+                time.sleep(0.01)
+            assert len(spool) == 0
+        finally:
+            provisioned.set()
+            spool.stop_replayer()
@@ -0,0 +1,163 @@
+"""Test hot reloading sensor configs in watcher.py"""
+
+# standard
+import os
+import threading
+
+# external
+import pytest
+
+# internal
+import sensorthings_utils.frost as frost
+from sensorthings_utils.monitor import netmon
+from sensorthings_utils.paths import DEPLOY_DIR
+from sensorthings_utils.sensor_things.extensions import SensorConfig
+from sensorthings_utils.transformers.types import SupportedSensors
+from sensorthings_utils.watcher import SensorConfigWatcher
+
+TEMPLATE = DEPLOY_DIR / "sensor_configs" / "milesight" / "template_milesight.am103l.yaml"
+
+
+def _write(path, sensor: str, thing: str = "room-1"):
+    path.write_text(
+        TEMPLATE.read_text()
+        .replace("<SENSOR_ID>", sensor)
+        .replace("<THING_NAME>", thing)
+        .replace("<LOCATION_NAME>", f"{thing} location")
+        .replace("[<LONGITUDE>, <LATITUDE>]", "[4.37, 52.0]")
+    )
+    # mtimes may not tick between writes within a test:
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    return path
+
+
+@pytest.fixture
+def provisioned(monkeypatch):
+    """Record the sensors passed to `frost.provision`, failing those listed."""
+    calls: list[list[str]] = []
+    failing: set[str] = set()
+
+    def provision(sensor_arrangements, workers=1, on_provisioned=None, registry=None):
+        sensors = [frost._sensor_name(sa) for sa in sensor_arrangements]
+        calls.append(sensors)
+        for sensor_arrangement, sensor in zip(sensor_arrangements, sensors):
+            if sensor not in failing and on_provisioned is not None:
+                on_provisioned(sensor_arrangement, sensor)
+        return [sensor for sensor in sensors if sensor not in failing]
+
+    monkeypatch.setattr(frost, "provision", provision)
+    return calls, failing
+
+
+class TestSensorConfigWatcher:
+    """
+    Test applying sensor configs changed while running.
+
+    Testing Strategy:
+        - configs present at start up are not provisioned again,
+        - an added config is provisioned and registered, alone,
+        - an edited config is provisioned again, a removed one unregistered,
+        - an invalid config is counted and leaves the registry untouched,
+        - a config failing to provision is retried on the next rescan, also
+          one which failed at start up,
+        - the watcher thread picks up a new config and stops.
+    """
+
+    def test_delta(self, tmp_path, provisioned):
+        calls, _ = provisioned
+        existing = SensorConfig(_write(tmp_path / "a.yaml", "sensor-a"))
+        sensor_registry = {"sensor-a": SupportedSensors(existing.model)}
+        watcher = SensorConfigWatcher(
+            sensor_registry, path=tmp_path, sensor_configs=[existing]
+        )
+        assert watcher.reload() == {"added": [], "changed": [], "removed": []}
+
+        _write(tmp_path / "b.yaml", "sensor-b")
+        changes = watcher.reload()
+        assert [f.name for f in changes["added"]] == ["b.yaml"]
+        assert calls == [["sensor-b"]]
+        assert set(sensor_registry) == {"sensor-a", "sensor-b"}
+        assert "sensor-b" in netmon.expected_sensors
+
+    def test_change_and_remove(self, tmp_path, provisioned):
+        calls, _ = provisioned
+        sensor_registry: dict = {}
+        watcher = SensorConfigWatcher(sensor_registry, path=tmp_path)
+        _write(tmp_path / "a.yaml", "sensor-a")
+        watcher.reload()
+
+        _write(tmp_path / "a.yaml", "sensor-a", thing="room-2")
+        assert len(watcher.reload()["changed"]) == 1
+        assert calls == [["sensor-a"], ["sensor-a"]]
+
+        # the file now configures another sensor:
+        _write(tmp_path / "a.yaml", "sensor-c")
+        watcher.reload()
+        assert set(sensor_registry) == {"sensor-c"}
+
+        (tmp_path / "a.yaml").unlink()
+        assert len(watcher.reload()["removed"]) == 1
+        assert sensor_registry == {}
+
+    def test_invalid(self, tmp_path, provisioned):
+        calls, _ = provisioned
+        sensor_registry: dict = {}
+        watcher = SensorConfigWatcher(sensor_registry, path=tmp_path)
+        fails = netmon.sensor_config_fail
+        (tmp_path / "broken.yaml").write_text("sensors: [")
+        watcher.reload()
+        assert netmon.sensor_config_fail > fails
+        assert calls == []
+        assert sensor_registry == {}
+
+    def test_retry(self, tmp_path, provisioned):
+        calls, failing = provisioned
+        sensor_registry: dict = {}
+        watcher = SensorConfigWatcher(sensor_registry, path=tmp_path)
+        _write(tmp_path / "a.yaml", "sensor-a")
+        failing.add("sensor-a")
+        watcher.reload()
+        assert sensor_registry == {}
+        failing.clear()
+        watcher.reload()
+        assert calls == [["sensor-a"], ["sensor-a"]]
+        assert set(sensor_registry) == {"sensor-a"}
+
+    def test_retry_startup_failures(self, tmp_path, provisioned):
+        calls, _ = provisioned
+        configs = [
+            SensorConfig(_write(tmp_path / f"{s}.yaml", f"sensor-{s}")) for s in "ab"
+        ]
+        # sensor-b failed to provision at start up:
+        sensor_registry = {"sensor-a": SupportedSensors(configs[0].model)}
+        startup = threading.Thread(target=lambda: None)
+        startup.start()
+        watcher = SensorConfigWatcher(
+            sensor_registry,
+            path=tmp_path,
+            sensor_configs=configs,
+            interval=0.05,
+            settle=0,
+        )
+        watcher.start(after=startup)
+        for _ in range(100):
+            if calls:
+                break
+            watcher._stop_event.wait(0.05)
+        watcher.stop()
+        assert calls == [["sensor-b"]]
+        assert set(sensor_registry) == {"sensor-a", "sensor-b"}
+
+    def test_thread(self, tmp_path, provisioned):
+        calls, _ = provisioned
+        watcher = SensorConfigWatcher({}, path=tmp_path, interval=0.05, settle=0)
+        watcher.start()
+        _write(tmp_path / "a.yaml", "sensor-a")
+        for _ in range(100):
+            if calls:
+                break
+            watcher._stop_event.wait(0.05)
+        watcher.stop()
+        assert calls == [["sensor-a"]]
+        assert not watcher._thread.is_alive()  # type: ignore